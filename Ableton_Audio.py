@@ -0,0 +1,162 @@
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# What the header says about a sample file; data_offset/data_size locate the PCM frames
+AudioInfo = namedtuple("AudioInfo", ["path", "container", "encoding", "channels", "sample_rate", "bits",
+                                     "data_offset", "data_size", "big_endian"])
+
+# Frames per chunk when streaming samples (about 6 s at 44.1 kHz)
+CHUNK_FRAMES = 1 << 18
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class AudioFormatError(ValueError):
+    """The file isn't a WAV/AIFF this module can read (or its header is broken)."""
+
+def _extended_to_float(data):
+    # AIFF stores the sample rate as an 80-bit IEEE extended float
+    exponent, mantissa = struct.unpack(">HQ", data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def _read_wav(f, path, file_size):
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack("<4sI", header)
+        start = f.tell()
+        if chunk_id == b"fmt ":
+            data = f.read(size)
+            format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", data[:16])
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(data) >= 26:
+                format_tag = struct.unpack("<H", data[24:26])[0]
+            fmt = (format_tag, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioFormatError(f"{path}: data chunk before fmt chunk")
+            format_tag, channels, sample_rate, bits = fmt
+            if format_tag == _WAVE_FORMAT_PCM:
+                encoding = "pcm"
+            elif format_tag == _WAVE_FORMAT_FLOAT:
+                encoding = "float"
+            else:
+                raise AudioFormatError(f"{path}: unsupported WAV encoding 0x{format_tag:04x}")
+            # Streaming writers leave the size at 0/0xFFFFFFFF; the data then runs to the end of the file
+            if size in (0, 0xFFFFFFFF) or start + size > file_size:
+                size = file_size - start
+            return AudioInfo(path, "wav", encoding, channels, sample_rate, bits, start, size, False)
+        f.seek(start + size + (size & 1))
+    raise AudioFormatError(f"{path}: no audio data found")
+
+def _read_aiff(f, path, file_size, compressed):
+    comm = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk_id, size = struct.unpack(">4sI", header)
+        start = f.tell()
+        if chunk_id == b"COMM":
+            data = f.read(size)
+            channels, _, bits = struct.unpack(">hIh", data[:8])
+            sample_rate = _extended_to_float(data[8:18])
+            compression = data[18:22] if compressed else b"NONE"
+            comm = (channels, int(round(sample_rate)), bits, compression)
+        elif chunk_id == b"SSND":
+            if comm is None:
+                raise AudioFormatError(f"{path}: SSND chunk before COMM chunk")
+            channels, sample_rate, bits, compression = comm
+            offset = struct.unpack(">I", f.read(4))[0]
+            data_offset = start + 8 + offset
+            data_size = min(size - 8 - offset, file_size - data_offset)
+            if compression in (b"NONE", b"twos"):
+                return AudioInfo(path, "aiff", "pcm", channels, sample_rate, bits, data_offset, data_size, True)
+            if compression == b"sowt":
+                return AudioInfo(path, "aiff", "pcm", channels, sample_rate, bits, data_offset, data_size, False)
+            if compression in (b"fl32", b"FL32"):
+                return AudioInfo(path, "aiff", "float", channels, sample_rate, 32, data_offset, data_size, True)
+            if compression in (b"fl64", b"FL64"):
+                return AudioInfo(path, "aiff", "float", channels, sample_rate, 64, data_offset, data_size, True)
+            raise AudioFormatError(f"{path}: unsupported AIFF-C compression {compression.decode('latin-1')!r}")
+        f.seek(start + size + (size & 1))
+    raise AudioFormatError(f"{path}: no audio data found")
+
+def read_audio_info(path):
+    """Parse a WAV or AIFF/AIFF-C header. Raises AudioFormatError for anything else."""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise AudioFormatError(f"{path}: too short to be audio")
+        if header[:4] in (b"RIFF", b"RF64") and header[8:12] == b"WAVE":
+            return _read_wav(f, path, file_size)
+        if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+            return _read_aiff(f, path, file_size, header[8:12] == b"AIFC")
+    raise AudioFormatError(f"{path}: not a WAV or AIFF file")
+
+def frame_count(info):
+    return info.data_size // (info.channels * ((info.bits + 7) // 8)) if info.channels else 0
+
+def _sample_view(info):
+    """Memory-map the data region as (frames, channels[, 3]) without reading it."""
+    width = (info.bits + 7) // 8
+    frames = frame_count(info)
+    order = ">" if info.big_endian else "<"
+    if info.encoding == "float":
+        dtype = np.dtype(f"{order}f{width}")
+    elif width == 1:
+        # 8-bit WAV is unsigned, 8-bit AIFF signed
+        dtype = np.dtype("i1") if info.container == "aiff" else np.dtype("u1")
+    elif width == 3:
+        return np.memmap(info.path, dtype=np.uint8, mode="r", offset=info.data_offset, shape=(frames, info.channels, 3))
+    elif width in (2, 4):
+        dtype = np.dtype(f"{order}i{width}")
+    else:
+        raise AudioFormatError(f"{info.path}: unsupported sample width {info.bits} bits")
+    return np.memmap(info.path, dtype=dtype, mode="r", offset=info.data_offset, shape=(frames, info.channels))
+
+def _to_float(info, block):
+    """Convert one block of raw frames to float32 in [-1, 1], shape (frames, channels)."""
+    if block.ndim == 3:
+        # 24-bit: assemble the three bytes, then sign-extend from bit 23
+        b = block.astype(np.int32)
+        if info.big_endian:
+            value = (b[..., 0] << 16) | (b[..., 1] << 8) | b[..., 2]
+        else:
+            value = b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)
+        value = (value ^ 0x800000) - 0x800000
+        return value.astype(np.float32) / float(1 << 23)
+    if info.encoding == "float":
+        return block.astype(np.float32)
+    if block.dtype == np.uint8:
+        return (block.astype(np.float32) - 128.0) / 128.0
+    return block.astype(np.float32) / float(1 << (8 * block.dtype.itemsize - 1))
+
+def iter_chunks(info, chunk_frames=CHUNK_FRAMES, mono=True):
+    """Stream the file as float32 blocks from a memory map, one chunk in memory at a time.
+
+    Yields (first frame index, samples); samples are 1-D (the channel mean) when mono is set,
+    otherwise (frames, channels).
+    """
+    if frame_count(info) == 0:
+        return
+    view = _sample_view(info)
+    try:
+        for start in range(0, len(view), chunk_frames):
+            block = _to_float(info, view[start:start + chunk_frames])
+            yield start, block.mean(axis=1) if mono else block
+    finally:
+        del view
+
+def duration_seconds(info):
+    return frame_count(info) / info.sample_rate if info.sample_rate else 0.0
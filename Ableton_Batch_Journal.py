@@ -0,0 +1,113 @@
+import os
+import glob
+import json
+import time
+
+from Ableton_Router_Engine import file_sha256
+
+DEFAULT_JOURNAL = "router_batch.journal"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+class BatchJournal:
+    """Append-only record of a batch: one JSON line per state change of a file.
+
+    Every line is flushed and fsynced before the batch moves on, so after a crash the journal
+    says which files were finished. A line cut short by the crash is ignored on load, and the
+    latest line for each file wins.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL):
+        self.path = path
+        self.entries = {}
+
+    def load(self):
+        """Read the journal back; returns {input file: latest entry} in batch order."""
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return self.entries
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry["file"]] = entry
+        return self.entries
+
+    def _append(self, entries, path=None):
+        with open(path or self.path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, files, output_name_for):
+        """Start a new batch: every file pending, with the output it will get.
+
+        The output name is fixed here, so a resumed batch writes the same files rather than
+        picking new _routed_N names. Input digests are recorded as files start (see mark), so
+        starting a batch doesn't read every set.
+        """
+        entries = [self._entry(input_file, PENDING, output_name_for(input_file)) for input_file in files]
+        # Written aside and swapped in, so an earlier batch's journal is never half replaced
+        temp_file = self.path + ".part"
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        self._append(entries, temp_file)
+        os.replace(temp_file, self.path)
+        self.entries = {entry["file"]: entry for entry in entries}
+
+    def _entry(self, input_file, state, output, error=None):
+        return {"file": input_file, "state": state, "digest": None, "output": output, "error": error, "time": time.time()}
+
+    def mark(self, input_file, state, error=None, digest=None):
+        """Record a file's new state; digest is the input's sha256, given when the file starts."""
+        previous = self.entries[input_file]
+        entry = dict(previous, state=state, error=error, time=time.time())
+        if digest is not None:
+            entry["digest"] = digest
+        self._append([entry])
+        self.entries[input_file] = entry
+
+    def output_for(self, input_file):
+        return self.entries[input_file]["output"]
+
+    def remaining(self):
+        """Files a resumed batch still has to route, in batch order.
+
+        A finished file is only routed again when its output is gone or the set changed since
+        (its digest no longer matches). Files that were mid-write when the batch died leave
+        only temp files behind; those are removed.
+        """
+        remaining = []
+        for input_file, entry in self.entries.items():
+            if entry["state"] == DONE:
+                try:
+                    unchanged = entry["digest"] is not None and file_sha256(input_file) == entry["digest"]
+                except OSError:
+                    unchanged = False
+                if unchanged and os.path.exists(entry["output"]):
+                    continue
+            for temp_file in glob.glob(glob.escape(entry["output"]) + ".*.part"):
+                os.remove(temp_file)
+            remaining.append(input_file)
+        return remaining
+
+    def reset(self, files):
+        """Mark files pending again for a resumed run (their digests are taken again when they start)."""
+        entries = []
+        for input_file in files:
+            previous = self.entries[input_file]
+            entries.append(self._entry(input_file, PENDING, previous["output"]))
+        self._append(entries)
+        self.entries.update((entry["file"], entry) for entry in entries)
+
+    def counts(self):
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for entry in self.entries.values():
+            counts[entry["state"]] += 1
+        return counts
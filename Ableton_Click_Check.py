@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import Ableton_Router_Engine as engine
+from Ableton_Audio import read_audio_info, iter_chunks, duration_seconds, AudioFormatError
+from Ableton_Sample_Bundle import DigestCache
+
+DEFAULT_CACHE_NAME = "click_analysis.sqlite"
+# Bump when the analysis changes so cached results are recomputed
+ANALYSIS_VERSION = 1
+
+# Flag a click whose tempo is off by more than this many BPM, or whose beats wander more than
+# DEFAULT_DRIFT_MS from a steady grid within the file
+DEFAULT_TOLERANCE_BPM = 0.1
+DEFAULT_DRIFT_MS = 20.0
+
+# Onset detection: peak envelope over 5 ms hops, onsets where it rises through a fraction of the
+# file's loud level, at most one per 50 ms
+HOPS_PER_SECOND = 200
+ONSET_THRESHOLD = 0.3
+ONSET_REFRACTORY_SECONDS = 0.05
+MIN_ONSETS = 8
+# A steady pulse has this share of its inter-onset intervals on whole multiples of the beat
+MIN_CONFIDENCE = 0.6
+WINDOW_SECONDS = 30.0
+# Click tracks often tick 8ths or half notes. Only octave folds: a 2/3 or 3/2 fold would pass an
+# 80 or 180 BPM click in a 120 BPM set
+FOLD_RATIOS = (1 / 2, 1.0, 2.0)
+
+ClickResult = namedtuple("ClickResult", ["track", "clip", "time", "path", "status", "expected_bpm", "detected_bpm",
+                                         "pulse_bpm", "warped", "offset_ms", "drift_ms", "note"])
+
+# --- Analysis ---
+
+def onset_envelope(info):
+    """Peak level per hop for the whole file, computed chunk by chunk from a memory map."""
+    hop = max(1, info.sample_rate // HOPS_PER_SECOND)
+    pieces = []
+    carry = np.zeros(0, dtype=np.float32)
+    for _, samples in iter_chunks(info):
+        samples = np.abs(samples)
+        if len(carry):
+            samples = np.concatenate((carry, samples))
+        usable = len(samples) - len(samples) % hop
+        pieces.append(samples[:usable].reshape(-1, hop).max(axis=1))
+        carry = samples[usable:]
+    return (np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)), hop / info.sample_rate
+
+def detect_onsets(envelope, hop_seconds):
+    if not len(envelope):
+        return np.zeros(0)
+    # 99.9th percentile rather than the maximum, so one stray peak doesn't hide the clicks
+    threshold = max(ONSET_THRESHOLD * float(np.percentile(envelope, 99.9)), 1e-3)
+    above = envelope >= threshold
+    rising = np.flatnonzero(above[1:] & ~above[:-1]) + 1
+    if above[0]:
+        rising = np.concatenate(([0], rising))
+    if len(rising) > 1:
+        rising = rising[np.concatenate(([True], np.diff(rising) * hop_seconds > ONSET_REFRACTORY_SECONDS))]
+    return rising * hop_seconds
+
+def _mean_period(intervals, period):
+    """Refine a rough period by averaging the intervals that sit on the grid (each divided by the
+    beats it spans), which cancels the hop quantisation a median keeps."""
+    beats = np.round(intervals / period)
+    on_grid = (beats >= 1) & (np.abs(intervals / period - beats) < 0.1)
+    return float(intervals[on_grid].sum() / beats[on_grid].sum()) if on_grid.any() else period
+
+def _fit_period(onsets, period):
+    """Least-squares beat period through the onsets; returns (period, largest deviation in seconds)."""
+    period = _mean_period(np.diff(onsets), period)
+    beats = np.round((onsets - onsets[0]) / period)
+    if beats[-1] <= 0:
+        return period, 0.0
+    slope, intercept = np.polyfit(beats, onsets, 1)
+    residuals = onsets - (slope * beats + intercept)
+    return float(slope), float(np.abs(residuals).max())
+
+def analyze_click(path):
+    """Estimate a click file's pulse tempo. Returns a JSON-able dict (cached by file hash)."""
+    try:
+        info = read_audio_info(path)
+    except AudioFormatError as e:
+        return {"status": "unsupported", "note": str(e)}
+    envelope, hop_seconds = onset_envelope(info)
+    onsets = detect_onsets(envelope, hop_seconds)
+    result = {"status": "no pulse", "duration": round(duration_seconds(info), 3), "onsets": int(len(onsets))}
+    if len(onsets) < MIN_ONSETS:
+        return result
+
+    intervals = np.diff(onsets)
+    period = float(np.median(intervals))
+    ratios = intervals / period
+    confidence = float(np.mean((np.abs(ratios - np.round(ratios)) < 0.1) & (np.round(ratios) >= 1)))
+    period, deviation = _fit_period(onsets, period)
+
+    windows = []
+    for start in np.arange(onsets[0], onsets[-1], WINDOW_SECONDS):
+        in_window = onsets[(onsets >= start) & (onsets < start + WINDOW_SECONDS)]
+        if len(in_window) >= MIN_ONSETS:
+            windows.append(round(60.0 / _fit_period(in_window, period)[0], 3))
+
+    result.update({
+        "status": "ok" if confidence >= MIN_CONFIDENCE else "no pulse",
+        "bpm": round(60.0 / period, 4),
+        "confidence": round(confidence, 3),
+        "drift_ms": round(deviation * 1000, 1),
+        "window_bpm": windows,
+        "first_onset": round(float(onsets[0]), 4),
+    })
+    return result
+
+class AnalysisCache:
+    """Click analyses in SQLite, keyed by the audio file's sha256 (digests cached by path/size/mtime)."""
+
+    def __init__(self, db_path):
+        self.digests = DigestCache(db_path)
+        self.conn = self.digests.conn
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS click_analysis (sha256 TEXT PRIMARY KEY, version INTEGER NOT NULL, result TEXT NOT NULL)"
+        )
+
+    def digest(self, path):
+        stat = os.stat(path)
+        digest = self.digests.get(path, stat)
+        if digest is None:
+            digest = engine.file_sha256(path)
+            self.digests.put_many([(path, stat.st_size, stat.st_mtime_ns, digest)])
+        return digest
+
+    def get(self, digest):
+        row = self.conn.execute("SELECT version, result FROM click_analysis WHERE sha256 = ?", (digest,)).fetchone()
+        if row is None or row[0] != ANALYSIS_VERSION:
+            return None
+        return json.loads(row[1])
+
+    def put(self, digest, result):
+        self.conn.execute("INSERT OR REPLACE INTO click_analysis (sha256, version, result) VALUES (?, ?, ?)",
+                          (digest, ANALYSIS_VERSION, json.dumps(result)))
+        self.conn.commit()
+
+    def close(self):
+        self.digests.close()
+
+def analyze_files(paths, cache, jobs=None):
+    """{path: analysis} for the given audio files, analysing only files whose hash isn't cached."""
+    digests = {path: cache.digest(path) for path in paths}
+    results = {}
+    todo = {}
+    for path, digest in digests.items():
+        cached = cache.get(digest)
+        if cached is not None:
+            results[path] = cached
+        else:
+            todo.setdefault(digest, path)
+    if todo:
+        with ThreadPoolExecutor(max_workers=jobs or min(4, os.cpu_count() or 1)) as pool:
+            analysed = dict(zip(todo, pool.map(analyze_click, todo.values())))
+        for digest, result in analysed.items():
+            cache.put(digest, result)
+        for path, digest in digests.items():
+            results.setdefault(path, analysed.get(digest))
+    return results
+
+# --- The set's side ---
+
+def tempo_map(root):
+    """Return tempo_at(beat): the set tempo, following tempo automation (held between breakpoints)."""
+    main_track = root.find("LiveSet/MainTrack")
+    if main_track is None:
+        main_track = root.find("LiveSet/MasterTrack")
+    tempo = main_track.find("DeviceChain/Mixer/Tempo")
+    manual = float(tempo.find("Manual").get("Value"))
+    target = tempo.find("AutomationTarget")
+    events = []
+    for envelope in main_track.iterfind("AutomationEnvelopes/Envelopes/AutomationEnvelope"):
+        if target is not None and envelope.find("EnvelopeTarget/PointeeId").get("Value") == target.get("Id"):
+            events = sorted((float(e.get("Time")), float(e.get("Value"))) for e in envelope.iterfind("Automation/Events/*"))
+    times = np.array([time for time, _ in events])
+    values = [value for _, value in events]
+
+    def tempo_at(beat):
+        if not events:
+            return manual
+        # Several breakpoints at one time make a step; the last of them applies from there on
+        index = int(np.searchsorted(times, beat, side="right")) - 1
+        return values[index] if index >= 0 else values[0]
+
+    return tempo_at
+
+def warp_marker_bpm(clip):
+    """The tempo Live assumes for the clip's audio, from its first and last warp markers."""
+    markers = [(float(m.get("SecTime")), float(m.get("BeatTime"))) for m in clip.iter("WarpMarker")]
+    if len(markers) < 2 or markers[-1][0] <= markers[0][0]:
+        return None
+    return 60.0 * (markers[-1][1] - markers[0][1]) / (markers[-1][0] - markers[0][0])
+
+def click_tracks(root, campus=None):
+    """Tracks the rules send to the click output (CLICK, GUIDE, CUES... by exact or normalized name;
+    the router never sends a fuzzy match to the click)."""
+    click_target = engine.RULES.outputs["click"]["Target"]
+    matcher = engine.RULES.variant(campus).matcher
+    tracks, _ = engine.build_group_index(root)
+    for track in tracks:
+        if track.tag != "AudioTrack":
+            continue
+        match = matcher.match(engine.track_name_of(track) or "")
+        if match is not None and match.tier != "fuzzy" and engine.ROUTING_MAP.get(match.key, {}).get("Target") == click_target:
+            yield track
+
+def click_clips(root, project_dir, campus=None):
+    """Yield (track name, clip, clip start in beats or None for session clips, resolved path, FileRef)."""
+    for track in click_tracks(root, campus):
+        name = engine.track_name_of(track)
+        for events in track.iterfind("DeviceChain/MainSequencer/Sample/ArrangerAutomation/Events"):
+            for clip in events.iterfind("AudioClip"):
+                file_ref = clip.find("SampleRef/FileRef")
+                if file_ref is not None:
+                    yield name, clip, float(clip.get("Time", "0")), engine.resolve_sample_path(file_ref, project_dir), file_ref
+        for clip in track.iterfind("DeviceChain/MainSequencer/ClipSlotList/ClipSlot/ClipSlot/Value/AudioClip"):
+            file_ref = clip.find("SampleRef/FileRef")
+            if file_ref is not None:
+                yield name, clip, None, engine.resolve_sample_path(file_ref, project_dir), file_ref
+
+def nearest_fold(bpm, expected):
+    """The detected pulse scaled by the subdivision ratio that brings it closest to the expected tempo."""
+    return min((bpm * ratio for ratio in FOLD_RATIOS), key=lambda folded: abs(folded - expected))
+
+def check_set(input_file, cache, campus=None, tolerance_bpm=DEFAULT_TOLERANCE_BPM, drift_ms=DEFAULT_DRIFT_MS, jobs=None):
+    """Check every click-output clip of a set against the set tempo. Returns [ClickResult]."""
+    root = engine.load_als(input_file).getroot()
+    project_dir = os.path.dirname(os.path.abspath(input_file))
+    tempo_at = tempo_map(root)
+    clips = list(click_clips(root, project_dir, campus))
+    analyses = analyze_files(sorted({path for _, _, _, path, _ in clips if path}), cache, jobs)
+
+    results = []
+    for track_name, clip, start, path, file_ref in clips:
+        clip_name = clip.find("Name").get("Value") if clip.find("Name") is not None else ""
+        set_bpm = tempo_at(start if start is not None else 0.0)
+        warped = clip.find("IsWarped") is not None and clip.find("IsWarped").get("Value") == "true"
+        # A warped clip is stretched to the set tempo, so its audio has to match the warp markers;
+        # an unwarped clip plays at its own speed and has to match the set tempo itself
+        marker_bpm = warp_marker_bpm(clip)
+        expected = marker_bpm if warped and marker_bpm else set_bpm
+        note = f"stretched {marker_bpm:.2f} → {set_bpm:.2f} BPM" if warped and marker_bpm and abs(marker_bpm - set_bpm) > 0.005 else ""
+        if path is None:
+            candidates = engine.sample_path_candidates(file_ref, project_dir)
+            results.append(ClickResult(track_name, clip_name, start, candidates[0] if candidates else "", "missing",
+                                       round(expected, 3), None, None, warped, None, None, "sample not found"))
+            continue
+        analysis = analyses[path]
+        if analysis["status"] != "ok":
+            results.append(ClickResult(track_name, clip_name, start, path, analysis["status"], round(expected, 3),
+                                       None, analysis.get("bpm"), warped, None, analysis.get("drift_ms"),
+                                       analysis.get("note", "no steady click found")))
+            continue
+
+        detected = nearest_fold(analysis["bpm"], expected)
+        # How far the click ends up from the grid by the end of the clip
+        beats = 0.0
+        if clip.find("CurrentEnd") is not None and clip.find("CurrentStart") is not None:
+            beats = float(clip.find("CurrentEnd").get("Value")) - float(clip.find("CurrentStart").get("Value"))
+        offset_ms = abs(60.0 / expected - 60.0 / detected) * beats * 1000
+        status = "ok"
+        if abs(detected - expected) > tolerance_bpm:
+            status = "mismatch"
+        elif analysis["drift_ms"] > drift_ms:
+            status = "drift"
+        results.append(ClickResult(track_name, clip_name, start, path, status, round(expected, 3), round(detected, 3),
+                                   analysis["bpm"], warped, round(offset_ms, 1), analysis["drift_ms"], note))
+    return results
+
+def format_result(result):
+    where = f"bar {int(result.time // 4) + 1}" if result.time is not None else "session"
+    line = f"{result.status.upper():11} {result.track} / {result.clip} ({where}): expected {result.expected_bpm} BPM"
+    if result.detected_bpm is not None:
+        line += f", click {result.detected_bpm} BPM"
+        if result.pulse_bpm is not None and abs(result.pulse_bpm - result.detected_bpm) > 0.001:
+            line += f" (pulse {result.pulse_bpm} BPM)"
+    elif result.pulse_bpm is not None:
+        line += f", pulse {result.pulse_bpm} BPM"
+    if result.offset_ms:
+        line += f", {result.offset_ms:.0f} ms off by the clip's end"
+    if result.drift_ms is not None and result.status in ("drift", "ok"):
+        line += f", wanders {result.drift_ms} ms"
+    if result.note:
+        line += f" [{result.note}]"
+    return line
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that click/guide audio matches each set's tempo.")
+    parser.add_argument("sets", nargs="+", help=".als files to check")
+    parser.add_argument("--campus", help="Use this campus's rules to find the click tracks")
+    parser.add_argument("--tolerance-bpm", type=float, default=DEFAULT_TOLERANCE_BPM, help="Allowed tempo difference")
+    parser.add_argument("--drift-ms", type=float, default=DEFAULT_DRIFT_MS, help="Allowed wander of the click within a file")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_NAME, help="Analysis cache database")
+    parser.add_argument("--jobs", type=int, default=None, help="Files analysed in parallel")
+    args = parser.parse_args(argv)
+
+    cache = AnalysisCache(args.cache)
+    failures = 0
+    try:
+        for input_file in args.sets:
+            try:
+                results = check_set(input_file, cache, args.campus, args.tolerance_bpm, args.drift_ms, args.jobs)
+            except (OSError, sqlite3.Error, ValueError) as e:
+                print(f"Error: Failed to check {input_file}: {str(e)}")
+                failures += 1
+                continue
+            print(f"{input_file}:")
+            if not results:
+                print("  no click or guide clips found")
+            for result in results:
+                print(f"  {format_result(result)}")
+            failures += sum(1 for result in results if result.status in ("mismatch", "drift"))
+    finally:
+        cache.close()
+    print(f"{failures} problem(s) found." if failures else "All clicks match their set tempo.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
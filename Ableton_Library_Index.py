@@ -0,0 +1,284 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from Ableton_Router_Engine import RULES, file_sha256
+from Ableton_LiveSet import LiveSet
+
+# Default location of the catalog database (next to the library unless --db is given)
+DEFAULT_DB_NAME = "ableton_library.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    campus TEXT,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    tempo REAL,
+    track_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    track_id INTEGER,
+    name TEXT NOT NULL,
+    name_upper TEXT NOT NULL,
+    type TEXT NOT NULL,
+    group_id INTEGER,
+    group_name TEXT,
+    output_target TEXT,
+    output_lower TEXT,
+    muted INTEGER NOT NULL,
+    volume REAL,
+    clip_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    error TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_campus ON files(campus);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
+CREATE INDEX IF NOT EXISTS idx_tracks_file ON tracks(file_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_name_upper ON tracks(name_upper);
+CREATE INDEX IF NOT EXISTS idx_tracks_output_lower ON tracks(output_lower);
+CREATE INDEX IF NOT EXISTS idx_tracks_group_name ON tracks(group_name);
+"""
+
+def open_catalog(db_path):
+    """Open (and create if needed) the SQLite catalog."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def extract_track_records(als_path):
+    """Parse one .als file and return (tempo, [track record tuples])."""
+    live_set = LiveSet.load(als_path)
+
+    records = []
+    for track in live_set.tracks:
+        if not track.name or track.name.strip() == "":
+            continue
+        group = live_set.group_of(track)
+        records.append((
+            int(track.id) if track.id is not None else None,
+            track.name,
+            track.name.upper(),
+            track.kind,
+            int(track.group_id) if track.group_id is not None else None,
+            group.name if group is not None and group.is_group else None,
+            track.routing.target,
+            track.routing.lower,
+            1 if track.mixer.muted else 0,
+            track.mixer.volume,
+            len(track.clips),
+        ))
+
+    return live_set.tempo, records
+
+def _extract_worker(path):
+    try:
+        tempo, records = extract_track_records(path)
+        return path, tempo, records, None
+    except Exception as e:
+        return path, None, None, str(e)
+
+def find_als_files(library_dir):
+    """Walk a library directory and yield every .als file (skipping Live's Backup folders)."""
+    for dirpath, dirnames, filenames in os.walk(library_dir):
+        dirnames[:] = [d for d in dirnames if d != "Backup"]
+        for filename in filenames:
+            if filename.lower().endswith(".als"):
+                yield os.path.abspath(os.path.join(dirpath, filename))
+
+def index_library(library_dir, db_path, campus=None, jobs=None, prune=False):
+    """Index every .als under library_dir, re-parsing only files whose mtime/size and hash changed.
+
+    Files that failed to parse are remembered with their mtime/size and skipped until they change.
+    """
+    conn = open_catalog(db_path)
+    known = {row[0]: row[1:] for row in conn.execute("SELECT path, id, mtime, size, sha256 FROM files")}
+    known_failures = {row[0]: row[1:] for row in conn.execute("SELECT path, mtime, size FROM failures")}
+
+    to_parse = []
+    unchanged = 0
+    failed = 0
+    seen = set()
+    for path in find_als_files(library_dir):
+        seen.add(path)
+        stat = os.stat(path)
+        entry = known.get(path)
+        if entry is not None and entry[1] == stat.st_mtime and entry[2] == stat.st_size:
+            unchanged += 1
+            continue
+        if known_failures.get(path) == (stat.st_mtime, stat.st_size):
+            failed += 1
+            continue
+
+        digest = file_sha256(path)
+        if entry is not None and entry[3] == digest:
+            # Touched but not modified: just remember the new mtime
+            conn.execute("UPDATE files SET mtime = ?, size = ? WHERE id = ?", (stat.st_mtime, stat.st_size, entry[0]))
+            unchanged += 1
+            continue
+
+        if campus:
+            file_campus = campus
+        else:
+            relative_dir = os.path.dirname(os.path.relpath(path, library_dir))
+            file_campus = relative_dir.split(os.sep)[0] if relative_dir else None
+        to_parse.append((path, stat, digest, file_campus))
+
+    indexed = 0
+    if to_parse:
+        meta = {path: (stat, digest, file_campus) for path, stat, digest, file_campus in to_parse}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for path, tempo, records, error in pool.map(_extract_worker, list(meta), chunksize=4):
+                stat, digest, file_campus = meta[path]
+                if error is not None:
+                    print(f"Error: Failed to index {path}: {error}")
+                    conn.execute(
+                        "INSERT OR REPLACE INTO failures (path, mtime, size, error, failed_at) VALUES (?, ?, ?, ?, ?)",
+                        (path, stat.st_mtime, stat.st_size, error, time.time()),
+                    )
+                    failed += 1
+                    continue
+
+                conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                cursor = conn.execute(
+                    "INSERT INTO files (path, campus, mtime, size, sha256, tempo, track_count, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, file_campus, stat.st_mtime, stat.st_size, digest, tempo, len(records), time.time()),
+                )
+                file_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO tracks (file_id, track_id, name, name_upper, type, group_id, group_name, "
+                    "output_target, output_lower, muted, volume, clip_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(file_id,) + record for record in records],
+                )
+                indexed += 1
+
+    removed = 0
+    if prune:
+        library_root = os.path.abspath(library_dir) + os.sep
+        for path in known:
+            if path.startswith(library_root) and path not in seen:
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                removed += 1
+        for path in known_failures:
+            if path.startswith(library_root) and path not in seen:
+                conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+
+    conn.commit()
+    conn.close()
+    print(f"Indexed {indexed} files, {unchanged} unchanged, {failed} failed, {removed} removed.")
+    return indexed, unchanged, failed, removed
+
+# --- Queries ---
+
+def query_tracks(conn, name=None, output=None, campus=None, group=None):
+    """Find tracks by (case-insensitive) name, output channel, campus and/or group."""
+    sql = (
+        "SELECT f.path, f.campus, t.name, t.type, t.group_name, t.output_target, t.output_lower, "
+        "t.muted, t.volume, t.clip_count FROM tracks t JOIN files f ON f.id = t.file_id WHERE 1 = 1"
+    )
+    params = []
+    if name:
+        sql += " AND t.name_upper = ?"
+        params.append(name.upper())
+    if output:
+        sql += " AND t.output_lower = ?"
+        params.append(output)
+    if campus:
+        sql += " AND f.campus = ?"
+        params.append(campus)
+    if group:
+        sql += " AND t.group_name = ?"
+        params.append(group)
+    sql += " ORDER BY f.path, t.id"
+    return conn.execute(sql, params).fetchall()
+
+def query_unmatched(conn, campus=None):
+    """Return (name, file count, track count, tier, rule name) for track names the rules don't list
+    exactly, most common first. tier is the matcher's "normalized" or "fuzzy", or None for no match."""
+    sql = "SELECT t.name, COUNT(DISTINCT t.file_id), COUNT(*) FROM tracks t JOIN files f ON f.id = t.file_id"
+    params = []
+    if campus:
+        sql += " WHERE f.campus = ?"
+        params.append(campus)
+    sql += " GROUP BY t.name_upper ORDER BY 3 DESC"
+    matcher = RULES.variant(campus).matcher
+    unmatched = []
+    for name, file_count, track_count in conn.execute(sql, params):
+        match = matcher.match(name)
+        if match is None:
+            unmatched.append((name, file_count, track_count, None, None))
+        elif match.tier != "exact":
+            unmatched.append((name, file_count, track_count, match.tier, match.key))
+    return unmatched
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index Ableton Live sets into a SQLite catalog and query it.")
+    parser.add_argument("--db", default=DEFAULT_DB_NAME, help="Path to the catalog database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="Walk a library and (re-)index changed .als files")
+    index_parser.add_argument("library", help="Folder containing .als files")
+    index_parser.add_argument("--campus", help="Campus to tag files with (default: first sub-folder name)")
+    index_parser.add_argument("--jobs", type=int, default=None, help="Parser processes (default: CPU count)")
+    index_parser.add_argument("--prune", action="store_true", help="Forget files that no longer exist")
+
+    query_parser = subparsers.add_parser("query", help="Query the catalog")
+    query_subparsers = query_parser.add_subparsers(dest="query", required=True)
+    tracks_parser = query_subparsers.add_parser("tracks", help="List tracks matching filters")
+    tracks_parser.add_argument("--name", help="Track name (case-insensitive), e.g. HOOKS")
+    tracks_parser.add_argument("--output", help="Output channel, e.g. 7/8")
+    tracks_parser.add_argument("--campus", help="Campus")
+    tracks_parser.add_argument("--group", help="Parent group name")
+    unmatched_parser = query_subparsers.add_parser(
+        "unmatched", help="Track names that no rule lists exactly, with the looser match (if any) the router would use")
+    unmatched_parser.add_argument("--campus", help="Campus (its rule variant and its files only)")
+    sql_parser = query_subparsers.add_parser("sql", help="Run a raw read-only SQL statement")
+    sql_parser.add_argument("statement")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "index":
+        index_library(args.library, args.db, campus=args.campus, jobs=args.jobs, prune=args.prune)
+        return 0
+
+    if not os.path.exists(args.db):
+        print(f"Error: No catalog at {args.db}. Run the index command first.")
+        return 1
+
+    conn = open_catalog(args.db)
+    if args.query == "tracks":
+        for row in query_tracks(conn, name=args.name, output=args.output, campus=args.campus, group=args.group):
+            path, campus, name, track_type, group_name, target, lower, muted, volume, clip_count = row
+            status = "muted" if muted else "on"
+            print(f"{campus or '-'}\t{path}\t{name} [{track_type}] group={group_name or '-'} → {target} ({lower}) {status} vol={volume} clips={clip_count}")
+    elif args.query == "unmatched":
+        for name, file_count, track_count, tier, key in query_unmatched(conn, campus=args.campus):
+            match = f"{tier} match for {key}" if tier else "no match"
+            print(f"{name}\t{file_count} files\t{track_count} tracks\t{match}")
+    elif args.query == "sql":
+        conn.execute("PRAGMA query_only = ON")
+        for row in conn.execute(args.statement):
+            print("\t".join("" if value is None else str(value) for value in row))
+    conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
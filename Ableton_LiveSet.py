@@ -0,0 +1,249 @@
+import Ableton_Router_Engine as engine
+
+# Read-only view of a set for analyzers and reports. Records are built on first access from the
+# parsed tree; detach() fills in the rest and drops the tree, leaving only small __slots__
+# records, so summaries of a whole library fit in memory.
+
+_CLIP_PATHS = (
+    ("MainSequencer/Sample/ArrangerAutomation/Events/*", True),
+    ("MainSequencer/ClipTimeable/ArrangerAutomation/Events/*", True),
+    ("MainSequencer/ClipSlotList/ClipSlot/ClipSlot/Value/*", False),
+)
+
+def _value(elem, path, default=None):
+    found = elem.find(path)
+    return found.get("Value", default) if found is not None else default
+
+def _float(value, default=None):
+    return float(value) if value is not None else default
+
+class Routing:
+    """A track's audio output; fields are None when the set doesn't store them."""
+
+    __slots__ = ("target", "upper", "lower")
+
+    def __init__(self, target, upper, lower):
+        self.target = target
+        self.upper = upper
+        self.lower = lower
+
+    @property
+    def label(self):
+        """As shown in the editor ("Ext. Out 5/6", "Group", "Master")."""
+        if self.target is None:
+            return "Master"
+        return engine.output_label(self.target, self.upper or "", self.lower or "")
+
+    def __repr__(self):
+        return f"Routing({self.target!r}, {self.upper!r}, {self.lower!r})"
+
+class MixerState:
+    """Speaker (mute) and volume as stored; volume is None when the set has no value."""
+
+    __slots__ = ("muted", "volume")
+
+    def __init__(self, muted, volume):
+        self.muted = muted
+        self.volume = volume
+
+    @property
+    def gain_db(self):
+        return engine.volume_to_db(self.volume if self.volume is not None else float(engine.DEFAULT_VOLUME))
+
+    def __repr__(self):
+        return f"MixerState(muted={self.muted}, volume={self.volume})"
+
+class SampleRef:
+    __slots__ = ("relative_path", "path")
+
+    def __init__(self, relative_path, path):
+        self.relative_path = relative_path
+        self.path = path
+
+    @classmethod
+    def from_file_ref(cls, file_ref):
+        return cls(_value(file_ref, "RelativePath", ""), _value(file_ref, "Path", ""))
+
+    def candidates(self, project_dir=None):
+        return engine.sample_file_candidates(self.relative_path, self.path, project_dir)
+
+    def resolve(self, project_dir=None):
+        """The first candidate that exists on this machine, or None."""
+        return engine.first_existing_file(self.candidates(project_dir))
+
+    def __eq__(self, other):
+        return isinstance(other, SampleRef) and (self.relative_path, self.path) == (other.relative_path, other.path)
+
+    def __hash__(self):
+        return hash((self.relative_path, self.path))
+
+    def __repr__(self):
+        return f"SampleRef({self.relative_path!r}, {self.path!r})"
+
+class Clip:
+    """An arrangement clip (time in beats) or a session clip (time None)."""
+
+    __slots__ = ("kind", "name", "time", "start", "end", "warped", "sample")
+
+    def __init__(self, kind, name, time, start, end, warped, sample):
+        self.kind = kind
+        self.name = name
+        self.time = time
+        self.start = start
+        self.end = end
+        self.warped = warped
+        self.sample = sample
+
+    @classmethod
+    def from_element(cls, elem, arrangement):
+        file_ref = elem.find("SampleRef/FileRef")
+        return cls(
+            "audio" if elem.tag == "AudioClip" else "midi",
+            _value(elem, "Name", ""),
+            _float(elem.get("Time"), 0.0) if arrangement else None,
+            _float(_value(elem, "CurrentStart")),
+            _float(_value(elem, "CurrentEnd")),
+            _value(elem, "IsWarped") == "true",
+            SampleRef.from_file_ref(file_ref) if file_ref is not None else None,
+        )
+
+    @property
+    def length(self):
+        return self.end - self.start if self.start is not None and self.end is not None else None
+
+    def __repr__(self):
+        return f"Clip({self.kind}, {self.name!r}, time={self.time})"
+
+class Track:
+    """One track's summary. Name, type and group are read up front; routing, mixer state, clips
+    and samples when first asked for."""
+
+    __slots__ = ("id", "name", "kind", "group_id", "_elem", "_routing", "_mixer", "_clips", "_samples")
+
+    def __init__(self, elem):
+        self.id = elem.get("Id")
+        self.name = engine.track_name_of(elem)
+        self.kind = elem.tag
+        group_id = _value(elem, "TrackGroupId", "-1")
+        self.group_id = group_id if group_id != "-1" else None
+        self._elem = elem
+        self._routing = self._mixer = self._clips = self._samples = None
+
+    @property
+    def element(self):
+        """The track's XML element (None once the set is detached)."""
+        return self._elem
+
+    @property
+    def routing(self):
+        if self._routing is None:
+            self._routing = Routing(*(_value(self._elem, f"DeviceChain/AudioOutputRouting/{tag}")
+                                      for tag in ("Target", "UpperDisplayString", "LowerDisplayString")))
+        return self._routing
+
+    @property
+    def mixer(self):
+        if self._mixer is None:
+            self._mixer = MixerState(_value(self._elem, "DeviceChain/Mixer/Speaker/Manual", "true") == "false",
+                                     _float(_value(self._elem, "DeviceChain/Mixer/Volume/Manual")))
+        return self._mixer
+
+    @property
+    def clips(self):
+        """Arrangement clips (in document order), then session clips."""
+        if self._clips is None:
+            clips = []
+            device_chain = self._elem.find("DeviceChain")
+            if device_chain is not None:
+                for path, arrangement in _CLIP_PATHS:
+                    clips.extend(Clip.from_element(elem, arrangement) for elem in device_chain.iterfind(path))
+            self._clips = tuple(clips)
+        return self._clips
+
+    @property
+    def samples(self):
+        """Every distinct sample the track uses: its clips' and its devices' (Simpler, Sampler...)."""
+        if self._samples is None:
+            samples = {}
+            for sample_ref in self._elem.iter("SampleRef"):
+                file_ref = sample_ref.find("FileRef")
+                if file_ref is not None:
+                    samples.setdefault(SampleRef.from_file_ref(file_ref), None)
+            self._samples = tuple(samples)
+        return self._samples
+
+    @property
+    def is_group(self):
+        return self.kind == "GroupTrack"
+
+    def detach(self):
+        # Build the lazy records while the element is still here
+        for _ in (self.routing, self.mixer, self.clips, self.samples):
+            pass
+        self._elem = None
+
+    def __repr__(self):
+        return f"Track({self.id}, {self.name!r}, {self.kind})"
+
+class LiveSet:
+    """Read-only model of a parsed set, with tracks indexed by id and by name."""
+
+    __slots__ = ("path", "_root", "_tempo", "_tracks", "_by_id", "_by_name")
+
+    def __init__(self, root, path=None):
+        self.path = path
+        self._root = root
+        self._tempo = self._tracks = self._by_id = self._by_name = None
+
+    @classmethod
+    def load(cls, input_file):
+        """Parse a set (path, bytes or file object, as engine.load_als takes)."""
+        return cls(engine.load_als(input_file).getroot(), input_file if isinstance(input_file, str) else None)
+
+    @classmethod
+    def summary(cls, input_file):
+        """Load a set and keep only its summary records (the tree is released)."""
+        return cls.load(input_file).detach()
+
+    @property
+    def tempo(self):
+        if self._tempo is None and self._root is not None:
+            tempo = _value(self._root, "LiveSet/MainTrack/DeviceChain/Mixer/Tempo/Manual")
+            if tempo is None:
+                tempo = _value(self._root, "LiveSet/MasterTrack/DeviceChain/Mixer/Tempo/Manual")
+            self._tempo = _float(tempo)
+        return self._tempo
+
+    @property
+    def tracks(self):
+        if self._tracks is None:
+            tracks, _ = engine.build_group_index(self._root)
+            self._tracks = tuple(Track(elem) for elem in tracks)
+            self._by_id = {track.id: track for track in self._tracks}
+            self._by_name = {}
+            for track in self._tracks:
+                self._by_name.setdefault((track.name or "").casefold(), []).append(track)
+        return self._tracks
+
+    def track(self, track_id):
+        self.tracks
+        return self._by_id.get(str(track_id))
+
+    def named(self, name):
+        """Tracks with this name (case-insensitive); sets often repeat names like BASS."""
+        self.tracks
+        return list(self._by_name.get(name.casefold(), ()))
+
+    def group_of(self, track):
+        return self.track(track.group_id) if track.group_id is not None else None
+
+    def detach(self):
+        """Build every record now and release the XML tree. Returns self."""
+        self.tempo
+        for track in self.tracks:
+            track.detach()
+        self._root = None
+        return self
+
+    def __repr__(self):
+        return f"LiveSet({self.path!r}, {len(self.tracks)} tracks)"
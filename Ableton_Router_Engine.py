@@ -0,0 +1,751 @@
+import gzip
+import xml.etree.ElementTree as ET
+import os
+import io
+import math
+import mmap
+import re
+import hashlib
+import tracemalloc
+from contextlib import contextmanager
+from collections import namedtuple
+
+from Ableton_Rules import RuleSet, RULES_FILE, TrackFacts, NO_DECISION
+
+# Routing rules live in routing_rules.toml (see Ableton_Rules.py); compiled once per campus on first use
+RULES = RuleSet.from_file(RULES_FILE)
+CAMPUSES = RULES.campuses
+
+# Name-only views of the general rules, for lookups and reports
+ROUTING_MAP, MUTE_TRACKS, TURN_DOWN_GAINS = RULES.name_tables()
+TURN_DOWN_TRACKS = set(TURN_DOWN_GAINS)
+VOLUME_REDUCTION_DB = next(iter(TURN_DOWN_GAINS.values()), -10)
+
+TRACK_TYPES = ["AudioTrack", "MidiTrack", "GroupTrack"]
+
+def _log(log, message):
+    if log is not None:
+        log(message)
+
+GZIP_MAGIC = b"\x1f\x8b"
+PARSE_CHUNK_SIZE = 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path, chunk_size=HASH_CHUNK_SIZE):
+    """Stream a file (set or sample) through sha256 (hashlib releases the GIL, so threads hash in parallel)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Where decompressed copies of .als files are kept for repeat runs (off unless set)
+XML_CACHE_DIR = os.environ.get("ABLETON_XML_CACHE_DIR") or None
+
+def _cached_xml_path(path, cache_dir):
+    """Decompress a gzip .als into cache_dir once; later runs with the same mtime/size reuse it."""
+    stat = os.stat(path)
+    prefix = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    cached = os.path.join(cache_dir, f"{prefix}-{stat.st_mtime_ns}-{stat.st_size}.xml")
+    if os.path.exists(cached):
+        return cached
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = cached + f".{os.getpid()}.part"
+    with gzip.open(path, "rb") as f_in, open(temp_file, "wb") as f_out:
+        while True:
+            data = f_in.read(PARSE_CHUNK_SIZE)
+            if not data:
+                break
+            f_out.write(data)
+    os.replace(temp_file, cached)
+    # Drop copies of older versions of the same set
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix + "-") and name.endswith(".xml") and os.path.join(cache_dir, name) != cached:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+    return cached
+
+@contextmanager
+def _mapped(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b"")
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+@contextmanager
+def open_set_view(input_file, cache_dir=XML_CACHE_DIR):
+    """Yield a read-only memoryview of a set's XML, whatever form it arrives in.
+
+    gzip and plain XML are told apart by their magic bytes. Plain XML files (and decompressed
+    cache files when cache_dir is set) are memory-mapped, and in-memory uploads (BytesIO/bytes)
+    are viewed in place, so parsers and byte-level scanners never copy the document.
+    The view is only valid inside the with block.
+    """
+    if isinstance(input_file, (str, os.PathLike)):
+        with open(input_file, "rb") as f:
+            compressed = f.read(2) == GZIP_MAGIC
+        if not compressed:
+            with _mapped(input_file) as view:
+                yield view
+        elif cache_dir:
+            with _mapped(_cached_xml_path(input_file, cache_dir)) as view:
+                yield view
+        else:
+            with gzip.open(input_file, "rb") as f_in:
+                yield memoryview(f_in.read())
+        return
+
+    if isinstance(input_file, io.BytesIO):
+        data = input_file.getbuffer()
+    elif isinstance(input_file, (bytes, bytearray, memoryview)):
+        data = memoryview(input_file)
+    else:
+        data = memoryview(input_file.read())
+    try:
+        if data[:2] == GZIP_MAGIC:
+            yield memoryview(gzip.decompress(data))
+        else:
+            yield data
+    finally:
+        if isinstance(input_file, io.BytesIO):
+            data.release()
+
+def parse_view(view):
+    """Parse XML from a memoryview by feeding zero-copy slices to the parser."""
+    parser = ET.XMLParser()
+    for offset in range(0, len(view), PARSE_CHUNK_SIZE):
+        parser.feed(view[offset:offset + PARSE_CHUNK_SIZE])
+    return ET.ElementTree(parser.close())
+
+def load_als(input_file, cache_dir=XML_CACHE_DIR):
+    """Parse a set (gzip .als or plain XML; path, bytes or file object) and return the ElementTree."""
+    with open_set_view(input_file, cache_dir) as view:
+        return parse_view(view)
+
+_TRACK_START = re.compile(rb"<(?:AudioTrack|MidiTrack|GroupTrack) Id=")
+
+def measure_set(input_file, cache_dir=XML_CACHE_DIR):
+    """Return (XML size in bytes, track count) by scanning the set's bytes, without building a tree."""
+    with open_set_view(input_file, cache_dir) as view:
+        return len(view), sum(1 for _ in _TRACK_START.finditer(view))
+
+def save_als(tree, output_file):
+    """Serialize the tree straight into a gzip stream (path or file object).
+
+    A path is written under a temp name and renamed into place once complete, so a crash or
+    error never leaves a half-written set behind.
+    """
+    if not isinstance(output_file, (str, os.PathLike)):
+        with gzip.open(output_file, "wb") as f_out:
+            tree.write(f_out, encoding="utf-8", xml_declaration=True)
+        return
+    temp_file = f"{os.fspath(output_file)}.{os.getpid()}.part"
+    try:
+        with open(temp_file, "wb") as f_raw:
+            with gzip.GzipFile(filename=os.path.basename(os.fspath(output_file)), mode="wb", fileobj=f_raw) as f_out:
+                tree.write(f_out, encoding="utf-8", xml_declaration=True)
+            f_raw.flush()
+            os.fsync(f_raw.fileno())
+        os.replace(temp_file, output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+def campus_output_name(original_filename, campus=None):
+    """Build the routed output filename, optionally tagged with a campus."""
+    base_name = os.path.splitext(os.path.basename(original_filename))[0]
+    if campus:
+        campus_for_filename = campus.replace(" ", "").replace("ñ", "n")
+        return f"{base_name}_{campus_for_filename}_routed.als"
+    return f"{base_name}_routed.als"
+
+# --- Memory instrumentation ---
+
+@contextmanager
+def memory_stage(stages, name):
+    """Record the traced memory of one processing stage into stages[name] (in bytes).
+
+    peak is the most the stage allocated on top of what was live when it started, retained is
+    what it left allocated and high_water the total traced at the stage's peak (the overall peak
+    of a run is the largest high_water). Does nothing unless stages is a dict and tracemalloc
+    is tracing.
+    """
+    if stages is None or not tracemalloc.is_tracing():
+        yield
+        return
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        stages[name] = {"peak": peak - before, "retained": current - before, "high_water": peak}
+
+def format_memory_report(stages):
+    return ", ".join(f"{name} peak {stage['peak'] / 1e6:.1f} MB (kept {stage['retained'] / 1e6:.1f} MB)"
+                     for name, stage in stages.items())
+
+# What a child track's output looks like when it feeds its parent group
+GROUP_FEED_ROUTING = {"Target": "AudioOut/GroupTrack", "UpperDisplayString": "Group", "LowerDisplayString": ""}
+
+# action is "routed" (own rule), "group" (feeds a routed parent group), "kept" (no rule applies) or
+# "unrouted" (only a fuzzy match for an exact-only output such as the click; match is that match);
+# muted is True when the track is silenced by a mute rule (its own or its group's)
+RouteResult = namedtuple("RouteResult", ["track_id", "track_name", "match", "action", "muted"])
+
+def track_name_of(track):
+    name_elem = track.find("Name/EffectiveName")
+    return name_elem.get("Value") if name_elem is not None else None
+
+def build_group_index(root):
+    """One pass over the set's Tracks: returns (tracks in document order, {track id: parent group id}).
+
+    Live writes a group before the tracks it contains, so walking this list once is enough to
+    resolve every track's inherited rule from its parent's.
+    """
+    tracks_elem = root.find(".//Tracks")
+    if tracks_elem is None:
+        return [], {}
+    tracks = [track for track in tracks_elem if track.tag in TRACK_TYPES]
+    parents = {}
+    for track in tracks:
+        group_elem = track.find("TrackGroupId")
+        group_id = group_elem.get("Value", "-1") if group_elem is not None else "-1"
+        if group_id != "-1":
+            parents[track.get("Id")] = group_id
+    return tracks, parents
+
+def _output_routing_elems(track, track_name, log):
+    """Find (or create) DeviceChain/AudioOutputRouting and its Target/Upper/Lower/MpeSettings children."""
+    device_chain = track.find("DeviceChain")
+    if device_chain is None:
+        _log(log, f"No DeviceChain found for {track_name}, creating one, XML Path: {track.tag}")
+        device_chain = ET.SubElement(track, "DeviceChain")
+
+    output_elem = device_chain.find("AudioOutputRouting")
+    if output_elem is None:
+        _log(log, f"No AudioOutputRouting found for {track_name}, creating one, XML Path: {track.tag}")
+        output_elem = ET.SubElement(device_chain, "AudioOutputRouting")
+        target_elem = ET.SubElement(output_elem, "Target")
+        upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
+        lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
+        mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+    else:
+        target_elem = output_elem.find("Target")
+        if target_elem is None:
+            target_elem = ET.SubElement(output_elem, "Target")
+        upper_elem = output_elem.find("UpperDisplayString")
+        if upper_elem is None:
+            upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
+        lower_elem = output_elem.find("LowerDisplayString")
+        if lower_elem is None:
+            lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
+        mpe_settings = output_elem.find("MpeSettings")
+        if mpe_settings is None:
+            mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+    return device_chain, target_elem, upper_elem, lower_elem, mpe_settings
+
+def _set_output(elems, target, upper, lower):
+    device_chain, target_elem, upper_elem, lower_elem, mpe_settings = elems
+    target_elem.set("Value", target)
+    upper_elem.set("Value", upper)
+    lower_elem.set("Value", lower)
+    if mpe_settings.text or list(mpe_settings):
+        mpe_settings.text = None
+        mpe_settings.clear()
+
+def _apply_mixer_rules(device_chain, track, track_name, mute, gain_db, log):
+    # --- Mute Logic (Updated to use Speaker) ---
+    mixer = device_chain.find("Mixer")
+    if mixer is None:
+        _log(log, f"No Mixer found for {track_name}, creating one, XML Path: {track.tag}")
+        mixer = ET.SubElement(device_chain, "Mixer")
+
+    speaker = mixer.find("Speaker")
+    if speaker is None:
+        _log(log, f"No Speaker found for {track_name}, creating one, XML Path: {track.tag}")
+        speaker = ET.SubElement(mixer, "Speaker")
+        manual_speaker = ET.SubElement(speaker, "Manual")
+        manual_speaker.set("Value", "true")
+    else:
+        manual_speaker = speaker.find("Manual")
+        if manual_speaker is None:
+            manual_speaker = ET.SubElement(speaker, "Manual")
+            manual_speaker.set("Value", "true")
+
+    # mute is True (mute), False (un-mute) or None (leave as is)
+    current_speaker_state = manual_speaker.get("Value")
+    if mute:
+        manual_speaker.set("Value", "false")
+        _log(log, f"Muted track: {track_name} (Speaker was {current_speaker_state})")
+    elif mute is False and current_speaker_state == "false":
+        manual_speaker.set("Value", "true")
+        _log(log, f"Un-muted track: {track_name}")
+
+    # --- Volume Adjustment Logic ---
+    volume = mixer.find("Volume")
+    if volume is None:
+        _log(log, f"No Volume found for {track_name}, creating one, XML Path: {track.tag}")
+        volume = ET.SubElement(mixer, "Volume")
+        manual_volume = ET.SubElement(volume, "Manual")
+        manual_volume.set("Value", "0.794328")  # Default to 0 dB
+    else:
+        manual_volume = volume.find("Manual")
+        if manual_volume is None:
+            manual_volume = ET.SubElement(volume, "Manual")
+            manual_volume.set("Value", "0.794328")
+
+    current_volume = float(manual_volume.get("Value"))
+    if gain_db:
+        # Convert current volume to dB
+        current_db = 20 * math.log10(current_volume) if current_volume > 0 else -float('inf')
+        # Apply the rule's gain change
+        new_db = current_db + gain_db
+        # Convert back to linear
+        new_volume = 10 ** (new_db / 20) if new_db > -float('inf') else 0.0
+        manual_volume.set("Value", str(new_volume))
+        _log(log, f"Adjusted volume for {track_name}: {current_volume} ({current_db:.2f} dB) → {new_volume} ({new_db:.2f} dB)")
+
+def route_track(track, log=None, inherited=None, rules=None, group_name=None):
+    """Apply the routing rules to a single track element.
+
+    inherited is the state of the track's parent group from route_tree: (effective decision,
+    muted, turned down). A child without its own output rule (or with the same output as its
+    group) keeps feeding the group, and a mute/turn-down already applied upstream isn't applied
+    twice. A child whose rule names a different output overrides the group and is routed directly.
+
+    Returns (RouteResult, state for the track's own children).
+    """
+    rules = rules or RULES.variant()
+    track_name = track_name_of(track)
+    parent_decision, parent_muted, parent_turned_down = inherited or (NO_DECISION, False, False)
+
+    if not track_name or track_name.strip() == "":
+        _log(log, f" skipping track with no name or empty name, XML Path: {track.tag}")
+        return RouteResult(track.get("Id"), track_name, None, "kept", False), (parent_decision, parent_muted, parent_turned_down)
+
+    # --- Routing Logic ---
+    elems = _output_routing_elems(track, track_name, log)
+    device_chain, target_elem, upper_elem, lower_elem, mpe_settings = elems
+
+    current_target = target_elem.get("Value", "None")
+    current_upper = upper_elem.get("Value", "None")
+    current_lower = lower_elem.get("Value", "None")
+    current_routing = f"Target: {current_target}, Upper: {current_upper}, Lower: {current_lower}"
+    _log(log, f"Track: {track_name}, Current Routing: {current_routing}, XML Path: {track.tag}")
+
+    decision = rules.decide(TrackFacts(track, track_name, group_name, _clip_count))
+    output, match = decision.output, decision.match
+    if output is not None and parent_decision.output is not None and \
+            output["Target"] == parent_decision.output["Target"]:
+        # Same destination as the group: keep the signal flowing through the group
+        output = match = None
+
+    feeds_group = False
+    if output is not None:
+        _set_output(elems, output["Target"], output["UpperDisplayString"], output["LowerDisplayString"])
+        action = "routed"
+        _log(log, f"Updated Routing: {track_name} → {output['Target']} ({output['LowerDisplayString']}) [{match.tier} match on {match.key}, score {match.score:.2f}]")
+    elif parent_decision.output is not None:
+        _set_output(elems, GROUP_FEED_ROUTING["Target"], GROUP_FEED_ROUTING["UpperDisplayString"], GROUP_FEED_ROUTING["LowerDisplayString"])
+        action = "group"
+        feeds_group = True
+        _log(log, f"Group Routing: {track_name} → parent group (inherits {parent_decision.match.key})")
+    elif decision.held is not None:
+        action = "unrouted"
+        match = decision.held
+        _log(log, f"Not routing {track_name}: only a fuzzy match on {match.key} (score {match.score:.2f}), "
+                  f"which needs a closer name match—keeping current routing: {current_routing}")
+    else:
+        action = "kept"
+        _log(log, f"No matching routing for {track_name}—keeping current routing: {current_routing}")
+
+    mute = decision.mute
+    if mute and feeds_group and parent_muted:
+        mute = None
+    gain_db = decision.gain_db
+    if gain_db and feeds_group and parent_turned_down:
+        gain_db = None
+    _apply_mixer_rules(device_chain, track, track_name, mute, gain_db, log)
+
+    effective = decision._replace(output=output, match=match) if output is not None else parent_decision
+    muted = bool(mute) or (feeds_group and parent_muted)
+    turned_down = bool(gain_db) or (feeds_group and parent_turned_down)
+    return RouteResult(track.get("Id"), track_name, match, action, muted), (effective, muted, turned_down)
+
+def route_tree(root, log=None, campus=None):
+    """Route every Audio/Midi/Group track in a parsed set, cascading group rules to their children.
+
+    campus selects that campus's rule overrides. Returns a list of RouteResult, one per track,
+    in document order.
+    """
+    rules = RULES.variant(campus)
+    tracks, parents = build_group_index(root)
+    states = {}
+    group_names = {}
+    results = []
+    for track in tracks:
+        parent_id = parents.get(track.get("Id"))
+        inherited = states.get(parent_id)
+        result, state = route_track(track, log, inherited, rules, group_names.get(parent_id))
+        if track.tag == "GroupTrack":
+            states[track.get("Id")] = state
+            group_names[track.get("Id")] = result.track_name
+        results.append(result)
+    return results
+
+# --- Samples ---
+
+def sample_refs(root):
+    """Yield (track, FileRef element) for every sample used by a track: session and
+    arrangement clips as well as sampler devices."""
+    tracks, _ = build_group_index(root)
+    for track in tracks:
+        for sample_ref in track.iter("SampleRef"):
+            file_ref = sample_ref.find("FileRef")
+            if file_ref is not None:
+                yield track, file_ref
+
+def sample_file_candidates(relative_path, absolute_path, project_dir=None):
+    """Where a sample may be on this machine: relative to the set's folder first, then the
+    absolute path Live stored."""
+    candidates = []
+    if relative_path and project_dir:
+        candidates.append(os.path.normpath(os.path.join(project_dir, relative_path)))
+    if absolute_path:
+        candidates.append(absolute_path)
+    elif relative_path and not project_dir:
+        candidates.append(relative_path)
+    return candidates
+
+def first_existing_file(candidates):
+    """The first candidate path that exists, or None."""
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+def sample_path_candidates(file_ref, project_dir=None):
+    """Candidate paths for a FileRef's sample (see sample_file_candidates)."""
+    relative_elem = file_ref.find("RelativePath")
+    path_elem = file_ref.find("Path")
+    return sample_file_candidates(relative_elem.get("Value", "") if relative_elem is not None else "",
+                                  path_elem.get("Value", "") if path_elem is not None else "", project_dir)
+
+def resolve_sample_path(file_ref, project_dir=None):
+    """The first candidate path that exists, or None."""
+    return first_existing_file(sample_path_candidates(file_ref, project_dir))
+
+# --- Per-track editing (interactive preview) ---
+
+MAIN_OUTPUT_ROUTING = {"Target": "AudioOut/Main", "UpperDisplayString": "Master", "LowerDisplayString": ""}
+DEFAULT_VOLUME = "0.794328"
+
+def _value_of(elem, path, default=""):
+    found = elem.find(path)
+    return found.get("Value", default) if found is not None else default
+
+def output_label(target, upper, lower):
+    """Short label for an output routing, as shown in the editor ("Ext. Out 5/6", "Group", "Master")."""
+    if target == GROUP_FEED_ROUTING["Target"]:
+        return "Group"
+    if target == MAIN_OUTPUT_ROUTING["Target"]:
+        return "Master"
+    return f"{upper} {lower}".strip() or target
+
+def output_choices(root=None):
+    """{label: (Target, Upper, Lower)} for every rules-file output, plus any other output used in the set."""
+    choices = {
+        "Master": tuple(MAIN_OUTPUT_ROUTING.values()),
+        "Group": tuple(GROUP_FEED_ROUTING.values()),
+    }
+    for output in RULES.outputs.values():
+        routing = (output["Target"], output["UpperDisplayString"], output["LowerDisplayString"])
+        choices.setdefault(output_label(*routing), routing)
+    if root is not None:
+        for output_elem in root.iter("AudioOutputRouting"):
+            routing = tuple(_value_of(output_elem, tag) for tag in ("Target", "UpperDisplayString", "LowerDisplayString"))
+            if routing[0] and routing[0] != "AudioOut/None":
+                choices.setdefault(output_label(*routing), routing)
+    return choices
+
+def _mixer_manual(device_chain, name, default):
+    mixer = device_chain.find("Mixer")
+    if mixer is None:
+        mixer = ET.SubElement(device_chain, "Mixer")
+    parameter = mixer.find(name)
+    if parameter is None:
+        parameter = ET.SubElement(mixer, name)
+    manual = parameter.find("Manual")
+    if manual is None:
+        manual = ET.SubElement(parameter, "Manual")
+        manual.set("Value", default)
+    return manual
+
+def volume_to_db(volume):
+    return round(20 * math.log10(volume), 1) if volume > 0 else -float('inf')
+
+def track_state(track):
+    """Current (output label, muted, gain in dB) of a track element."""
+    device_chain = track.find("DeviceChain")
+    if device_chain is None:
+        return "Master", False, volume_to_db(float(DEFAULT_VOLUME))
+    output = output_label(*(_value_of(device_chain, f"AudioOutputRouting/{tag}")
+                            for tag in ("Target", "UpperDisplayString", "LowerDisplayString")))
+    muted = _value_of(device_chain, "Mixer/Speaker/Manual", "true") == "false"
+    volume = float(_value_of(device_chain, "Mixer/Volume/Manual", DEFAULT_VOLUME))
+    return output, muted, volume_to_db(volume)
+
+def apply_track_state(track, output, muted, gain_db, choices):
+    """Set one track's output, mute and gain, touching only the values that differ from the set.
+
+    Returns True if anything changed. Only this track's elements are modified, so the editor can
+    re-apply a single edited row without re-routing the whole set.
+    """
+    current_output, current_muted, current_db = track_state(track)
+    track_name = track_name_of(track)
+    changed = False
+    if output != current_output:
+        _set_output(_output_routing_elems(track, track_name, None), *choices[output])
+        changed = True
+    device_chain = track.find("DeviceChain")
+    if muted != current_muted:
+        _mixer_manual(device_chain, "Speaker", "true").set("Value", "false" if muted else "true")
+        changed = True
+    if gain_db != current_db:
+        new_volume = 10 ** (gain_db / 20) if gain_db > -float('inf') else 0.0
+        _mixer_manual(device_chain, "Volume", DEFAULT_VOLUME).set("Value", str(new_volume))
+        changed = True
+    return changed
+
+# --- Slimming (optional, for playback rigs) ---
+
+_TRACK_REFERENCE = re.compile(r"Track\.(\d+)")
+
+def _clip_count(track):
+    """Session clips plus arrangement clips on a track."""
+    device_chain = track.find("DeviceChain")
+    if device_chain is None:
+        return 0
+    return (
+        len(device_chain.findall("MainSequencer/ClipSlotList/ClipSlot/ClipSlot/Value/*"))
+        + len(device_chain.findall("MainSequencer/Sample/ArrangerAutomation/Events/*"))
+        + len(device_chain.findall("MainSequencer/ClipTimeable/ArrangerAutomation/Events/*"))
+    )
+
+def _slot_has_clip(slot):
+    value = slot.find("ClipSlot/Value")
+    return value is not None and len(value) > 0
+
+def slim_tree(root, results, log=None):
+    """Drop clutter a playback rig never needs. Returns a dict of what was removed.
+
+    - Audio/MIDI tracks silenced by a mute rule that hold no clips and that no other track
+      routes from are deleted.
+    - Trailing scenes with no clips, name, tempo or time signature are trimmed, together with
+      the matching clip slots on every track (Live needs one slot per scene).
+    - The preview (PreHearTrack) device chain and automation are cleared.
+    """
+    stats = {"elements_before": sum(1 for _ in root.iter()), "tracks_removed": 0,
+             "scenes_removed": 0, "clip_slots_removed": 0, "prehear_elements_removed": 0}
+    live_set = root.find("LiveSet")
+    if live_set is None:
+        live_set = root
+    tracks_elem = live_set.find("Tracks")
+
+    # --- Muted, empty tracks ---
+    if tracks_elem is not None:
+        referenced = set()
+        for target in root.iter("Target"):
+            referenced.update(_TRACK_REFERENCE.findall(target.get("Value", "")))
+        muted_ids = {result.track_id for result in results if result.muted}
+        for track in list(tracks_elem):
+            if track.tag not in ("AudioTrack", "MidiTrack") or track.get("Id") not in muted_ids:
+                continue
+            if track.get("Id") in referenced or _clip_count(track) > 0:
+                continue
+            tracks_elem.remove(track)
+            stats["tracks_removed"] += 1
+            _log(log, f"Slim: removed muted empty track {track_name_of(track)}")
+
+    # --- Trailing empty scenes ---
+    scenes_elem = live_set.find("Scenes")
+    if scenes_elem is not None and len(scenes_elem) > 1:
+        slot_lists = list(root.iter("ClipSlotList"))
+        group_slot_lists = [group.find("Slots") for group in root.iter("GroupTrack") if group.find("Slots") is not None]
+        last_used = 0
+        for index, scene in enumerate(scenes_elem):
+            name = scene.find("Name")
+            if (name is not None and name.get("Value")) or \
+                    scene.find("IsTempoEnabled[@Value='true']") is not None or \
+                    scene.find("IsTimeSignatureEnabled[@Value='true']") is not None:
+                last_used = index
+        for slot_list in slot_lists:
+            for index, slot in enumerate(slot_list):
+                if index > last_used and _slot_has_clip(slot):
+                    last_used = index
+
+        keep = last_used + 1
+        if keep < len(scenes_elem):
+            for scene in list(scenes_elem)[keep:]:
+                scenes_elem.remove(scene)
+                stats["scenes_removed"] += 1
+            for slot_list in slot_lists + group_slot_lists:
+                for slot in list(slot_list)[keep:]:
+                    slot_list.remove(slot)
+                    stats["clip_slots_removed"] += 1
+            _log(log, f"Slim: trimmed {stats['scenes_removed']} empty trailing scenes")
+
+    # --- Preview track state ---
+    prehear = live_set.find("PreHearTrack")
+    if prehear is not None:
+        before = sum(1 for _ in prehear.iter())
+        for container in (prehear.find("DeviceChain/DeviceChain/Devices"), prehear.find("AutomationEnvelopes/Envelopes")):
+            if container is not None:
+                for child in list(container):
+                    container.remove(child)
+        stats["prehear_elements_removed"] = before - sum(1 for _ in prehear.iter())
+
+    stats["elements_after"] = sum(1 for _ in root.iter())
+    return stats
+
+def format_slim_report(stats):
+    saved = stats["elements_before"] - stats["elements_after"]
+    report = (f"{saved} of {stats['elements_before']} XML elements removed "
+              f"({stats['tracks_removed']} tracks, {stats['scenes_removed']} scenes, {stats['clip_slots_removed']} clip slots)")
+    if "bytes_before" in stats:
+        report += f", {stats['bytes_before']:,} → {stats['bytes_after']:,} bytes"
+    return report
+
+# --- Device deactivation (optional, for weak playback rigs) ---
+
+def _automated_pointees(track):
+    return {pointee.get("Value") for pointee in track.iterfind("AutomationEnvelopes/Envelopes/AutomationEnvelope/EnvelopeTarget/PointeeId")}
+
+def deactivate_muted_devices(root, results, log=None):
+    """Switch off the devices on tracks silenced by a mute rule, so they stop using CPU. Returns counts.
+
+    Muting only turns the track's speaker off; its instruments and effects keep processing.
+    Only top-level devices are switched off (a rack that is off stops its chains too). Tracks are
+    left alone when another track routes or side-chains from them, or when a MIDI track sends
+    MIDI out (its MIDI effects shape what the gear receives). Devices whose On switch is automated
+    are skipped, since the automation would turn them back on.
+    """
+    stats = {"tracks": 0, "devices_disabled": 0, "already_off": 0, "automated": 0, "tracks_skipped": 0}
+    referenced = set()
+    for target in root.iter("Target"):
+        referenced.update(_TRACK_REFERENCE.findall(target.get("Value", "")))
+    muted_ids = {result.track_id for result in results if result.muted}
+    tracks, _ = build_group_index(root)
+    for track in tracks:
+        if track.get("Id") not in muted_ids:
+            continue
+        track_name = track_name_of(track)
+        midi_out = _value_of(track, "DeviceChain/MidiOutputRouting/Target", "MidiOut/None")
+        if track.get("Id") in referenced or (track.tag == "MidiTrack" and midi_out != "MidiOut/None"):
+            stats["tracks_skipped"] += 1
+            _log(log, f"Devices: left {track_name} running (its signal is used elsewhere)")
+            continue
+        automated = _automated_pointees(track)
+        disabled = 0
+        for device in track.iterfind("DeviceChain/DeviceChain/Devices/*"):
+            switch = device.find("On")
+            manual = switch.find("Manual") if switch is not None else None
+            if manual is None:
+                continue
+            target = switch.find("AutomationTarget")
+            if target is not None and target.get("Id") in automated:
+                stats["automated"] += 1
+            elif manual.get("Value") == "false":
+                stats["already_off"] += 1
+            else:
+                manual.set("Value", "false")
+                disabled += 1
+        if disabled:
+            stats["tracks"] += 1
+            stats["devices_disabled"] += disabled
+            _log(log, f"Devices: switched off {disabled} devices on muted track {track_name}")
+    return stats
+
+def format_deactivate_report(stats):
+    report = f"{stats['devices_disabled']} devices switched off on {stats['tracks']} muted tracks"
+    details = [f"{stats[key]} {label}" for key, label in (("already_off", "already off"), ("automated", "automated, left on"),
+                                                           ("tracks_skipped", "tracks feeding others skipped")) if stats[key]]
+    return report + (f" ({', '.join(details)})" if details else "")
+
+def process_als(input_file, output_file, log=None, slim=False, deactivate=False, campus=None, stages=None):
+    """Route input_file (with campus's rule overrides) and write the result to output_file. Raises on failure.
+
+    Pass a dict as stages (with tracemalloc running) to get per-stage memory, see memory_stage.
+    deactivate switches off the devices on rule-muted tracks (see deactivate_muted_devices).
+    Returns True, or the slim report dict when slim is set.
+    """
+    with memory_stage(stages, "load"):
+        tree = load_als(input_file)
+    with memory_stage(stages, "route"):
+        results = route_tree(tree.getroot(), log, campus)
+    with memory_stage(stages, "slim"):
+        stats = slim_tree(tree.getroot(), results, log) if slim else None
+    if deactivate:
+        _log(log, f"Devices: {format_deactivate_report(deactivate_muted_devices(tree.getroot(), results, log))}")
+    with memory_stage(stages, "save"):
+        save_als(tree, output_file)
+    if stages is not None:
+        _log(log, f"Memory: {format_memory_report(stages)}")
+    if stats is not None and isinstance(input_file, str) and isinstance(output_file, str):
+        stats["bytes_before"] = os.path.getsize(input_file)
+        stats["bytes_after"] = os.path.getsize(output_file)
+    if stats is not None:
+        _log(log, f"Slim: {format_slim_report(stats)}")
+        return stats
+    return True
+
+def route_upload(file_data, original_filename, slim=False, deactivate=False, campus=None, stages=None):
+    """Route one uploaded set held in memory (the Streamlit apps' worker entry point).
+
+    Returns (output bytes, output filename, notes), where notes are the messages the app
+    shows for non-exact matches and the slim and device reports. deactivate and stages work
+    as in process_als.
+    """
+    with memory_stage(stages, "load"):
+        tree = load_als(io.BytesIO(file_data))
+    with memory_stage(stages, "route"):
+        results = route_tree(tree.getroot(), campus=campus)
+    notes = [
+        f"'{result.track_name}' routed as '{result.match.key}' ({result.match.tier} match, score {result.match.score:.2f})"
+        for result in results if result.action == "routed" and result.match.tier != "exact"
+    ]
+    notes.extend(
+        f"'{result.track_name}' left unrouted: only a fuzzy match on '{result.match.key}' (score {result.match.score:.2f})"
+        for result in results if result.action == "unrouted"
+    )
+    with memory_stage(stages, "slim"):
+        stats = slim_tree(tree.getroot(), results) if slim else None
+    if deactivate:
+        notes.append(f"{original_filename}: {format_deactivate_report(deactivate_muted_devices(tree.getroot(), results))}")
+
+    output_buffer = io.BytesIO()
+    with memory_stage(stages, "save"):
+        save_als(tree, output_buffer)
+    if stats is not None:
+        stats["bytes_before"] = len(file_data)
+        stats["bytes_after"] = output_buffer.getbuffer().nbytes
+        notes.append(f"Slimmed {original_filename}: {format_slim_report(stats)}")
+    # The tree is no longer needed; drop it before copying the output out of the buffer
+    del tree, results
+    with memory_stage(stages, "output copy"):
+        output_bytes = output_buffer.getvalue()
+    output_buffer.close()
+
+    base_name = os.path.splitext(original_filename)[0]
+    return output_bytes, f"{base_name}_routed.als", notes
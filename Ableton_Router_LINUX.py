@@ -1,282 +1,270 @@
-import gzip
-import xml.etree.ElementTree as ET
 import os
-import tempfile
-import math
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-# Routing rules mapping track names to routing values
-ROUTING_MAP = {
-    "GUIDE": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CUES": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CLICK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CLICK TRACK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "GUIDE TRACK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "SUB BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "SYNTH BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "SUB": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "HOOKS": {"Target": "AudioOut/External/S1", "LowerDisplayString": "3/4"},
-    "AG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "BGV": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "BGVS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITARS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 11": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 11": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "SYNTH": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "ACOUSTIC": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "ACOUSTIC GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PIANO": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PIANO LINE": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GANG VOCALS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "VOCALS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PERC": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "DRUMS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "LOOP": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "LOOP 2": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "TAMBO": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "TAMBORINE": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "FX": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "SYNTH FX": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "HITS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "PERC HITS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "ORGAN": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GANG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-}
+import Ableton_Router_Engine as engine
+from Ableton_Router_Profile import run_profiled, ProfileReport
+from Ableton_Batch_Journal import BatchJournal, DEFAULT_JOURNAL, RUNNING, DONE, FAILED
 
-# Define tracks to mute and turn down
-MUTE_TRACKS = {"BASS", "DRUMS", "AG", "ACOUSTIC", "ACOUSTIC GUITAR", "PIANO"}
-TURN_DOWN_TRACKS = {"CHOIR", "BGV", "BGVS", "GANG VOCALS", "VOCALS", "CHOIR 1", "CHOIR 2", "GANG"}
-VOLUME_REDUCTION_DB = -10  # Reduce volume by 10 dB
+def output_name_for(input_file):
+    """Pick <name>_routed.als next to the input, adding _1, _2... rather than overwriting."""
+    base_name = os.path.splitext(input_file)[0]
+    output_filename = f"{base_name}_routed.als"
+    counter = 1
+    while os.path.exists(output_filename):
+        output_filename = f"{base_name}_routed_{counter}.als"
+        counter += 1
+    return output_filename
 
-def process_als(input_file, output_file):
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_xml = os.path.join(temp_dir, "temp.xml")
-            temp_modified_xml = os.path.join(temp_dir, "temp_modified.xml")
-
-            # Decompress .als file to XML
-            with gzip.open(input_file, "rb") as f_in:
-                with open(temp_xml, "wb") as f_out:
-                    f_out.write(f_in.read())
+def _route_file(input_file, output_file, deactivate=False):
+    # Worker process entry point: raises on failure, the batch collects the error
+    engine.process_als(input_file, output_file, log=print, deactivate=deactivate)
+    return output_file
 
-            # Parse XML
-            tree = ET.parse(temp_xml)
-            root = tree.getroot()
+class BatchWorker(threading.Thread):
+    """Route files on a process pool and report progress to the GUI through a queue.
 
-            # Process each track
-            for track_type in ["AudioTrack", "MidiTrack", "GroupTrack"]:
-                for track in root.findall(f".//{track_type}"):
-                    name_elem = track.find(".//Name/EffectiveName")
-                    track_name = name_elem.get("Value") if name_elem is not None else None
-
-                    if not track_name or track_name.strip() == "":
-                        print(f" skipping track with no name or empty name, XML Path: {track.tag}")
-                        continue
+    Messages are ("start", path), ("done", path, output file), ("error", path, message) and
+    finally ("finished", cancelled). Cancelling stops new files from starting; files already
+    being routed are allowed to finish so no half-written output is left behind. With a
+    profile_dir every file is profiled, and the batch report is written there at the end.
+    With a journal (already begun) every file's progress is recorded so the batch can be resumed.
+    deactivate switches off the devices on rule-muted tracks.
+    """
 
-                    # --- Routing Logic ---
-                    device_chain = track.find("DeviceChain")
-                    if device_chain is None:
-                        print(f"No DeviceChain found for {track_name}, creating one, XML Path: {track.tag}")
-                        device_chain = ET.SubElement(track, "DeviceChain")
+    def __init__(self, files, messages, workers=None, profile_dir=None, journal=None, deactivate=False):
+        super().__init__(daemon=True)
+        self.files = files
+        self.messages = messages
+        self.workers = workers or max(1, min(len(files), (os.cpu_count() or 2) // 2))
+        self.cancel_event = threading.Event()
+        self.profile_dir = profile_dir
+        self.profiles = ProfileReport()
+        self.journal = journal
+        self.deactivate = deactivate
 
-                    output_elem = device_chain.find("AudioOutputRouting")
-                    if output_elem is None:
-                        print(f"No AudioOutputRouting found for {track_name}, creating one, XML Path: {track.tag}")
-                        output_elem = ET.SubElement(device_chain, "AudioOutputRouting")
-                        target_elem = ET.SubElement(output_elem, "Target")
-                        upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
-                        lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
-                        mpe_settings = ET.SubElement(output_elem, "MpeSettings")
-                    else:
-                        target_elem = output_elem.find("Target")
-                        if target_elem is None:
-                            target_elem = ET.SubElement(output_elem, "Target")
-                        upper_elem = output_elem.find("UpperDisplayString")
-                        if upper_elem is None:
-                            upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
-                        lower_elem = output_elem.find("LowerDisplayString")
-                        if lower_elem is None:
-                            lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
-                        mpe_settings = output_elem.find("MpeSettings")
-                        if mpe_settings is None:
-                            mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+    def _record(self, input_file, state, error=None, digest=None):
+        if self.journal is not None:
+            self.journal.mark(input_file, state, error, digest)
 
-                    current_target = target_elem.get("Value", "None") if target_elem is not None else "None"
-                    current_upper = upper_elem.get("Value", "None") if upper_elem is not None else "None"
-                    current_lower = lower_elem.get("Value", "None") if lower_elem is not None else "None"
-                    current_routing = f"Target: {current_target}, Upper: {current_upper}, Lower: {current_lower}"
-                    print(f"Track: {track_name}, Current Routing: {current_routing}, XML Path: {track.tag}")
+    def _digest(self, input_file):
+        # Hashed here rather than when the batch is set up, so the window opens straight away
+        if self.journal is None:
+            return None
+        try:
+            return engine.file_sha256(input_file)
+        except OSError:
+            return None
 
-                    found_match = False
-                    for keyword, routing_dict in ROUTING_MAP.items():
-                        if keyword.upper() == track_name.upper():
-                            target_elem.set("Value", routing_dict["Target"])
-                            upper_elem.set("Value", "Ext. Out")
-                            lower_elem.set("Value", routing_dict["LowerDisplayString"])
-                            if not mpe_settings.text and not list(mpe_settings):
-                                pass
-                            else:
-                                mpe_settings.text = None
-                                mpe_settings.clear()
+    def cancel(self):
+        self.cancel_event.set()
 
-                            print(f"Updated Routing: {track_name} → {routing_dict['Target']} ({routing_dict['LowerDisplayString']})")
-                            print(f"Final AudioOutputRouting for {track_name}:")
-                            print(ET.tostring(output_elem, encoding='unicode').strip())
-                            print(f"Parent DeviceChain for {track_name}:")
-                            print(ET.tostring(device_chain, encoding='unicode').strip())
-                            found_match = True
-                            break
+    def run(self):
+        pending = list(self.files)
+        try:
+            self._run(pending)
+        except Exception as e:
+            # e.g. a broken pool: report the files that never ran instead of hanging the window
+            for input_file in pending:
+                self.messages.put(("error", input_file, str(e)))
+            pending.clear()
+        finally:
+            if self.profile_dir and self.profiles.profiles:
+                self.profiles.write(self.profile_dir)
+                print(self.profiles.format_summary())
+            self.messages.put(("finished", self.cancel_event.is_set() and bool(pending)))
 
-                    if not found_match:
-                        print(f"No matching routing for {track_name}—keeping current routing: {current_routing}")
+    def _run(self, pending):
+        in_flight = {}
+        # Spawned (not forked) workers: the parent is a threaded Tk process
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            while (pending and not self.cancel_event.is_set()) or in_flight:
+                while pending and len(in_flight) < self.workers and not self.cancel_event.is_set():
+                    input_file = pending.pop(0)
+                    if not input_file.lower().endswith(".als"):
+                        self._record(input_file, FAILED, "Not an .als file.")
+                        self.messages.put(("error", input_file, "Not an .als file."))
+                        continue
+                    self.messages.put(("start", input_file))
+                    output_file = self.journal.output_for(input_file) if self.journal else output_name_for(input_file)
+                    self._record(input_file, RUNNING, digest=self._digest(input_file))
+                    if self.profile_dir:
+                        future = pool.submit(run_profiled, self.profile_dir, input_file, input_file,
+                                             _route_file, input_file, output_file, self.deactivate)
+                    else:
+                        future = pool.submit(_route_file, input_file, output_file, self.deactivate)
+                    in_flight[future] = input_file
+                if not in_flight:
+                    continue
+                done, _ = wait(in_flight, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    input_file = in_flight.pop(future)
+                    try:
+                        output_file = future.result()
+                        if self.profile_dir:
+                            output_file, profile = output_file
+                            self.profiles.add(profile)
+                        self._record(input_file, DONE)
+                        self.messages.put(("done", input_file, output_file))
+                    except Exception as e:
+                        self._record(input_file, FAILED, str(e))
+                        self.messages.put(("error", input_file, str(e)))
 
-                    # --- Mute Logic (Updated to use Speaker) ---
-                    mixer = device_chain.find("Mixer")
-                    if mixer is None:
-                        print(f"No Mixer found for {track_name}, creating one, XML Path: {track.tag}")
-                        mixer = ET.SubElement(device_chain, "Mixer")
+class ProgressWindow:
+    """Small progress window: per-file status, throughput/ETA and a Cancel button."""
 
-                    speaker = mixer.find("Speaker")
-                    if speaker is None:
-                        print(f"No Speaker found for {track_name}, creating one, XML Path: {track.tag}")
-                        speaker = ET.SubElement(mixer, "Speaker")
-                        manual_speaker = ET.SubElement(speaker, "Manual")
-                        manual_speaker.set("Value", "true")
-                    else:
-                        manual_speaker = speaker.find("Manual")
-                        if manual_speaker is None:
-                            manual_speaker = ET.SubElement(speaker, "Manual")
-                            manual_speaker.set("Value", "true")
+    def __init__(self, root, files, profile_dir=None, journal=None, deactivate=False):
+        self.root = root
+        self.total = len(files)
+        self.completed = 0
+        self.processed = []
+        self.errors = []
+        self.started_at = time.monotonic()
+        self.messages = queue.Queue()
+        self.profile_dir = profile_dir
+        self.worker = BatchWorker(files, self.messages, profile_dir=profile_dir, journal=journal, deactivate=deactivate)
 
-                    current_speaker_state = manual_speaker.get("Value")
-                    if track_name.upper() in MUTE_TRACKS:
-                        manual_speaker.set("Value", "false")
-                        print(f"Muted track: {track_name} (Speaker was {current_speaker_state})")
+        root.title("Ableton Live Router")
+        frame = ttk.Frame(root, padding=10)
+        frame.pack(fill="both", expand=True)
+        self.summary = ttk.Label(frame, text=f"Routing {self.total} files...")
+        self.summary.pack(anchor="w")
+        self.progress = ttk.Progressbar(frame, maximum=self.total, length=480)
+        self.progress.pack(fill="x", pady=5)
+        self.status = tk.Listbox(frame, height=12, width=80)
+        self.status.pack(fill="both", expand=True)
+        self.button = ttk.Button(frame, text="Cancel", command=self.cancel)
+        self.button.pack(anchor="e", pady=(5, 0))
+        root.protocol("WM_DELETE_WINDOW", self.cancel)
+        self.rows = {}
 
-                    # --- Volume Adjustment Logic ---
-                    volume = mixer.find("Volume")
-                    if volume is None:
-                        print(f"No Volume found for {track_name}, creating one, XML Path: {track.tag}")
-                        volume = ET.SubElement(mixer, "Volume")
-                        manual_volume = ET.SubElement(volume, "Manual")
-                        manual_volume.set("Value", "0.794328")  # Default to 0 dB
-                    else:
-                        manual_volume = volume.find("Manual")
-                        if manual_volume is None:
-                            manual_volume = ET.SubElement(volume, "Manual")
-                            manual_volume.set("Value", "0.794328")
+    def start(self):
+        self.worker.start()
+        self.root.after(100, self.poll)
 
-                    current_volume = float(manual_volume.get("Value"))
-                    if track_name.upper() in TURN_DOWN_TRACKS:
-                        # Convert current volume to dB
-                        current_db = 20 * math.log10(current_volume) if current_volume > 0 else -float('inf')
-                        # Reduce by 10 dB
-                        new_db = current_db + VOLUME_REDUCTION_DB
-                        # Convert back to linear
-                        new_volume = 10 ** (new_db / 20) if new_db > -float('inf') else 0.0
-                        manual_volume.set("Value", str(new_volume))
-                        print(f"Adjusted volume for {track_name}: {current_volume} ({current_db:.2f} dB) → {new_volume} ({new_db:.2f} dB)")
+    def cancel(self):
+        if not self.worker.is_alive():
+            self.root.destroy()
+            return
+        self.worker.cancel()
+        self.button.configure(state="disabled")
+        self.summary.configure(text="Cancelling after the files in progress...")
 
-            # Save modified XML
-            tree.write(temp_modified_xml, encoding="utf-8", xml_declaration=True)
+    def _set_row(self, input_file, text):
+        line = f"{text}  {os.path.basename(input_file)}"
+        if input_file in self.rows:
+            index = self.rows[input_file]
+            self.status.delete(index)
+            self.status.insert(index, line)
+        else:
+            self.rows[input_file] = self.status.size()
+            self.status.insert("end", line)
+        self.status.see(self.rows[input_file])
 
-            # Recompress to .als
-            with open(temp_modified_xml, "rb") as f_in:
-                with gzip.open(output_file, "wb") as f_out:
-                    f_out.write(f_in.read())
+    def _update_summary(self):
+        elapsed = time.monotonic() - self.started_at
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.completed) / rate if rate > 0 else None
+        eta_text = f", about {int(eta // 60)}:{int(eta % 60):02d} left" if eta is not None else ""
+        self.summary.configure(text=f"{self.completed}/{self.total} files, {rate * 60:.1f} files/min{eta_text}")
+        self.progress.configure(value=self.completed)
 
-        return True
+    def poll(self):
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == "finished":
+                self.finish(cancelled=message[1])
+                return
+            input_file = message[1]
+            if kind == "start":
+                self._set_row(input_file, "Routing...")
+            elif kind == "done":
+                self.completed += 1
+                self.processed.append(input_file)
+                self._set_row(input_file, "Done      ")
+                print(f"Processed {input_file} -> {message[2]}")
+            elif kind == "error":
+                self.completed += 1
+                self.errors.append((input_file, message[2]))
+                self._set_row(input_file, "FAILED    ")
+                print(f"Error: Failed to process {input_file}: {message[2]}")
+            self._update_summary()
+        self.root.after(100, self.poll)
 
-    except Exception as e:
-        print(f"Error: Failed to process {input_file}: {str(e)}")
-        messagebox.showerror("Error Processing File", f"Failed to process {input_file}: {str(e)}")
-        return False
+    def finish(self, cancelled):
+        self._update_summary()
+        self.button.configure(text="Close", state="normal")
+        report = f"Processed {len(self.processed)} files successfully."
+        if cancelled:
+            report += f"\n{self.total - self.completed} files were skipped (cancelled); run with --resume to finish them."
+        if self.profile_dir and self.worker.profiles.profiles:
+            report += f"\nProfiles written to {self.profile_dir}."
+        if self.errors:
+            report += f"\n\n{len(self.errors)} files failed:\n" + "\n".join(
+                f"{os.path.basename(path)}: {error}" for path, error in self.errors)
+            messagebox.showwarning("Processing Complete", report, parent=self.root)
+        else:
+            messagebox.showinfo("Processing Complete", report, parent=self.root)
+        self.summary.configure(text=report.splitlines()[0])
 
-def select_and_process_files():
+def select_and_process_files(profile_dir=None, journal_path=DEFAULT_JOURNAL, resume=False, deactivate=False):
     # Initialize tkinter
     root = tk.Tk()
-    root.withdraw()  # Hide the main window
+    root.withdraw()  # Hidden until files are chosen
 
-    # Open file dialog to select .als files
-    files = filedialog.askopenfilenames(
-        title="Select Ableton Live (.als) Files",
-        filetypes=[("Ableton Live Files", "*.als")]
-    )
+    journal = BatchJournal(journal_path)
+    if resume:
+        # Pick up the journalled batch: only files not finished (or changed since) are routed
+        if not journal.load():
+            print(f"No batch journal at {journal_path}. Exiting.")
+            messagebox.showinfo("Nothing to Resume", f"No batch journal found at {journal_path}.")
+            return
+        files = journal.remaining()
+        if not files:
+            print("Every file in the journalled batch is already routed. Exiting.")
+            messagebox.showinfo("Nothing to Resume", "Every file in the last batch is already routed.")
+            return
+        print(f"Resuming: {len(journal.entries) - len(files)} files already routed, {len(files)} to go.")
+        journal.reset(files)
+    else:
+        # Open file dialog to select .als files
+        files = filedialog.askopenfilenames(
+            title="Select Ableton Live (.als) Files",
+            filetypes=[("Ableton Live Files", "*.als")]
+        )
 
-    if not files:
-        print("No files selected. Exiting.")
-        messagebox.showinfo("No Files Selected", "No files were selected. Exiting.")
-        return
-
-    processed_count = 0
-    for input_file in files:
-        if not input_file.lower().endswith(".als"):
-            print(f"Skipping {input_file}: Not an .als file.")
-            continue
-
-        base_name = os.path.splitext(input_file)[0]
-        output_filename = f"{base_name}_routed.als"
-        counter = 1
-        while os.path.exists(output_filename):
-            output_filename = f"{base_name}_routed_{counter}.als"
-            counter += 1
-
-        if process_als(input_file, output_filename):
-            processed_count += 1
-            print(f"Processed {input_file} -> {output_filename}")
-        else:
-            print(f"Failed to process {input_file}")
+        if not files:
+            print("No files selected. Exiting.")
+            messagebox.showinfo("No Files Selected", "No files were selected. Exiting.")
+            return
+        files = list(files)
+        journal.begin(files, output_name_for)
 
-    messagebox.showinfo("Processing Complete", f"Processed {processed_count} files successfully.")
+    # Route in the background; the window stays responsive and can cancel between files
+    window = ProgressWindow(root, files, profile_dir, journal, deactivate)
+    root.deiconify()
+    window.start()
+    root.mainloop()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pick .als files and route them.")
+    parser.add_argument("--profile", metavar="DIR", help="Profile each file and write per-file stats and flamegraph stacks here")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL, help="Batch journal recording each file's progress")
+    parser.add_argument("--resume", action="store_true", help="Finish the batch in the journal instead of picking files")
+    parser.add_argument("--deactivate-muted", action="store_true", help="Switch off the devices on rule-muted tracks to save CPU")
+    args = parser.parse_args()
     try:
-        select_and_process_files()
+        select_and_process_files(args.profile, args.journal, args.resume, args.deactivate_muted)
     except Exception as e:
         print(f"Fatal Error: {str(e)}")
         messagebox.showerror("Fatal Error", f"An unexpected error occurred: {str(e)}")
@@ -0,0 +1,370 @@
+import os
+import sys
+import gzip
+import json
+import time
+import socket
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+
+import Ableton_Router_Engine as engine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --- Synthetic sets ---
+
+EXTRA_NAMES = ["PAD", "STRINGS", "LEAD VOX", "Acoustic Gtr", "Bgvs", "Click Trk", "MARKERS"]
+
+def synthetic_set(tracks=60, clips_per_track=20, scenes=8, seed=0):
+    """Build a gzipped .als in memory with rule-matching (and non-matching) track names.
+
+    The same arguments always give the same bytes, so runs against different releases route
+    identical input.
+    """
+    rng = random.Random(seed)
+    names = list(engine.ROUTING_MAP) + EXTRA_NAMES
+    root = ET.Element("Ableton", MajorVersion="5", MinorVersion="12.0_12049", Creator="Ableton Live 12.0.5")
+    live_set = ET.SubElement(root, "LiveSet")
+    ET.SubElement(live_set, "NextPointeeId", Value=str(100000))
+    tracks_elem = ET.SubElement(live_set, "Tracks")
+    clip_id = 0
+    for index in range(tracks):
+        track = ET.SubElement(tracks_elem, "AudioTrack", Id=str(index + 10))
+        name = ET.SubElement(track, "Name")
+        ET.SubElement(name, "EffectiveName", Value=rng.choice(names))
+        ET.SubElement(name, "UserName", Value="")
+        ET.SubElement(track, "Color", Value=str(rng.randrange(70)))
+        ET.SubElement(track, "TrackGroupId", Value="-1")
+        device_chain = ET.SubElement(track, "DeviceChain")
+        output = ET.SubElement(device_chain, "AudioOutputRouting")
+        ET.SubElement(output, "Target", Value="AudioOut/Main")
+        ET.SubElement(output, "UpperDisplayString", Value="Master")
+        ET.SubElement(output, "LowerDisplayString", Value="")
+        ET.SubElement(output, "MpeSettings")
+        mixer = ET.SubElement(device_chain, "Mixer")
+        ET.SubElement(ET.SubElement(mixer, "Speaker"), "Manual", Value="true")
+        ET.SubElement(ET.SubElement(mixer, "Volume"), "Manual", Value="1")
+        sequencer = ET.SubElement(device_chain, "MainSequencer")
+        slot_list = ET.SubElement(sequencer, "ClipSlotList")
+        for scene in range(scenes):
+            ET.SubElement(ET.SubElement(ET.SubElement(slot_list, "ClipSlot", Id=str(scene)), "ClipSlot"), "Value")
+        events = ET.SubElement(ET.SubElement(ET.SubElement(sequencer, "Sample"), "ArrangerAutomation"), "Events")
+        for clip in range(clips_per_track):
+            start = clip * 64
+            audio_clip = ET.SubElement(events, "AudioClip", Id=str(clip_id), Time=str(start))
+            clip_id += 1
+            ET.SubElement(audio_clip, "CurrentStart", Value=str(start))
+            ET.SubElement(audio_clip, "CurrentEnd", Value=str(start + 64))
+            ET.SubElement(audio_clip, "Name", Value=f"Clip {clip}")
+            file_ref = ET.SubElement(ET.SubElement(audio_clip, "SampleRef"), "FileRef")
+            ET.SubElement(file_ref, "RelativePath", Value=f"Samples/Imported/stem_{index}_{clip}.wav")
+            ET.SubElement(file_ref, "Path", Value=f"/Library/Stems/stem_{index}_{clip}.wav")
+            ET.SubElement(audio_clip, "Loop", Value=f"{rng.random():.6f}")
+    scenes_elem = ET.SubElement(live_set, "Scenes")
+    for scene in range(scenes):
+        ET.SubElement(ET.SubElement(scenes_elem, "Scene", Id=str(scene)), "Name", Value="")
+    main_track = ET.SubElement(live_set, "MainTrack")
+    ET.SubElement(ET.SubElement(ET.SubElement(ET.SubElement(main_track, "DeviceChain"), "Mixer"), "Tempo"), "Manual", Value="120")
+    # mtime=0 keeps the gzip header (and so the upload) identical between runs
+    return gzip.compress(ET.tostring(root, encoding="utf-8", xml_declaration=True), mtime=0)
+
+# --- Server under test ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_service(workers, port=None):
+    """Start Ableton_Router_Service.py locally and wait until /health answers."""
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "Ableton_Router_Service.py"), "--port", str(port), "--workers", str(workers)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Service exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Service did not start within 30s")
+
+def process_tree_rss(pid):
+    """Resident memory (bytes) of a process and all its descendants, from /proc (Linux only)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+        self.started_at = time.monotonic()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.samples.append((round(time.monotonic() - self.started_at, 2), process_tree_rss(self.pid)))
+            self.stop_event.wait(self.interval)
+
+# --- Load generator ---
+
+def _request(url, data=None, timeout=120):
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/octet-stream"} if data else {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+def run_upload(url, file_data, filename, campus=None, slim=False):
+    """One upload → long-poll → download. Returns (end-to-end seconds, server seconds)."""
+    params = {"filename": filename}
+    if campus:
+        params["campus"] = campus
+    if slim:
+        params["slim"] = "1"
+    start = time.perf_counter()
+    job = json.loads(_request(f"{url}/jobs?{urllib.parse.urlencode(params)}", file_data))["jobs"][0]
+    while job["status"] in ("queued", "running"):
+        job = json.loads(_request(f"{url}/jobs/{job['id']}?wait=30"))
+    if job["status"] != "done":
+        raise RuntimeError(job.get("error") or f"Job {job['status']}")
+    _request(f"{url}{job['result_url']}")
+    return time.perf_counter() - start, job["seconds"]
+
+def percentiles(values):
+    values = sorted(values)
+    def pick(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))], 4) if values else None
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1], 4) if values else None}
+
+def run_load(url, file_data, sessions, uploads_per_session, campus=None, slim=False, think_seconds=0.0):
+    """Each session uploads one set at a time (closed loop), like a volunteer waiting for each download."""
+    end_to_end, server = [], []
+    errors = []
+    lock = threading.Lock()
+
+    def session(number):
+        for upload in range(uploads_per_session):
+            try:
+                total, processing = run_upload(url, file_data, f"load_{number}_{upload}.als", campus, slim)
+                with lock:
+                    end_to_end.append(total)
+                    server.append(processing)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            if think_seconds:
+                time.sleep(think_seconds)
+
+    threads = [threading.Thread(target=session, args=(number,)) for number in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "completed": len(end_to_end),
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:10],
+        "throughput_per_s": round(len(end_to_end) / elapsed, 3) if elapsed > 0 else None,
+        "latency_s": percentiles(end_to_end),
+        "server_latency_s": percentiles(server),
+    }
+
+def timed_route_upload(*args):
+    """engine.route_upload plus the seconds it took in the worker (pool mode's "server" latency)."""
+    start = time.perf_counter()
+    result = engine.route_upload(*args)
+    return result, time.perf_counter() - start
+
+def run_pool_load(pool, file_data, sessions, uploads_per_session, campus=None, slim=False):
+    """Drive the Streamlit apps' shared pool directly: each session sends its uploads as one batch
+    through map_for_session with its own slots, like a volunteer dropping several sets at once.
+    Latency is from the start of the batch to that set's result, i.e. when its download appears."""
+    from Ableton_Router_Pool import map_for_session
+
+    end_to_end, server = [], []
+    errors = []
+    lock = threading.Lock()
+
+    def session(number):
+        slots = pool.new_session_slots()
+        uploads = [(file_data, f"load_{number}_{upload}.als", slim, False, campus) for upload in range(uploads_per_session)]
+        start = time.perf_counter()
+        for args, result, error in map_for_session(pool, slots, timed_route_upload, uploads):
+            with lock:
+                if error is not None:
+                    errors.append(str(error))
+                    continue
+                end_to_end.append(time.perf_counter() - start)
+                server.append(result[1])
+
+    threads = [threading.Thread(target=session, args=(number,)) for number in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "completed": len(end_to_end),
+        "failed": len(errors),
+        "errors": sorted(set(errors))[:10],
+        "throughput_per_s": round(len(end_to_end) / elapsed, 3) if elapsed > 0 else None,
+        "latency_s": percentiles(end_to_end),
+        "server_latency_s": percentiles(server),
+    }
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "-C", HERE, "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare_reports(old, new):
+    """Print the headline numbers of two reports side by side."""
+    rows = [
+        ("throughput/s", old["result"]["throughput_per_s"], new["result"]["throughput_per_s"]),
+        ("p50 s", old["result"]["latency_s"]["p50"], new["result"]["latency_s"]["p50"]),
+        ("p95 s", old["result"]["latency_s"]["p95"], new["result"]["latency_s"]["p95"]),
+        ("p99 s", old["result"]["latency_s"]["p99"], new["result"]["latency_s"]["p99"]),
+        ("peak RSS MB", old["rss"]["peak_mb"], new["rss"]["peak_mb"]),
+    ]
+    if old["config"] != new["config"]:
+        print("Warning: the two runs used different settings; numbers are not directly comparable.")
+    print(f"{'':14} {old['revision'] or 'old':>10} {new['revision'] or 'new':>10}   change")
+    for label, before, after in rows:
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else "-"
+        print(f"{label:14} {before!s:>10} {after!s:>10}   {change}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the routing service (the backend of the web front ends).")
+    parser.add_argument("--url", help="Test an already running service instead of starting one")
+    parser.add_argument("--pool", action="store_true",
+                        help="Drive the Streamlit apps' shared process pool in this process instead of the HTTP service")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Service (or pool) workers when starting one")
+    parser.add_argument("--per-session", type=int, default=2, help="Pool jobs one session may run at once (with --pool)")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--uploads", type=int, default=5, help="Uploads per session")
+    parser.add_argument("--tracks", type=int, default=60, help="Tracks per synthetic set")
+    parser.add_argument("--clips", type=int, default=20, help="Arrangement clips per track")
+    parser.add_argument("--campus", help="Campus to route for")
+    parser.add_argument("--slim", action="store_true", help="Also slim each set")
+    parser.add_argument("--think", type=float, default=0.0, help="Seconds each session waits between uploads (HTTP only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to compare this run against")
+    args = parser.parse_args(argv)
+    if args.pool and args.url:
+        parser.error("--pool routes in this process; it can't be combined with --url")
+
+    file_data = synthetic_set(args.tracks, args.clips, seed=args.seed)
+    print(f"Synthetic set: {args.tracks} tracks, {args.clips} clips/track, {len(file_data):,} bytes gzipped")
+
+    process = None
+    pool = None
+    url = args.url
+    if args.pool:
+        from Ableton_Router_Pool import SharedRouterPool
+        pool = SharedRouterPool(args.workers, args.per_session)
+        print(f"Started shared pool with {pool.warm_workers} warm workers, {pool.per_session} per session")
+        pid = os.getpid()
+    elif url is None:
+        process, url = start_service(args.workers)
+        print(f"Started service on {url} with {args.workers} workers")
+        pid = process.pid
+    else:
+        pid = None
+    sampler = RssSampler(pid) if pid is not None and sys.platform.startswith("linux") else None
+    if sampler is not None:
+        sampler.start()
+    try:
+        if pool is not None:
+            result = run_pool_load(pool, file_data, args.sessions, args.uploads, args.campus, args.slim)
+        else:
+            result = run_load(url, file_data, args.sessions, args.uploads, args.campus, args.slim, args.think)
+    finally:
+        if sampler is not None:
+            sampler.stop_event.set()
+            sampler.join()
+        if pool is not None:
+            pool.executor.shutdown()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    samples = sampler.samples if sampler is not None else []
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "mode": "pool" if args.pool else "http",
+            "workers": args.workers if args.url is None else None,
+            "per_session": pool.per_session if pool is not None else None,
+            "sessions": args.sessions,
+            "uploads_per_session": args.uploads,
+            "tracks": args.tracks,
+            "clips_per_track": args.clips,
+            "set_bytes": len(file_data),
+            "campus": args.campus,
+            "slim": args.slim,
+            "think_s": args.think,
+            "seed": args.seed,
+        },
+        "result": result,
+        "rss": {
+            "peak_mb": round(max(rss for _, rss in samples) / 1024 / 1024, 1) if samples else None,
+            "samples": [(t, round(rss / 1024 / 1024, 1)) for t, rss in samples],
+        },
+    }
+
+    latency = result["latency_s"]
+    print(f"{result['completed']} uploads in {result['elapsed_s']}s ({result['throughput_per_s']}/s), "
+          f"{result['failed']} failed; latency p50 {latency['p50']}s p95 {latency['p95']}s p99 {latency['p99']}s; "
+          f"peak RSS {report['rss']['peak_mb']} MB")
+    for error in result["errors"]:
+        print(f"Error: {error}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare_reports(json.load(f), report)
+    return 1 if result["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
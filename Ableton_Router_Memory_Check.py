@@ -0,0 +1,113 @@
+import os
+import sys
+import gzip
+import json
+import argparse
+import tempfile
+import tracemalloc
+
+import Ableton_Router_Engine as engine
+from Ableton_Router_Load_Test import synthetic_set
+
+SAMPLE_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Ableton Manual Routing XML Data")
+
+# Budgets, per MB of decompressed set XML. ElementTree needs ~12-13x the XML size for the parsed
+# tree; anything much above that means a stage is holding an extra copy of the set.
+DEFAULT_PEAK_PER_XML_MB = 15.0
+# What a finished run may leave allocated besides the output bytes it returns
+DEFAULT_LEAK_MB = 1.0
+
+# test_memory_budget.py runs check() on the sample set and a synthetic set; this CLI measures
+# any sets and prints every stage. Synthetic sets (tracks, clips per track) measured by default:
+SYNTHETIC_SIZES = [(40, 10), (120, 30), (240, 60)]
+
+def measure(file_data, slim=False, mode="upload"):
+    """Route one set under tracemalloc and return (overall peak, retained, per-stage stats) in bytes.
+
+    mode "upload" measures engine.route_upload (the Streamlit path: bytes in, bytes out);
+    mode "file" measures engine.process_als from a file on disk to a file (LINUX, watch, service).
+    """
+    temp_dir = None
+    if mode == "file":
+        temp_dir = tempfile.TemporaryDirectory()
+        input_file = os.path.join(temp_dir.name, "input.als")
+        with open(input_file, "wb") as f:
+            f.write(file_data)
+    stages = {}
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        if mode == "file":
+            engine.process_als(input_file, os.path.join(temp_dir.name, "output.als"), slim=slim, stages=stages)
+            result = None
+        else:
+            result = engine.route_upload(file_data, "memory_check.als", slim=slim, stages=stages)
+        current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    output_size = len(result[0]) if result is not None else 0
+    peak = max(stage["high_water"] for stage in stages.values()) - base
+    return peak, current - base - output_size, stages
+
+def check(label, file_data, slim, mode, peak_per_mb, leak_mb):
+    xml_mb = len(gzip.decompress(file_data)) / 1e6 if file_data[:2] == engine.GZIP_MAGIC else len(file_data) / 1e6
+    peak, retained, stages = measure(file_data, slim, mode)
+    ratio = peak / 1e6 / xml_mb if xml_mb else 0.0
+    failures = []
+    if ratio > peak_per_mb:
+        failures.append(f"peak {ratio:.1f} MB per XML MB is over the {peak_per_mb} budget")
+    if retained / 1e6 > leak_mb:
+        failures.append(f"{retained / 1e6:.1f} MB still allocated after the run (limit {leak_mb} MB)")
+    status = "FAIL" if failures else "ok"
+    print(f"{status:4} {label} [{mode}{', slim' if slim else ''}]: {xml_mb:.1f} MB XML, peak {peak / 1e6:.1f} MB "
+          f"({ratio:.1f}x), retained {retained / 1e6:.2f} MB")
+    print(f"     {engine.format_memory_report(stages)}")
+    for failure in failures:
+        print(f"     {failure}")
+    return {
+        "label": label,
+        "mode": mode,
+        "slim": slim,
+        "xml_mb": round(xml_mb, 3),
+        "peak_mb": round(peak / 1e6, 3),
+        "peak_per_xml_mb": round(ratio, 3),
+        "retained_mb": round(retained / 1e6, 3),
+        "stages": {name: {key: round(value / 1e6, 3) for key, value in stage.items() if key != "high_water"}
+                   for name, stage in stages.items()},
+        "failures": failures,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-stage memory of routing and fail when it exceeds the budget.")
+    parser.add_argument("files", nargs="*", help="Sets to measure (default: the sample set and synthetic sets)")
+    parser.add_argument("--peak-per-mb", type=float, default=DEFAULT_PEAK_PER_XML_MB,
+                        help="Allowed peak traced memory per MB of set XML")
+    parser.add_argument("--leak-mb", type=float, default=DEFAULT_LEAK_MB, help="Allowed memory left allocated after a run")
+    parser.add_argument("--report", help="Write the measurements as JSON here")
+    args = parser.parse_args(argv)
+
+    inputs = []
+    for path in args.files or ([SAMPLE_SET] if os.path.exists(SAMPLE_SET) else []):
+        with open(path, "rb") as f:
+            inputs.append((os.path.basename(path), f.read()))
+    if not args.files:
+        for tracks, clips in SYNTHETIC_SIZES:
+            inputs.append((f"synthetic {tracks} tracks x {clips} clips", synthetic_set(tracks, clips)))
+
+    results = []
+    for label, file_data in inputs:
+        for mode in ("upload", "file"):
+            for slim in (False, True):
+                results.append(check(label, file_data, slim, mode, args.peak_per_mb, args.leak_mb))
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"peak_per_mb": args.peak_per_mb, "leak_mb": args.leak_mb, "results": results}, f, indent=2)
+    failed = sum(1 for result in results if result["failures"])
+    print(f"{len(results) - failed} of {len(results)} runs within budget.")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
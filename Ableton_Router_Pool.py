@@ -0,0 +1,109 @@
+import os
+import time
+import collections
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import streamlit as st
+
+import Ableton_Router_Engine as engine
+
+# Server-wide limits for the Streamlit apps (one pool per server process)
+POOL_WORKERS = int(os.environ.get("ROUTER_POOL_WORKERS") or max(1, os.cpu_count() or 1))
+POOL_PER_SESSION = int(os.environ.get("ROUTER_POOL_PER_SESSION") or 2)
+
+def _warm_worker():
+    # Compile every campus's rule variant (and the name matcher) before the first upload arrives
+    for campus in [None] + engine.CAMPUSES:
+        engine.RULES.variant(campus).matcher.match("WARM UP")
+
+def _ping(hold_seconds):
+    # Holding each worker briefly makes the pool start all of them instead of reusing the first
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+class SharedRouterPool:
+    """A process pool shared by every session, with a global and a per-session concurrency cap.
+
+    submit() blocks the calling session's script thread while that session already has
+    per_session jobs running, or while every worker is busy, so a volunteer uploading twenty
+    sets can't queue ahead of everyone else.
+    """
+
+    def __init__(self, workers=POOL_WORKERS, per_session=POOL_PER_SESSION):
+        self.workers = workers
+        self.per_session = min(per_session, workers)
+        # Spawned, not forked: a fork would copy the Streamlit server's threads and locks mid-use
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        self.global_slots = threading.BoundedSemaphore(workers)
+        # Start every worker now rather than on the first Sunday-morning upload
+        pids = {future.result() for future in [self.executor.submit(_ping, 0.2) for _ in range(workers)]}
+        self.warm_workers = len(pids)
+
+    def new_session_slots(self):
+        return threading.BoundedSemaphore(self.per_session)
+
+    def submit(self, slots, fn, *args):
+        slots.acquire()
+        self.global_slots.acquire()
+
+        def release(future):
+            self.global_slots.release()
+            slots.release()
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.global_slots.release()
+            slots.release()
+            raise
+        future.add_done_callback(release)
+        return future
+
+@st.cache_resource
+def get_router_pool():
+    """The server's shared pool (created and warmed once, on first use)."""
+    return SharedRouterPool()
+
+def session_slots(pool):
+    """This browser session's slots. They outlive reruns, so jobs still running from an
+    interrupted rerun count against the session's limit."""
+    if "router_pool_slots" not in st.session_state:
+        st.session_state["router_pool_slots"] = pool.new_session_slots()
+    return st.session_state["router_pool_slots"]
+
+def map_for_session(pool, slots, fn, arg_tuples):
+    """Run fn(*args) on the pool for each args, at most pool.per_session at a time.
+
+    Yields (args, result, error) in submission order as soon as each result is ready, so the
+    app can show the first download while later sets are still routing.
+    """
+    def collect(args, future):
+        try:
+            return args, future.result(), None
+        except Exception as e:
+            return args, None, e
+
+    pending = collections.deque()
+    for args in arg_tuples:
+        if len(pending) >= pool.per_session:
+            yield collect(*pending.popleft())
+        pending.append((args, pool.submit(slots, fn, *args)))
+    while pending:
+        yield collect(*pending.popleft())
+
+def show_profile_report(report):
+    """Show a batch's ProfileReport (from Ableton_Router_Profile) with the flamegraph files as downloads."""
+    st.subheader("Profile")
+    st.caption("Slowest first; stage columns are seconds. Outliers take over "
+               "3x the median time per MB of XML.")
+    st.table(report.summary_rows())
+    st.download_button("Download flamegraph stacks (all files)", report.collapsed_text(),
+                       file_name="profile_collapsed.txt", mime="text/plain")
+    st.download_button("Download flamegraph stacks (per file)", report.collapsed_text(by_file=True),
+                       file_name="profile_by_file_collapsed.txt", mime="text/plain")
+    for profile in report.profiles.values():
+        with st.expander(f"{profile.label}: {profile.seconds:.2f}s"):
+            st.code(profile.report)
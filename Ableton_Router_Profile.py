@@ -0,0 +1,196 @@
+import io
+import os
+import re
+import time
+import pstats
+import cProfile
+import statistics
+from collections import namedtuple
+
+import Ableton_Router_Engine as engine
+
+# Engine functions that make up the routing stages, in pipeline order
+STAGE_FUNCTIONS = {"load": "load_als", "route": "route_tree", "slim": "slim_tree", "save": "save_als"}
+# Lines of the per-file report (functions sorted by cumulative time)
+PROFILE_TOP = 30
+# A file is flagged when its seconds per MB is this many times the batch median
+OUTLIER_FACTOR = 3.0
+# Collapsed stacks cheaper than this (microseconds) are left out of the flamegraph files
+MIN_STACK_US = 50
+MAX_STACK_DEPTH = 64
+
+FileProfile = namedtuple("FileProfile", "label size xml_size tracks seconds stages hottest stacks report")
+
+_PROFILER_DISABLE = "<method 'disable' of '_lsprof.Profiler' objects>"
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def collapsed_stacks(stats):
+    """Turn a cProfile call graph into flamegraph stacks {"a;b;c": microseconds of self time}.
+
+    cProfile records caller→callee totals rather than whole stacks, so a function's time is split
+    between the paths leading to it in proportion to what each caller spent in it. Recursion is
+    cut at the first repeat.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, entry in stats.items() if not entry[4]]
+
+    stacks = {}
+
+    def walk(func, path, names, share):
+        total_time = stats[func][2]
+        own = total_time * share * 1e6
+        if own >= 1:
+            key = ";".join(names)
+            stacks[key] = stacks.get(key, 0) + int(own)
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_cumulative in callees.get(func, []):
+            if callee in path or not stats[callee][3]:
+                continue
+            spent = edge_cumulative * share
+            if spent * 1e6 < MIN_STACK_US:
+                continue
+            walk(callee, path | {callee}, names + [_frame_name(callee)], spent / stats[callee][3])
+
+    for root in roots:
+        if stats[root][3]:
+            walk(root, {root}, [_frame_name(root)], 1.0)
+    return stacks
+
+def _stage_seconds(stats):
+    stages = {}
+    for stage, function_name in STAGE_FUNCTIONS.items():
+        seconds = sum(entry[3] for func, entry in stats.items()
+                      if func[2] == function_name and os.path.basename(func[0]) == "Ableton_Router_Engine.py")
+        if seconds:
+            stages[stage] = seconds
+    return stages
+
+def _safe_name(label):
+    return re.sub(r"[^\w.-]+", "_", os.path.basename(label)) or "set"
+
+def run_profiled(output_dir, label, source, fn, *args):
+    """Run fn(*args) under cProfile (worker process entry point) and return (result, FileProfile).
+
+    source is the set being routed (path or bytes); it is measured for the size and track count
+    tags outside the profiled call. With output_dir, <label>.prof (for pstats/snakeviz) and a
+    <label>.txt report are written there too.
+    """
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn(*args)
+    finally:
+        profiler.disable()
+    seconds = time.perf_counter() - started
+
+    size = os.path.getsize(source) if isinstance(source, str) else len(source)
+    xml_size, tracks = engine.measure_set(source)
+    stats = pstats.Stats(profiler)
+    # Leave out the profiler's own disable() call
+    stats.stats = {func: entry for func, entry in stats.stats.items() if func[2] != _PROFILER_DISABLE}
+    hottest = max((entry[2], func) for func, entry in stats.stats.items())[1]
+
+    buffer = io.StringIO()
+    print(f"{label}: {seconds:.3f}s, {size / 1e6:.2f} MB file, {xml_size / 1e6:.2f} MB XML, {tracks} tracks", file=buffer)
+    stats.stream = buffer
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+    profile = FileProfile(label, size, xml_size, tracks, seconds, _stage_seconds(stats.stats), _frame_name(hottest),
+                          collapsed_stacks(stats.stats), buffer.getvalue())
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        name = _safe_name(label)
+        stats.dump_stats(os.path.join(output_dir, f"{name}.prof"))
+        with open(os.path.join(output_dir, f"{name}.txt"), "w") as f:
+            f.write(profile.report)
+    return result, profile
+
+class ProfileReport:
+    """Collects FileProfiles from a batch and writes the summary and flamegraph files."""
+
+    def __init__(self):
+        self.profiles = {}
+
+    def add(self, profile):
+        # A file routed again (watch folder) replaces its earlier profile
+        self.profiles[profile.label] = profile
+
+    def _seconds_per_mb(self, profile):
+        # Per MB of XML, so gzip and plain sets compare fairly
+        return profile.seconds / max(profile.xml_size / 1e6, 0.001)
+
+    def outliers(self):
+        profiles = list(self.profiles.values())
+        if len(profiles) < 3:
+            return set()
+        median = statistics.median(self._seconds_per_mb(p) for p in profiles)
+        return {p.label for p in profiles if self._seconds_per_mb(p) > OUTLIER_FACTOR * median}
+
+    def summary_rows(self):
+        """One row per file, slowest first."""
+        outliers = self.outliers()
+        rows = []
+        for profile in sorted(self.profiles.values(), key=lambda p: p.seconds, reverse=True):
+            row = {
+                "file": os.path.basename(profile.label),
+                "seconds": round(profile.seconds, 3),
+                "MB": round(profile.size / 1e6, 2),
+                "XML MB": round(profile.xml_size / 1e6, 2),
+                "tracks": profile.tracks,
+                "s/MB": round(self._seconds_per_mb(profile), 3),
+            }
+            for stage in STAGE_FUNCTIONS:
+                row[stage] = round(profile.stages.get(stage, 0.0), 3)
+            row["hottest"] = profile.hottest
+            row["outlier"] = "yes" if profile.label in outliers else ""
+            rows.append(row)
+        return rows
+
+    def format_summary(self):
+        rows = self.summary_rows()
+        if not rows:
+            return "No files profiled."
+        totals = {stage: sum(row[stage] for row in rows) for stage in STAGE_FUNCTIONS}
+        slowest_stage = max(totals, key=totals.get)
+        lines = [f"{'file':40} {'seconds':>8} {'MB':>7} {'XML MB':>7} {'tracks':>6} {'s/MB':>7} "
+                 + " ".join(f"{stage:>6}" for stage in STAGE_FUNCTIONS) + "  hottest"]
+        for row in rows:
+            flag = "  << outlier" if row["outlier"] else ""
+            lines.append(f"{row['file'][:40]:40} {row['seconds']:8.3f} {row['MB']:7.2f} {row['XML MB']:7.2f} {row['tracks']:6} {row['s/MB']:7.3f} "
+                         + " ".join(f"{row[stage]:6.2f}" for stage in STAGE_FUNCTIONS) + f"  {row['hottest']}{flag}")
+        lines.append(f"Across {len(rows)} files: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in totals.items())
+                     + f" (most time in {slowest_stage})")
+        return "\n".join(lines)
+
+    def collapsed_text(self, by_file=False):
+        """Flamegraph input (flamegraph.pl / speedscope): "frame;frame;frame microseconds" per line.
+
+        by_file puts a "<file> [MB, tracks]" frame at the bottom of every stack, so each file
+        gets its own tower and outliers stand out; otherwise stacks are summed over all files.
+        """
+        merged = {}
+        for profile in self.profiles.values():
+            prefix = f"{os.path.basename(profile.label)} [{profile.size / 1e6:.1f} MB, {profile.tracks} tracks];" if by_file else ""
+            for stack, microseconds in profile.stacks.items():
+                merged[prefix + stack] = merged.get(prefix + stack, 0) + microseconds
+        return "".join(f"{stack} {microseconds}\n" for stack, microseconds in sorted(merged.items()))
+
+    def write(self, output_dir):
+        """Write profile_summary.txt, profile_collapsed.txt and profile_by_file_collapsed.txt."""
+        os.makedirs(output_dir, exist_ok=True)
+        for name, text in (("profile_summary.txt", self.format_summary() + "\n"),
+                           ("profile_collapsed.txt", self.collapsed_text()),
+                           ("profile_by_file_collapsed.txt", self.collapsed_text(by_file=True))):
+            temp_file = os.path.join(output_dir, name + ".part")
+            with open(temp_file, "w") as f:
+                f.write(text)
+            os.replace(temp_file, os.path.join(output_dir, name))
@@ -0,0 +1,514 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import signal
+import asyncio
+import tempfile
+import argparse
+from urllib.parse import urlsplit, parse_qs, quote
+from concurrent.futures import ProcessPoolExecutor
+
+import Ableton_Router_Engine as engine
+from Ableton_Router_Watch import route_for_campuses, _ignore_stop_signals
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+DEFAULT_MAX_UPLOAD_MB = 512
+JOB_TTL_SECONDS = 3600  # Finished jobs (and their files) are forgotten after an hour
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+STATUS_TEXT = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+# --- Request body streaming ---
+
+_DECIMAL = re.compile(rb"[0-9]+")
+_HEX = re.compile(rb"[0-9A-Fa-f]+")
+
+def _parse_size(value, pattern, base, what):
+    # int() alone would take "-5", "+5" or "1_0"; only plain digits are a valid size
+    value = value.strip()
+    if not pattern.fullmatch(value):
+        raise HTTPError(400, f"Invalid {what}: {value.decode('latin-1')!r}")
+    return int(value, base)
+
+class BodyReader:
+    """Yield the request body in chunks for either Content-Length or chunked transfer encoding."""
+
+    def __init__(self, reader, headers, max_bytes):
+        self.reader = reader
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        if not self.chunked:
+            if "content-length" not in headers:
+                raise HTTPError(411, "Content-Length or chunked encoding required")
+            self.remaining = _parse_size(headers["content-length"].encode("latin-1"), _DECIMAL, 10, "Content-Length")
+            if self.remaining > max_bytes:
+                raise HTTPError(413, f"Upload larger than {max_bytes // (1024 * 1024)} MB")
+        self.chunk_left = 0
+        self.done = False
+
+    async def read(self):
+        """Return the next piece of the body, or b"" at the end."""
+        if self.done:
+            return b""
+        if not self.chunked:
+            if self.remaining == 0:
+                self.done = True
+                return b""
+            data = await self.reader.read(min(CHUNK_SIZE, self.remaining))
+            if not data:
+                raise HTTPError(400, "Connection closed before the body was complete")
+            self.remaining -= len(data)
+            return self._count(data)
+
+        if self.chunk_left == 0:
+            size_line = await self.reader.readline()
+            size = _parse_size(size_line.split(b";")[0], _HEX, 16, "chunk size")
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.done = True
+                return b""
+            self.chunk_left = size
+        data = await self.reader.read(min(CHUNK_SIZE, self.chunk_left))
+        if not data:
+            raise HTTPError(400, "Connection closed before the body was complete")
+        self.chunk_left -= len(data)
+        if self.chunk_left == 0:
+            await self.reader.readline()
+        return self._count(data)
+
+    def _count(self, data):
+        self.total += len(data)
+        if self.total > self.max_bytes:
+            raise HTTPError(413, f"Upload larger than {self.max_bytes // (1024 * 1024)} MB")
+        return data
+
+async def save_raw_body(body, path):
+    """Stream the whole body straight to disk."""
+    with open(path, "wb") as f_out:
+        while True:
+            data = await body.read()
+            if not data:
+                break
+            f_out.write(data)
+
+async def save_multipart_body(body, boundary, make_path):
+    """Stream a multipart/form-data body, writing each file part to make_path(filename).
+
+    Only a delimiter-sized tail is kept in memory, so no upload is buffered whole.
+    Returns [(filename, path)].
+    """
+    delimiter = b"\r\n--" + boundary
+    buffer = b"\r\n"  # lets the first boundary match the same delimiter as the others
+    saved = []
+
+    async def fill(minimum):
+        nonlocal buffer
+        while len(buffer) < minimum:
+            data = await body.read()
+            if not data:
+                return False
+            buffer += data
+        return True
+
+    # Preamble up to the first boundary
+    while True:
+        index = buffer.find(delimiter)
+        if index >= 0:
+            buffer = buffer[index + len(delimiter):]
+            break
+        buffer = buffer[-len(delimiter):]
+        if not await fill(len(buffer) + 1):
+            raise HTTPError(400, "Multipart boundary not found")
+
+    while True:
+        await fill(2)
+        if buffer.startswith(b"--"):
+            return saved
+        if not buffer.startswith(b"\r\n"):
+            raise HTTPError(400, "Malformed multipart body")
+        buffer = buffer[2:]
+
+        while b"\r\n\r\n" not in buffer:
+            if len(buffer) > MAX_HEADER_BYTES or not await fill(len(buffer) + 1):
+                raise HTTPError(400, "Malformed multipart part headers")
+        raw_headers, buffer = buffer.split(b"\r\n\r\n", 1)
+        disposition = ""
+        for line in raw_headers.decode("utf-8", "replace").split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-disposition":
+                disposition = value
+        match = re.search(r'filename="([^"]*)"', disposition)
+        filename = os.path.basename(match.group(1)) if match else None
+
+        f_out = open(make_path(filename), "wb") if filename else None
+        try:
+            while True:
+                index = buffer.find(delimiter)
+                if index >= 0:
+                    if f_out:
+                        f_out.write(buffer[:index])
+                    buffer = buffer[index + len(delimiter):]
+                    break
+                # Keep enough bytes to catch a delimiter split across reads
+                keep = len(delimiter) - 1
+                if len(buffer) > keep:
+                    if f_out:
+                        f_out.write(buffer[:-keep])
+                    buffer = buffer[-keep:]
+                if not await fill(len(buffer) + 1):
+                    raise HTTPError(400, "Multipart body ended inside a part")
+        finally:
+            if f_out:
+                f_out.close()
+        if filename:
+            saved.append((filename, f_out.name))
+
+# --- Jobs ---
+
+class Job:
+    __slots__ = ("id", "filename", "campus", "slim", "deactivate", "input_path", "output_path", "status", "error",
+                 "submitted", "started", "finished", "done_event")
+
+    def __init__(self, job_id, filename, campus, input_path, output_path, slim=False, deactivate=False):
+        self.id = job_id
+        self.filename = filename
+        self.campus = campus
+        self.slim = slim
+        self.deactivate = deactivate
+        self.input_path = input_path
+        self.output_path = output_path
+        self.status = "queued"
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.done_event = asyncio.Event()
+
+    def to_dict(self):
+        result = {
+            "id": self.id,
+            "filename": self.filename,
+            "campus": self.campus,
+            "status": self.status,
+            "submitted": self.submitted,
+            "finished": self.finished,
+        }
+        if self.status == "done":
+            result["result_url"] = f"/jobs/{self.id}/result"
+            result["output_filename"] = os.path.basename(self.output_path)
+            result["seconds"] = round(self.finished - self.submitted, 3)
+        if self.error:
+            result["error"] = self.error
+        return result
+
+class RouterHTTPService:
+    """Minimal asyncio HTTP front end that queues routing jobs on a process pool."""
+
+    def __init__(self, work_dir, workers=2, max_upload_mb=DEFAULT_MAX_UPLOAD_MB):
+        self.work_dir = work_dir
+        self.max_upload_bytes = max_upload_mb * 1024 * 1024
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_ignore_stop_signals)
+        self.workers = workers
+        self.slots = asyncio.Semaphore(workers)
+        self.jobs = {}
+        self.tasks = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = []
+        self.started = time.time()
+
+    # --- Job lifecycle ---
+
+    def submit(self, filename, campus, input_path, slim=False, deactivate=False):
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.dirname(input_path)
+        output_path = os.path.join(job_dir, engine.campus_output_name(filename, campus))
+        job = Job(job_id, filename, campus, input_path, output_path, slim, deactivate)
+        self.jobs[job_id] = job
+        # The loop only keeps weak references to tasks; hold each one until it finishes
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return job
+
+    async def _run(self, job):
+        loop = asyncio.get_running_loop()
+        # Only hand the pool as many jobs as it has workers so "queued" stays meaningful
+        async with self.slots:
+            job.started = time.time()
+            self.running += 1
+            job.status = "running"
+            try:
+                await loop.run_in_executor(self.pool, route_for_campuses, job.input_path, [(job.output_path, job.campus)],
+                                           job.slim, job.deactivate)
+                job.status = "done"
+                self.completed += 1
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+        try:
+            job.finished = time.time()
+            self.latencies.append(job.finished - job.submitted)
+            del self.latencies[:-1000]
+            os.remove(job.input_path)
+        except OSError:
+            pass
+        finally:
+            job.done_event.set()
+
+    async def purge_expired(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.time() - JOB_TTL_SECONDS
+            expired_uploads = set()
+            for job_id, job in list(self.jobs.items()):
+                if job.finished is not None and job.finished < cutoff:
+                    shutil.rmtree(os.path.dirname(job.input_path), ignore_errors=True)
+                    expired_uploads.add(os.path.dirname(os.path.dirname(job.input_path)))
+                    del self.jobs[job_id]
+            # An upload_* folder goes once none of its jobs is left (with any skipped non-.als parts)
+            live_uploads = {os.path.dirname(os.path.dirname(job.input_path)) for job in self.jobs.values()}
+            for upload_dir in expired_uploads - live_uploads:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+        queued = sum(1 for job in self.jobs.values() if job.status == "queued")
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "queued": queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_p50_s": percentile(0.50),
+            "latency_p95_s": percentile(0.95),
+            "latency_p99_s": percentile(0.99),
+        }
+
+    # --- HTTP plumbing ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = (lines[0].split(" ", 2) + ["", ""])[:3]
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            url = urlsplit(target)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                await self.dispatch(method.upper(), url.path, query, headers, reader, writer)
+            except HTTPError as e:
+                await self.send_json(writer, e.status, {"error": e.message})
+            except Exception as e:
+                await self.send_json(writer, 500, {"error": str(e)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def send_json(self, writer, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + body
+        )
+        await writer.drain()
+
+    async def send_file(self, writer, path, download_name):
+        size = os.path.getsize(path)
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\nContent-Length: {size}\r\n"
+            f"Content-Disposition: attachment; filename*=UTF-8''{quote(download_name)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1")
+        )
+        with open(path, "rb") as f_in:
+            while True:
+                data = f_in.read(CHUNK_SIZE)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+
+    async def dispatch(self, method, path, query, headers, reader, writer):
+        if path in ("/health", "/metrics"):
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            await self.send_json(writer, 200, self.metrics())
+            return
+
+        if path == "/jobs":
+            if method != "POST":
+                raise HTTPError(405, "Use POST to submit .als files")
+            jobs = await self.receive_upload(query, headers, reader)
+            await self.send_json(writer, 202, {"jobs": [job.to_dict() for job in jobs]})
+            return
+
+        match = re.fullmatch(r"/jobs/([0-9a-f]{32})(/result)?", path)
+        if not match:
+            raise HTTPError(404, "Not found")
+        job = self.jobs.get(match.group(1))
+        if job is None:
+            raise HTTPError(404, "Unknown job")
+        if method != "GET":
+            raise HTTPError(405, "Use GET")
+
+        if match.group(2):
+            if job.status != "done":
+                raise HTTPError(409, f"Job is {job.status}")
+            await self.send_file(writer, job.output_path, os.path.basename(job.output_path))
+            return
+
+        # Long-poll: ?wait=N holds the request until the job finishes or N seconds pass
+        try:
+            wait = min(float(query.get("wait", 0) or 0), 60.0)
+        except ValueError:
+            raise HTTPError(400, f"wait must be a number of seconds, not '{query.get('wait')}'")
+        if wait > 0 and not job.done_event.is_set():
+            try:
+                await asyncio.wait_for(job.done_event.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+        await self.send_json(writer, 200, job.to_dict())
+
+    async def receive_upload(self, query, headers, reader):
+        campus = query.get("campus") or None
+        slim = query.get("slim", "").lower() in ("1", "true", "yes")
+        deactivate = query.get("deactivate", "").lower() in ("1", "true", "yes")
+        if campus is not None and campus not in engine.CAMPUSES:
+            raise HTTPError(400, f"Unknown campus '{campus}'. Choose one of: {', '.join(engine.CAMPUSES)}")
+
+        body = BodyReader(reader, headers, self.max_upload_bytes)
+        upload_dir = tempfile.mkdtemp(prefix="upload_", dir=self.work_dir)
+        content_type = headers.get("content-type", "")
+        try:
+            if content_type.startswith("multipart/form-data"):
+                match = re.search(r'boundary="?([^";]+)"?', content_type)
+                if not match:
+                    raise HTTPError(400, "Multipart upload without a boundary")
+                def make_path(filename):
+                    return os.path.join(tempfile.mkdtemp(prefix="job_", dir=upload_dir), "input.als")
+                files = await save_multipart_body(body, match.group(1).encode("latin-1"), make_path)
+            else:
+                filename = query.get("filename") or "upload.als"
+                input_path = os.path.join(tempfile.mkdtemp(prefix="job_", dir=upload_dir), "input.als")
+                await save_raw_body(body, input_path)
+                files = [(os.path.basename(filename), input_path)]
+        except Exception:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise
+
+        jobs = []
+        for filename, input_path in files:
+            if not filename.lower().endswith(".als"):
+                os.remove(input_path)
+                continue
+            jobs.append(self.submit(filename, campus, input_path, slim, deactivate))
+        if not jobs:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            raise HTTPError(400, "No .als files in the upload")
+        return jobs
+
+async def serve(host, port, work_dir, workers, max_upload_mb):
+    service = RouterHTTPService(work_dir, workers=workers, max_upload_mb=max_upload_mb)
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    loop = asyncio.get_running_loop()
+    purge_task = loop.create_task(service.purge_expired())
+    # The workers ignore SIGTERM; a service stop lets the files being routed finish, then exits
+    loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    print(f"Routing service listening on http://{host}:{port} ({workers} workers)")
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        print("Stopping...")
+    finally:
+        purge_task.cancel()
+        service.pool.shutdown(cancel_futures=True)
+
+# --- Client helpers (used by the Streamlit app and scripts) ---
+
+def submit_and_wait(service_url, file_obj, filename, campus=None, timeout=300, slim=False, deactivate=False):
+    """Upload one .als to a running service, long-poll until done and return (bytes, output filename)."""
+    import requests
+
+    params = {"filename": filename}
+    if campus:
+        params["campus"] = campus
+    if slim:
+        params["slim"] = "1"
+    if deactivate:
+        params["deactivate"] = "1"
+    with requests.Session() as session:
+        response = session.post(f"{service_url}/jobs", params=params, data=file_obj,
+                                headers={"Content-Type": "application/octet-stream"}, timeout=60)
+        response.raise_for_status()
+        job = response.json()["jobs"][0]
+        deadline = time.time() + timeout
+        while job["status"] in ("queued", "running"):
+            if time.time() > deadline:
+                raise TimeoutError(f"Routing {filename} took longer than {timeout}s")
+            response = session.get(f"{service_url}/jobs/{job['id']}", params={"wait": 30}, timeout=60)
+            response.raise_for_status()
+            job = response.json()
+        if job["status"] != "done":
+            raise RuntimeError(job.get("error") or f"Job {job['status']}")
+        response = session.get(f"{service_url}{job['result_url']}", timeout=60)
+        response.raise_for_status()
+        return response.content, job["output_filename"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP service that routes uploaded .als files on a process pool.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8601)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--work-dir", default=None, help="Where uploads and results are kept (default: a temp dir)")
+    parser.add_argument("--max-upload-mb", type=int, default=DEFAULT_MAX_UPLOAD_MB)
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ableton_router_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        asyncio.run(serve(args.host, args.port, work_dir, args.workers, args.max_upload_mb))
+    except KeyboardInterrupt:
+        print("Stopping...")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,39 @@
-import gzip
 import xml.etree.ElementTree as ET
 import os
-import tempfile
 import math
+import hashlib
+import time
+import threading
 import streamlit as st
 from io import BytesIO
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+
+import Ableton_Router_Engine as engine
+from Ableton_Track_Matcher import TrackMatcher
+
+# Spreadsheet to read (point ROUTER_SHEET_URL at a local server to test without Google)
+SHEET_BASE_URL = os.environ.get(
+    "ROUTER_SHEET_URL", "https://docs.google.com/spreadsheets/d/1v-ijfylVlbJB3qLJu-dXbFgdbeuWgJjOIj2umhcE9Q8"
+).rstrip("/")
+# Tabs as "Name=gid" pairs, comma separated, e.g. "Defaults=0,Brandon=1234,Riverview=5678". The Defaults
+# tab applies to every campus and each other tab holds one campus. Unset: the single wide sheet (gid 0).
+SHEET_TABS = os.environ.get("ROUTER_SHEET_TABS", "")
+DEFAULTS_TAB = "Defaults"
+TAB_COLUMNS = ["Track Name", "Routing", "Instruction"]
+SHEET_CACHE_SECONDS = 600
+
+def sheet_csv_url(gid):
+    return f"{SHEET_BASE_URL}/export?format=csv&gid={gid}"
 
 # Function to read the Google Sheet via CSV export
-@st.cache_data(ttl=600)  # Cache for 10 minutes
+@st.cache_data(ttl=SHEET_CACHE_SECONDS)  # Cache for 10 minutes
 def load_spreadsheet_data_csv():
     try:
-        url = "https://docs.google.com/spreadsheets/d/1v-ijfylVlbJB3qLJu-dXbFgdbeuWgJjOIj2umhcE9Q8/export?format=csv&gid=0"
+        url = sheet_csv_url(0)
         response = requests.get(url, timeout=10)
         response.raise_for_status()
         data = StringIO(response.text)
@@ -29,6 +49,145 @@ def load_spreadsheet_data_csv():
         st.error(f"Error: Failed to load spreadsheet data: {str(e)}")
         return None
 
+def parse_sheet_tabs(spec):
+    """Parse "Name=gid,Name=gid" into [(name, gid)]."""
+    tabs = []
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        name, _, gid = entry.rpartition("=")
+        if not name.strip() or not gid.strip().isdigit():
+            raise ValueError(f"Invalid sheet tab '{entry.strip()}'. Expected Name=gid.")
+        tabs.append((name.strip(), gid.strip()))
+    return tabs
+
+class SheetSource:
+    """Fetches spreadsheet tabs concurrently over one pooled HTTP session.
+
+    Each tab is cached for cache_seconds on its own, so a campus tab that changed is the only
+    one fetched again. If a refresh fails, the last good copy of that tab is used.
+    """
+
+    def __init__(self, base_url, cache_seconds=SHEET_CACHE_SECONDS, timeout=10):
+        self.base_url = base_url
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Keep one connection per tab open so every tab is requested at the same time
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = {}  # gid -> (fetched at, DataFrame)
+        self.lock = threading.Lock()
+
+    def fetch_tab(self, gid):
+        with self.lock:
+            cached = self.cache.get(gid)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+            return cached[1]
+        try:
+            response = self.session.get(f"{self.base_url}/export?format=csv&gid={gid}", timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            if cached is not None:
+                return cached[1]
+            raise
+        # Read every cell as text so channels like "1" don't turn into 1.0
+        df = pd.read_csv(StringIO(response.text), dtype=str)
+        with self.lock:
+            self.cache[gid] = (time.monotonic(), df)
+        return df
+
+    def fetch_tabs(self, gids):
+        """Fetch all tabs in one round-trip; returns {gid: DataFrame or the exception it raised}."""
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(gids))) as pool:
+            futures = {gid: pool.submit(self.fetch_tab, gid) for gid in dict.fromkeys(gids)}
+            for gid, future in futures.items():
+                try:
+                    results[gid] = future.result()
+                except Exception as e:
+                    results[gid] = e
+        return results
+
+@st.cache_resource
+def get_sheet_source():
+    """One session (and tab cache) for the whole server."""
+    return SheetSource(SHEET_BASE_URL)
+
+# Function to check one tab's layout; returns (problems, cleaned DataFrame or None)
+def validate_tab(name, df):
+    missing = [column for column in TAB_COLUMNS if column not in df.columns]
+    if missing:
+        return [f"Tab '{name}' is missing the column(s) {', '.join(missing)}; skipping it."], None
+    df = df[TAB_COLUMNS].copy()
+    df["Track Name"] = df["Track Name"].fillna("").astype(str).str.strip()
+    df = df[df["Track Name"] != ""]
+    problems = []
+    duplicates = df.loc[df["Track Name"].duplicated(), "Track Name"].unique()
+    if len(duplicates):
+        problems.append(f"Tab '{name}' lists {', '.join(duplicates)} more than once; using the first row.")
+        df = df.drop_duplicates("Track Name")
+    return problems, df
+
+# Function to merge the Defaults tab and the campus tabs into the wide table used below:
+# "Track Name", then a (routing, instruction) column pair per campus
+def merge_tabs(defaults, campus_tabs):
+    def cell(value):
+        # Empty cells become None, which process_als skips (NaN would read as a channel/dB value)
+        return None if pd.isna(value) or not str(value).strip() else str(value).strip()
+
+    def rows_of(df):
+        return {row["Track Name"]: (cell(row["Routing"]), cell(row["Instruction"])) for row in df.to_dict("records")}
+
+    default_rows = rows_of(defaults) if defaults is not None else {}
+    campus_rows = {campus: rows_of(df) for campus, df in campus_tabs.items()}
+    track_names = list(default_rows)
+    for rows in campus_rows.values():
+        track_names.extend(name for name in rows if name not in default_rows)
+    track_names = list(dict.fromkeys(track_names))
+
+    table = {"Track Name": track_names}
+    for campus, rows in campus_rows.items():
+        # A campus row wins over the default; a campus without a row for a track gets the default
+        combined = [rows.get(name, default_rows.get(name, (None, None))) for name in track_names]
+        table[campus] = [routing for routing, _ in combined]
+        table[f"{campus} Instruction"] = [instruction for _, instruction in combined]
+    return pd.DataFrame(table, dtype=object)
+
+# Function to load every configured tab at once and merge them into one rule table
+def load_spreadsheet_tabs():
+    try:
+        tabs = parse_sheet_tabs(SHEET_TABS)
+    except ValueError as e:
+        st.error(f"Error: {str(e)}")
+        return None
+    frames = get_sheet_source().fetch_tabs([gid for _, gid in tabs])
+
+    defaults = None
+    campus_tabs = {}
+    for name, gid in tabs:
+        frame = frames[gid]
+        if isinstance(frame, requests.Timeout):
+            st.error(f"Error: Timed out while fetching the '{name}' tab. Please try again later.")
+            continue
+        if isinstance(frame, Exception):
+            st.error(f"Error: Failed to fetch the '{name}' tab: {str(frame)}")
+            continue
+        problems, frame = validate_tab(name, frame)
+        for problem in problems:
+            st.warning(problem)
+        if frame is None:
+            continue
+        if name == DEFAULTS_TAB:
+            defaults = frame
+        else:
+            campus_tabs[name] = frame
+
+    if not campus_tabs:
+        return None
+    return merge_tabs(defaults, campus_tabs)
+
 # Function to dynamically generate the channel map based on routing values in the spreadsheet
 def generate_channel_map(df, campus_columns):
     channel_map = {}
@@ -77,134 +236,143 @@ def map_channel_to_target(channel, channel_map):
         return None
     return channel_map[channel]
 
-# Function to process an .als file based on the selected campus
-def process_als(input_file_bytes, original_filename, selected_campus, df, campus_columns, channel_map):
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_xml = os.path.join(temp_dir, "temp.xml")
-            temp_modified_xml = os.path.join(temp_dir, "temp_modified.xml")
+# Function to index the spreadsheet's track names once for exact/normalized/fuzzy matching
+def build_track_matcher(df):
+    return TrackMatcher(df["Track Name"].dropna().astype(str))
 
-            # Decompress .als file to XML
-            with gzip.open(input_file_bytes, "rb") as f_in:
-                with open(temp_xml, "wb") as f_out:
-                    f_out.write(f_in.read())
+# Function to fingerprint the rule table, so work derived from it is redone only when the sheet changes
+def sheet_digest(df):
+    digest = hashlib.sha256("\0".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
 
-            # Parse XML
-            tree = ET.parse(temp_xml)
-            root = tree.getroot()
+# The matcher is shared by every rerun and session; the leading underscore keeps Streamlit from hashing the table
+@st.cache_resource(max_entries=8)
+def cached_track_matcher(digest, _df):
+    return build_track_matcher(_df)
 
-            routing_col, instruction_col = campus_columns[selected_campus]
+# Function to look up spreadsheet rows by track name (the first row wins, as validate_tab reports)
+def index_track_rows(df):
+    rows = {}
+    for row in df.to_dict("records"):
+        rows.setdefault(str(row["Track Name"]), row)
+    return rows
 
-            # Process each track
-            for track in root.findall(".//AudioTrack") + root.findall(".//MidiTrack") + root.findall(".//GroupTrack"):
-                name_elem = track.find(".//Name/EffectiveName")
-                track_name = name_elem.get("Value") if name_elem is not None else None
+# Function to process an .als file based on the selected campus
+def process_als(input_file_bytes, original_filename, selected_campus, df, campus_columns, channel_map, matcher=None):
+    try:
+        # Decompress (or map plain XML) and parse
+        tree = engine.load_als(input_file_bytes)
+        root = tree.getroot()
 
-                if not track_name or track_name.strip() == "":
-                    continue
+        routing_col, instruction_col = campus_columns[selected_campus]
+        if matcher is None:
+            matcher = build_track_matcher(df)
+        rows = index_track_rows(df)
 
-                track_row = df[df["Track Name"].str.upper() == track_name.upper()]
-                if track_row.empty:
-                    continue
+        # Process each track
+        for track in root.findall(".//AudioTrack") + root.findall(".//MidiTrack") + root.findall(".//GroupTrack"):
+            name_elem = track.find(".//Name/EffectiveName")
+            track_name = name_elem.get("Value") if name_elem is not None else None
 
-                routing = track_row.iloc[0][routing_col]
-                instruction = track_row.iloc[0][instruction_col] if instruction_col in track_row else ""
+            if not track_name or track_name.strip() == "":
+                continue
 
-                if not routing:
-                    continue
+            match = matcher.match(track_name)
+            if match is None:
+                continue
+            if match.tier != "exact":
+                st.info(f"'{track_name}' matched spreadsheet row '{match.key}' ({match.tier} match, score {match.score:.2f})")
+            track_row = rows.get(match.key)
+            if track_row is None:
+                continue
 
-                channel = str(routing).strip()
-                instruction = str(instruction).strip() if instruction else ""
-                mute = instruction.lower() == "mute"
-                db_reduction = None
-                if instruction and not mute:
-                    try:
-                        db_reduction = float(instruction)
-                    except ValueError:
-                        st.warning(f"Invalid dB value '{instruction}' for track '{track_name}'.")
-
-                routing_dict = map_channel_to_target(channel, channel_map)
-                if routing_dict is None:
-                    continue
+            routing = track_row[routing_col]
+            instruction = track_row.get(instruction_col, "")
 
-                # --- Routing Logic ---
-                device_chain = track.find("DeviceChain") or ET.SubElement(track, "DeviceChain")
+            if not routing:
+                continue
 
-                # Remove any existing AudioOutputRouting to start fresh
-                existing_output = device_chain.find("AudioOutputRouting")
-                if existing_output is not None:
-                    device_chain.remove(existing_output)
+            channel = str(routing).strip()
+            instruction = str(instruction).strip() if instruction else ""
+            if match.tier == "fuzzy":
+                # Loose matches only pick the output; they never mute or change volume
+                instruction = ""
+            mute = instruction.lower() == "mute"
+            db_reduction = None
+            if instruction and not mute:
+                try:
+                    db_reduction = float(instruction)
+                except ValueError:
+                    st.warning(f"Invalid dB value '{instruction}' for track '{track_name}'.")
+
+            routing_dict = map_channel_to_target(channel, channel_map)
+            if routing_dict is None:
+                continue
 
-                # Create a new AudioOutputRouting element
-                output_elem = ET.SubElement(device_chain, "AudioOutputRouting")
-                target_elem = ET.SubElement(output_elem, "Target")
-                upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
-                lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
-                mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+            # --- Routing Logic ---
+            device_chain = track.find("DeviceChain") or ET.SubElement(track, "DeviceChain")
+
+            # Remove any existing AudioOutputRouting to start fresh
+            existing_output = device_chain.find("AudioOutputRouting")
+            if existing_output is not None:
+                device_chain.remove(existing_output)
+
+            # Create a new AudioOutputRouting element
+            output_elem = ET.SubElement(device_chain, "AudioOutputRouting")
+            target_elem = ET.SubElement(output_elem, "Target")
+            upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
+            lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
+            mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+
+            target_elem.set("Value", routing_dict["Target"])
+            upper_elem.set("Value", "Ext. Out")
+            lower_elem.set("Value", routing_dict["LowerDisplayString"])
+            mpe_settings.text = None
+
+            # Debug: Log the routing for this track
+            ##st.write(f"Track: {track_name}, Target: {routing_dict['Target']}, Lower: {routing_dict['LowerDisplayString']}")
+
+            # --- Mute Logic ---
+            mixer = device_chain.find("Mixer") or ET.SubElement(device_chain, "Mixer")
+            speaker = mixer.find("Speaker") or ET.SubElement(mixer, "Speaker")
+
+            # Remove any existing Manual elements to avoid duplicates
+            existing_manuals = speaker.findall("Manual")
+            for manual in existing_manuals:
+                speaker.remove(manual)
+            manual_speaker = ET.SubElement(speaker, "Manual")
+            manual_speaker.set("Value", "false" if mute else "true")
+
+            # --- Volume Adjustment Logic ---
+            if db_reduction is not None and db_reduction != 0.0:
+                volume = mixer.find("Volume") or ET.SubElement(mixer, "Volume")
+                
+                # Remove any existing Manual elements to avoid duplicates
+                existing_manuals = volume.findall("Manual")
+                for manual in existing_manuals:
+                    volume.remove(manual)
+                
+                # Create a single Manual element
+                manual_volume = ET.SubElement(volume, "Manual")
+                manual_volume.set("Value", "0.794328")  # Default value if none exists
 
-                target_elem.set("Value", routing_dict["Target"])
-                upper_elem.set("Value", "Ext. Out")
-                lower_elem.set("Value", routing_dict["LowerDisplayString"])
-                mpe_settings.text = None
+                current_volume = float(manual_volume.get("Value"))
+                current_db = 20 * math.log10(current_volume) if current_volume > 0 else -float('inf')
+                new_db = current_db + db_reduction
+                new_volume = 10 ** (new_db / 20) if new_db > -float('inf') else 0.0
+                manual_volume.set("Value", str(new_volume))
 
-                # Debug: Log the routing for this track
-                ##st.write(f"Track: {track_name}, Target: {routing_dict['Target']}, Lower: {routing_dict['LowerDisplayString']}")
+        # Recompress to .als
+        output_buffer = BytesIO()
+        engine.save_als(tree, output_buffer)
+        output_bytes = output_buffer.getvalue()
 
-                # --- Mute Logic ---
-                mixer = device_chain.find("Mixer") or ET.SubElement(device_chain, "Mixer")
-                speaker = mixer.find("Speaker") or ET.SubElement(mixer, "Speaker")
+        base_name = os.path.splitext(original_filename)[0]
+        campus_for_filename = selected_campus.replace(" ", "").replace("ñ", "n")
+        output_filename = f"{base_name}_{campus_for_filename}_routed (with spreadsheet).als"
 
-                # Remove any existing Manual elements to avoid duplicates
-                existing_manuals = speaker.findall("Manual")
-                for manual in existing_manuals:
-                    speaker.remove(manual)
-                manual_speaker = ET.SubElement(speaker, "Manual")
-                manual_speaker.set("Value", "false" if mute else "true")
-
-                # --- Volume Adjustment Logic ---
-                if db_reduction is not None and db_reduction != 0.0:
-                    volume = mixer.find("Volume") or ET.SubElement(mixer, "Volume")
-                    
-                    # Remove any existing Manual elements to avoid duplicates
-                    existing_manuals = volume.findall("Manual")
-                    for manual in existing_manuals:
-                        volume.remove(manual)
-                    
-                    # Create a single Manual element
-                    manual_volume = ET.SubElement(volume, "Manual")
-                    manual_volume.set("Value", "0.794328")  # Default value if none exists
-
-                    current_volume = float(manual_volume.get("Value"))
-                    current_db = 20 * math.log10(current_volume) if current_volume > 0 else -float('inf')
-                    new_db = current_db + db_reduction
-                    new_volume = 10 ** (new_db / 20) if new_db > -float('inf') else 0.0
-                    manual_volume.set("Value", str(new_volume))
-
-            # Save modified XML with explicit encoding
-            tree.write(temp_modified_xml, encoding="utf-8", xml_declaration=True)
-
-            # Debug: Save the intermediate XML for inspection
-            ##with open(temp_modified_xml, "r", encoding="utf-8") as f:
-               ## xml_content = f.read()
-          ##  st.download_button(
-               ## label=f"Download Intermediate XML for {original_filename}",
-              ##  data=xml_content,
-              ##  file_name=f"{os.path.splitext(original_filename)[0]}_modified.xml",
-              ##  mime="text/xml"
-           ## )
-
-            # Recompress to .als
-            output_buffer = BytesIO()
-            with open(temp_modified_xml, "rb") as f_in:
-                with gzip.GzipFile(fileobj=output_buffer, mode="wb") as f_out:
-                    f_out.write(f_in.read())
-            output_bytes = output_buffer.getvalue()
-
-            base_name = os.path.splitext(original_filename)[0]
-            campus_for_filename = selected_campus.replace(" ", "").replace("ñ", "n")
-            output_filename = f"{base_name}_{campus_for_filename}_routed (with spreadsheet).als"
-
-            return output_bytes, output_filename
+        return output_bytes, output_filename
 
     except Exception as e:
         st.error(f"Error: Failed to process {original_filename}: {str(e)}")
@@ -215,7 +383,7 @@ def main():
     st.title("Ableton Live Router (Spreadsheet)")
     st.write("Select a campus and upload your Ableton Live (.als) files to route tracks according to the spreadsheet rules.")
 
-    df = load_spreadsheet_data_csv()
+    df = load_spreadsheet_tabs() if SHEET_TABS else load_spreadsheet_data_csv()
     if df is None:
         st.error("Cannot proceed without spreadsheet data. Please ensure the spreadsheet is publicly viewable and the URL is correct.")
         return
@@ -235,6 +403,7 @@ def main():
         return
 
     channel_map = generate_channel_map(df, campus_columns)
+    matcher = cached_track_matcher(sheet_digest(df), df)
 
     selected_campus = st.selectbox("Select Campus", CAMPUSES)
     uploaded_files = st.file_uploader(f"Select Ableton Live (.als) Files for {selected_campus}", type=["als"], accept_multiple_files=True)
@@ -250,7 +419,7 @@ def main():
                 continue
 
             with st.spinner(f"Processing {original_filename} for {selected_campus}..."):
-                output_bytes, output_filename = process_als(file_bytes, original_filename, selected_campus, df, campus_columns, channel_map)
+                output_bytes, output_filename = process_als(file_bytes, original_filename, selected_campus, df, campus_columns, channel_map, matcher)
 
             if output_bytes and output_filename:
                 processed_count += 1
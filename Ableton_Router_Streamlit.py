@@ -1,226 +1,178 @@
-import gzip
-import xml.etree.ElementTree as ET
 import os
-import tempfile
-import math
+import time
+import hashlib
+from concurrent.futures import as_completed
+import pandas as pd
 import streamlit as st
 from io import BytesIO
 
-# Routing rules mapping track names to routing values
-ROUTING_MAP = {
-    "GUIDE": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CUES": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CLICK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "CLICK TRACK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "GUIDE TRACK": {"Target": "AudioOut/External/M0", "LowerDisplayString": "1"},
-    "SUB BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "SYNTH BASS": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "SUB": {"Target": "AudioOut/External/M1", "LowerDisplayString": "2"},
-    "HOOKS": {"Target": "AudioOut/External/S1", "LowerDisplayString": "3/4"},
-    "AG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "BGV": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "BGVS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITARS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "E GUITAR 11": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GUITAR 11": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 6": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 7": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 8": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 9": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "EG 10": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 3": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 4": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "KEYS 5": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "SYNTH": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "ACOUSTIC": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "ACOUSTIC GUITAR": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PIANO": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PIANO LINE": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GANG VOCALS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "VOCALS": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR 1": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "CHOIR 2": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "PERC": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "DRUMS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "LOOP": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "LOOP 2": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "TAMBO": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "TAMBORINE": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "FX": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "SYNTH FX": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "HITS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "PERC HITS": {"Target": "AudioOut/External/S3", "LowerDisplayString": "7/8"},
-    "ORGAN": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-    "GANG": {"Target": "AudioOut/External/S2", "LowerDisplayString": "5/6"},
-}
+import Ableton_Router_Engine as engine
+from Ableton_Router_Pool import get_router_pool, session_slots, map_for_session, show_profile_report
+from Ableton_Router_Profile import run_profiled, ProfileReport
+from Ableton_LiveSet import LiveSet
+from Ableton_Waveform_Peaks import PeakService, render_thumbnail, is_silent
 
-# Define tracks to mute and turn down
-MUTE_TRACKS = {"BASS", "DRUMS", "AG", "ACOUSTIC", "ACOUSTIC GUITAR", "PIANO"}
-TURN_DOWN_TRACKS = {"CHOIR", "BGV", "BGVS", "GANG VOCALS", "VOCALS", "CHOIR 1", "CHOIR 2", "GANG"}
-VOLUME_REDUCTION_DB = -10  # Reduce volume by 10 dB
+# When set (e.g. http://127.0.0.1:8601), uploads are routed by Ableton_Router_Service.py instead of in this session
+ROUTER_SERVICE_URL = os.environ.get("ROUTER_SERVICE_URL", "").rstrip("/")
 
-def process_als(input_file_bytes, original_filename):
-    """
-    Process an .als file and return the processed file as bytes along with the output filename.
-    input_file_bytes: Bytes of the input .als file
-    original_filename: Original filename for naming the output file
-    """
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_xml = os.path.join(temp_dir, "temp.xml")
-            temp_modified_xml = os.path.join(temp_dir, "temp_modified.xml")
-
-            # Decompress .als file to XML
-            with gzip.open(input_file_bytes, "rb") as f_in:
-                with open(temp_xml, "wb") as f_out:
-                    f_out.write(f_in.read())
+def process_via_service(input_file_bytes, original_filename, slim=False, deactivate=False):
+    """Send an .als file to the routing service and wait for the result: (output bytes, output filename), or (None, None) on failure."""
+    from Ableton_Router_Service import submit_and_wait
 
-            # Parse XML
-            tree = ET.parse(temp_xml)
-            root = tree.getroot()
+    try:
+        return submit_and_wait(ROUTER_SERVICE_URL, input_file_bytes, original_filename, slim=slim, deactivate=deactivate)
+    except Exception as e:
+        st.error(f"Error: Failed to process {original_filename}: {str(e)}")
+        return None, None
 
-            # Process each track
-            for track_type in ["AudioTrack", "MidiTrack", "GroupTrack"]:
-                for track in root.findall(f".//{track_type}"):
-                    name_elem = track.find(".//Name/EffectiveName")
-                    track_name = name_elem.get("Value") if name_elem is not None else None
+# --- Rule editor ---
 
-                    if not track_name or track_name.strip() == "":
-                        continue  # Skip silently
+def get_session_set(file_bytes, original_filename, slim=False):
+    """Parse and route an upload once per session; later reruns reuse the tree (keyed by upload digest)."""
+    with file_bytes.getbuffer() as view:
+        digest = hashlib.sha1(view).hexdigest()
+    sets = st.session_state.setdefault("routed_sets", {})
+    key = (digest, slim)
+    if key not in sets:
+        tree = engine.load_als(file_bytes)
+        root = tree.getroot()
+        results = engine.route_tree(root)
+        if slim:
+            engine.slim_tree(root, results)
+        live_set = LiveSet(root)
+        by_id = {result.track_id: result for result in results}
+        rows = []
+        for track in live_set.tracks:
+            if not track.name or track.name.strip() == "":
+                continue
+            result = by_id.get(track.id)
+            match = result.match if result is not None else None
+            group = live_set.group_of(track)
+            rows.append({
+                "Id": track.id,
+                "Track": track.name,
+                "Type": track.kind.replace("Track", ""),
+                "Group": group.name if group is not None else "",
+                "Rule": (f"{match.key} ({match.tier}, not applied)" if result.action == "unrouted" else
+                         f"{match.key} ({match.tier})") if match is not None else "",
+                "Output": track.routing.label,
+                "Mute": track.mixer.muted,
+                "Gain (dB)": track.mixer.gain_db,
+            })
+        sets[key] = {
+            "tree": tree,
+            "tracks": {track.id: track.element for track in live_set.tracks},
+            "choices": engine.output_choices(root),
+            "table": pd.DataFrame(rows).set_index("Id"),
+            "version": 0,
+            "download": None,
+            "filename": f"{os.path.splitext(original_filename)[0]}_routed.als",
+        }
+    return sets[key]
 
-                    # --- Routing Logic ---
-                    device_chain = track.find("DeviceChain")
-                    if device_chain is None:
-                        device_chain = ET.SubElement(track, "DeviceChain")
+def apply_edits(routed_set, edited):
+    """Re-apply only the rows that changed since the last rerun. Returns the changed track names."""
+    table = routed_set["table"]
+    changed = []
+    for track_id, row in edited.iterrows():
+        previous = table.loc[track_id]
+        gain_db = row["Gain (dB)"]
+        if pd.isna(gain_db):
+            gain_db = previous["Gain (dB)"]
+        values = (row["Output"], bool(row["Mute"]), float(gain_db))
+        if values == (previous["Output"], bool(previous["Mute"]), float(previous["Gain (dB)"])):
+            continue
+        engine.apply_track_state(routed_set["tracks"][track_id], *values, routed_set["choices"])
+        table.loc[track_id, ["Output", "Mute", "Gain (dB)"]] = values
+        changed.append(row["Track"])
+    if changed:
+        routed_set["version"] += 1
+    return changed
 
-                    output_elem = device_chain.find("AudioOutputRouting")
-                    if output_elem is None:
-                        output_elem = ET.SubElement(device_chain, "AudioOutputRouting")
-                        target_elem = ET.SubElement(output_elem, "Target")
-                        upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
-                        lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
-                        mpe_settings = ET.SubElement(output_elem, "MpeSettings")
-                    else:
-                        target_elem = output_elem.find("Target")
-                        if target_elem is None:
-                            target_elem = ET.SubElement(output_elem, "Target")
-                        upper_elem = output_elem.find("UpperDisplayString")
-                        if upper_elem is None:
-                            upper_elem = ET.SubElement(output_elem, "UpperDisplayString")
-                        lower_elem = output_elem.find("LowerDisplayString")
-                        if lower_elem is None:
-                            lower_elem = ET.SubElement(output_elem, "LowerDisplayString")
-                        mpe_settings = output_elem.find("MpeSettings")
-                        if mpe_settings is None:
-                            mpe_settings = ET.SubElement(output_elem, "MpeSettings")
+@st.cache_resource
+def get_peak_service():
+    """One peak cache and worker pool for the whole server."""
+    return PeakService()
 
-                    found_match = False
-                    for keyword, routing_dict in ROUTING_MAP.items():
-                        if keyword.upper() == track_name.upper():
-                            target_elem.set("Value", routing_dict["Target"])
-                            upper_elem.set("Value", "Ext. Out")
-                            lower_elem.set("Value", routing_dict["LowerDisplayString"])
-                            if not mpe_settings.text and not list(mpe_settings):
-                                pass
-                            else:
-                                mpe_settings.text = None
-                                mpe_settings.clear()
-                            found_match = True
-                            break
+def track_waveforms(routed_set, project_dir=None):
+    """Thumbnail of each audio track's first sample; the peaks are computed by the service's
+    workers and each thumbnail is filled in as soon as it is ready."""
+    service = get_peak_service()
+    samples = {}
+    for track, file_ref in engine.sample_refs(routed_set["tree"].getroot()):
+        if track.tag == "AudioTrack" and track.get("Id") not in samples:
+            samples[track.get("Id")] = engine.resolve_sample_path(file_ref, project_dir)
 
-                    # --- Mute Logic (Updated to use Speaker) ---
-                    mixer = device_chain.find("Mixer")
-                    if mixer is None:
-                        mixer = ET.SubElement(device_chain, "Mixer")
+    futures = {}
+    for track_id, row in routed_set["table"].iterrows():
+        if row["Type"] != "Audio":
+            continue
+        name_column, image_column = st.columns([1, 3])
+        name_column.write(row["Track"])
+        slot = image_column.empty()
+        if track_id not in samples:
+            slot.caption("No clips")
+        elif samples[track_id] is None:
+            slot.caption("Sample not found on this machine")
+        else:
+            slot.caption("Loading waveform...")
+            futures[service.submit(samples[track_id])] = (slot, os.path.basename(samples[track_id]))
 
-                    speaker = mixer.find("Speaker")
-                    if speaker is None:
-                        speaker = ET.SubElement(mixer, "Speaker")
-                        manual_speaker = ET.SubElement(speaker, "Manual")
-                        manual_speaker.set("Value", "true")
-                    else:
-                        manual_speaker = speaker.find("Manual")
-                        if manual_speaker is None:
-                            manual_speaker = ET.SubElement(speaker, "Manual")
-                            manual_speaker.set("Value", "true")
+    for future in as_completed(futures):
+        slot, sample_name = futures[future]
+        try:
+            peaks = future.result()
+        except Exception as e:
+            slot.caption(f"{sample_name}: {str(e)}")
+            continue
+        caption = f"{sample_name} (silent)" if is_silent(peaks) else sample_name
+        slot.image(render_thumbnail(peaks), caption=caption, use_container_width=True)
 
-                    if track_name.upper() in MUTE_TRACKS:
-                        manual_speaker.set("Value", "false")
+def rule_editor(file_bytes, original_filename, slim=False, waveforms=False, project_dir=None):
+    """Editable per-track routing table; the set is only serialized when a download is built."""
+    try:
+        routed_set = get_session_set(file_bytes, original_filename, slim)
+    except Exception as e:
+        st.error(f"Error: Failed to process {original_filename}: {str(e)}")
+        return
 
-                    # --- Volume Adjustment Logic ---
-                    volume = mixer.find("Volume")
-                    if volume is None:
-                        volume = ET.SubElement(mixer, "Volume")
-                        manual_volume = ET.SubElement(volume, "Manual")
-                        manual_volume.set("Value", "0.794328")  # Default to 0 dB
-                    else:
-                        manual_volume = volume.find("Manual")
-                        if manual_volume is None:
-                            manual_volume = ET.SubElement(volume, "Manual")
-                            manual_volume.set("Value", "0.794328")
+    edited = st.data_editor(
+        routed_set["table"],
+        key=f"editor_{original_filename}",
+        disabled=["Track", "Type", "Group", "Rule"],
+        column_config={
+            "Output": st.column_config.SelectboxColumn("Output", options=list(routed_set["choices"]), required=True),
+            "Mute": st.column_config.CheckboxColumn("Mute"),
+            "Gain (dB)": st.column_config.NumberColumn("Gain (dB)", min_value=-70.0, max_value=6.0, step=0.5, format="%.1f"),
+        },
+        use_container_width=True,
+    )
+    start = time.perf_counter()
+    changed = apply_edits(routed_set, edited)
+    if changed:
+        st.caption(f"Updated {', '.join(changed)} in {(time.perf_counter() - start) * 1000:.1f} ms")
 
-                    current_volume = float(manual_volume.get("Value"))
-                    if track_name.upper() in TURN_DOWN_TRACKS:
-                        # Convert current volume to dB
-                        current_db = 20 * math.log10(current_volume) if current_volume > 0 else -float('inf')
-                        # Reduce by 10 dB
-                        new_db = current_db + VOLUME_REDUCTION_DB
-                        # Convert back to linear
-                        new_volume = 10 ** (new_db / 20) if new_db > -float('inf') else 0.0
-                        manual_volume.set("Value", str(new_volume))
+    # Outputs at a glance, from the table (no XML walk)
+    st.bar_chart(routed_set["table"][~routed_set["table"]["Mute"]]["Output"].value_counts())
 
-            # Save modified XML
-            tree.write(temp_modified_xml, encoding="utf-8", xml_declaration=True)
+    if waveforms:
+        track_waveforms(routed_set, project_dir)
 
-            # Recompress to .als
+    output_filename = routed_set["filename"]
+    download = routed_set["download"]
+    if download is None or download[0] != routed_set["version"]:
+        if st.button(f"Build {output_filename}", key=f"build_{original_filename}"):
             output_buffer = BytesIO()
-            with open(temp_modified_xml, "rb") as f_in:
-                with gzip.open(output_buffer, "wb") as f_out:
-                    f_out.write(f_in.read())
-
-            # Generate output filename
-            base_name = os.path.splitext(original_filename)[0]
-            output_filename = f"{base_name}_routed.als"
-
-            return output_buffer.getvalue(), output_filename
-
-    except Exception as e:
-        st.error(f"Error: Failed to process {original_filename}: {str(e)}")
-        return None, None
+            engine.save_als(routed_set["tree"], output_buffer)
+            routed_set["download"] = download = (routed_set["version"], output_buffer.getvalue())
+    if download is not None and download[0] == routed_set["version"]:
+        st.download_button(
+            label=f"Download {output_filename}",
+            data=download[1],
+            file_name=output_filename,
+            mime="application/octet-stream",
+            key=f"download_{original_filename}",
+        )
 
 # Streamlit app
 def main():
@@ -230,22 +182,66 @@ def main():
     # File uploader
     uploaded_files = st.file_uploader("Select Ableton Live (.als) Files", type=["als"], accept_multiple_files=True)
 
+    slim = st.checkbox("Slim sets for playback rigs (trim empty scenes, muted empty tracks and preview state)")
+    edit = st.checkbox("Edit routing per track before downloading")
+    # Not with the editor: a track unmuted there would keep its plugins switched off
+    deactivate = not edit and st.checkbox("Switch off plugins on muted tracks (saves CPU on playback rigs)")
+    waveforms = edit and st.checkbox("Show waveform thumbnails next to audio tracks")
+    # Uploads arrive without their project folder; relative sample paths resolve against this one
+    project_dir = st.text_input("Project folder on this machine (for samples stored relative to the set)") if waveforms else ""
+    # Profiling runs in this server's pool, so it isn't offered when a routing service does the work
+    profile = not ROUTER_SERVICE_URL and st.checkbox("Profile routing (per-file timing report and flamegraph stacks)")
+
     if uploaded_files:
-        processed_count = 0
+        uploads = []
         for uploaded_file in uploaded_files:
-            # Read the uploaded file
-            file_bytes = BytesIO(uploaded_file.read())
             original_filename = uploaded_file.name
-
             if not original_filename.lower().endswith(".als"):
                 st.warning(f"Skipping {original_filename}: Not an .als file.")
                 continue
 
-            # Process the file
-            with st.spinner(f"Processing {original_filename}..."):
-                output_bytes, output_filename = process_als(file_bytes, original_filename)
+            if edit:
+                with st.expander(original_filename, expanded=len(uploaded_files) == 1):
+                    rule_editor(BytesIO(uploaded_file.getvalue()), original_filename, slim, waveforms, project_dir or None)
+                continue
+            uploads.append((uploaded_file.getvalue(), original_filename, slim, deactivate))
+
+        if edit:
+            return
+
+        report = None
+        if ROUTER_SERVICE_URL:
+            results = []
+            for file_data, original_filename, _, _ in uploads:
+                with st.spinner(f"Processing {original_filename}..."):
+                    output_bytes, output_filename = process_via_service(BytesIO(file_data), original_filename, slim, deactivate)
+                results.append(((file_data, original_filename, slim, deactivate), (output_bytes, output_filename, []) if output_bytes else None, None))
+        else:
+            # Route on the server's shared pool; results appear in upload order as they finish
+            pool = get_router_pool()
+            if profile:
+                report = ProfileReport()
+                results = map_for_session(pool, session_slots(pool), run_profiled,
+                                          [(None, args[1], args[0], engine.route_upload) + args for args in uploads])
+            else:
+                results = map_for_session(pool, session_slots(pool), engine.route_upload, uploads)
 
-            if output_bytes and output_filename:
+        processed_count = 0
+        with st.spinner(f"Processing {len(uploads)} files..."):
+            for args, result, error in results:
+                original_filename = args[1]
+                if error is not None:
+                    st.error(f"Error: Failed to process {original_filename}: {str(error)}")
+                if result is None:
+                    st.error(f"Failed to process {original_filename}.")
+                    continue
+                if report is not None:
+                    result, file_profile = result
+                    report.add(file_profile)
+
+                output_bytes, output_filename, notes = result
+                for note in notes:
+                    st.info(note)
                 processed_count += 1
                 st.success(f"Processed {original_filename} → {output_filename}")
 
@@ -256,13 +252,13 @@ def main():
                     file_name=output_filename,
                     mime="application/octet-stream"
                 )
-            else:
-                st.error(f"Failed to process {original_filename}.")
 
         if processed_count > 0:
             st.success(f"Processed {processed_count} files successfully.")
         else:
             st.warning("No files were processed successfully.")
+        if report is not None and report.profiles:
+            show_profile_report(report)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,395 @@
+import os
+import sys
+import time
+import json
+import errno
+import queue
+import ctypes
+import ctypes.util
+import select
+import signal
+import struct
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import Ableton_Router_Engine as engine
+from Ableton_Router_Profile import run_profiled, ProfileReport
+
+# inotify flags (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+def is_candidate(path, output_dir):
+    """Only route .als files that aren't our own outputs or Live backups."""
+    if not path.lower().endswith(".als"):
+        return False
+    name = os.path.basename(path)
+    if name.startswith(".") or "_routed" in name:
+        return False
+    if os.sep + "Backup" + os.sep in path:
+        return False
+    return not os.path.abspath(path).startswith(os.path.abspath(output_dir) + os.sep)
+
+class PollingWatcher:
+    """Portable fallback: rescan the folders every interval and report new/changed files."""
+
+    def __init__(self, directories, interval=2.0):
+        self.directories = directories
+        self.interval = interval
+        self.snapshot = {}
+
+    def _scan(self):
+        current = {}
+        for directory in self.directories:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    current[path] = (stat.st_mtime, stat.st_size)
+        return current
+
+    def events(self, stop_event):
+        self.snapshot = self._scan()
+        # Everything already in the folder counts as "new" on start-up
+        yield list(self.snapshot)
+        while not stop_event.wait(self.interval):
+            current = self._scan()
+            changed = [path for path, signature in current.items() if self.snapshot.get(path) != signature]
+            self.snapshot = current
+            yield changed
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """Linux inotify watcher (via ctypes) covering every sub-folder of the watched directories."""
+
+    def __init__(self, directories):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.directories = directories
+        for directory in directories:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                self._add_watch(dirpath)
+
+    def _add_watch(self, path):
+        """Watch one folder; returns False when it was removed (or replaced by a file) before it could be watched."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return False
+            raise OSError(error, f"inotify_add_watch failed for {path}")
+        self.watches[wd] = path
+        return True
+
+    def events(self, stop_event):
+        existing = []
+        for directory in self.directories:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                existing.extend(os.path.join(dirpath, filename) for filename in filenames)
+        yield existing
+
+        while not stop_event.is_set():
+            readable, _, _ = select.select([self.fd], [], [], 1.0)
+            if not readable:
+                yield []
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+
+            changed = []
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                path = os.path.join(self.watches.get(wd, ""), os.fsdecode(name))
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self._add_watch(path):
+                        # Files copied in before the watch existed would otherwise be missed
+                        for dirpath, dirnames, filenames in os.walk(path):
+                            changed.extend(os.path.join(dirpath, filename) for filename in filenames)
+                    continue
+                changed.append(path)
+            yield changed
+
+    def close(self):
+        os.close(self.fd)
+
+def make_watcher(directories, force_polling=False, interval=2.0):
+    if not force_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(directories)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling every {interval}s")
+    return PollingWatcher(directories, interval)
+
+def _ignore_stop_signals():
+    # Ctrl+C and SIGTERM (sent to the whole group by a service stop) are handled by the service,
+    # which lets in-flight files finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+def route_for_campuses(input_file, outputs, slim=False, deactivate=False):
+    """Worker process entry point: write one routed set per (output file, campus).
+
+    The set is parsed and routed once per distinct rule variant, so campuses without
+    overrides in the rules file share a single routing pass.
+    """
+    by_variant = {}
+    for output_file, campus in outputs:
+        by_variant.setdefault(id(engine.RULES.variant(campus)), []).append((output_file, campus))
+    written = []
+    for variant_outputs in by_variant.values():
+        tree = engine.load_als(input_file)
+        results = engine.route_tree(tree.getroot(), campus=variant_outputs[0][1])
+        if slim:
+            stats = engine.slim_tree(tree.getroot(), results)
+            print(f"Slim {os.path.basename(input_file)}: {engine.format_slim_report(stats)}")
+        if deactivate:
+            stats = engine.deactivate_muted_devices(tree.getroot(), results)
+            print(f"Devices {os.path.basename(input_file)}: {engine.format_deactivate_report(stats)}")
+        for output_file, campus in variant_outputs:
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            engine.save_als(tree, output_file)
+            written.append(output_file)
+    return written
+
+class RouterService:
+    """Debounce file events, queue settled files and route them on a bounded worker pool."""
+
+    def __init__(self, directories, output_dir, campuses, workers=2, queue_size=100,
+                 settle_seconds=3.0, force_polling=False, poll_interval=2.0, metrics_file=None, slim=False,
+                 profile_dir=None, deactivate=False):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.output_dir = os.path.abspath(output_dir)
+        self.campuses = campuses
+        self.workers = workers
+        self.settle_seconds = settle_seconds
+        self.metrics_file = metrics_file
+        self.slim = slim
+        self.deactivate = deactivate
+        self.profile_dir = profile_dir
+        self.profiles = ProfileReport()
+        self.watcher = make_watcher(self.directories, force_polling, poll_interval)
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        # Set by a second stop signal: skip the rest of the queue
+        self.abort_event = threading.Event()
+        self.pending = {}  # path -> (first seen, last event, last (mtime, size))
+        self.done_signatures = {}  # path -> (mtime, size) last routed (or failed) in this run
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.latencies = []
+
+    def outputs_for(self, input_file):
+        relative_dir = os.path.dirname(os.path.relpath(input_file, self._root_for(input_file)))
+        outputs = []
+        for campus in self.campuses:
+            campus_dir = os.path.join(self.output_dir, campus.replace(" ", "_"), relative_dir)
+            outputs.append((os.path.join(campus_dir, engine.campus_output_name(input_file, campus)), campus))
+        return outputs
+
+    def outputs_current(self, input_file, stat):
+        """True when every campus output exists and is newer than the input, e.g. routed before a restart."""
+        for output_file, _ in self.outputs_for(input_file):
+            try:
+                if os.path.getmtime(output_file) < stat.st_mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _root_for(self, path):
+        for directory in self.directories:
+            if path.startswith(directory + os.sep):
+                return directory
+        return os.path.dirname(path)
+
+    def _note_events(self, paths):
+        now = time.monotonic()
+        for path in paths:
+            if not is_candidate(path, self.output_dir):
+                continue
+            first_seen = self.pending[path][0] if path in self.pending else now
+            self.pending[path] = (first_seen, now, None)
+
+    def _promote_settled(self):
+        """Move files that stopped changing for settle_seconds into the job queue."""
+        now = time.monotonic()
+        for path, (first_seen, last_event, last_signature) in list(self.pending.items()):
+            if now - last_event < self.settle_seconds:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            signature = (stat.st_mtime, stat.st_size)
+            if signature != last_signature:
+                # Still being written (or first check): wait another settle period
+                self.pending[path] = (first_seen, now, signature)
+                continue
+            if self.done_signatures.get(path) == signature or self.outputs_current(path, stat):
+                del self.pending[path]
+                continue
+            try:
+                self.jobs.put_nowait((path, signature, first_seen))
+            except queue.Full:
+                # Back-pressure: leave it pending and retry on the next tick
+                return
+            del self.pending[path]
+
+    def _worker(self, pool):
+        # After a stop request the queue is drained before the worker exits
+        while not self.abort_event.is_set():
+            try:
+                path, signature, first_seen = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    return
+                continue
+            with self.lock:
+                self.in_flight += 1
+            try:
+                if self.profile_dir:
+                    outputs, profile = pool.submit(run_profiled, self.profile_dir, path, path, route_for_campuses,
+                                                   path, self.outputs_for(path), self.slim, self.deactivate).result()
+                    with self.lock:
+                        self.profiles.add(profile)
+                        self.profiles.write(self.profile_dir)
+                else:
+                    outputs = pool.submit(route_for_campuses, path, self.outputs_for(path), self.slim, self.deactivate).result()
+                with self.lock:
+                    self.processed += 1
+                    self.latencies.append(time.monotonic() - first_seen)
+                    del self.latencies[:-500]
+                self.done_signatures[path] = signature
+                print(f"Processed {path} -> {len(outputs)} campus outputs")
+            except Exception as e:
+                with self.lock:
+                    self.failed += 1
+                self.done_signatures[path] = signature
+                print(f"Error: Failed to process {path}: {str(e)}")
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+                self.jobs.task_done()
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            def percentile(p):
+                if not latencies:
+                    return None
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+            return {
+                "pending": len(self.pending),
+                "queue_depth": self.jobs.qsize(),
+                "in_flight": self.in_flight,
+                "processed": self.processed,
+                "failed": self.failed,
+                "latency_p50_s": percentile(0.50),
+                "latency_p95_s": percentile(0.95),
+                "latency_max_s": round(latencies[-1], 3) if latencies else None,
+            }
+
+    def _write_metrics(self):
+        if not self.metrics_file:
+            return
+        temp_file = self.metrics_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump(dict(self.metrics(), time=time.time()), f)
+        os.replace(temp_file, self.metrics_file)
+
+    def request_stop(self, signum=None, frame=None):
+        """Stop watching and finish the queued files; a second request stops after the files in progress."""
+        if self.stop_event.is_set():
+            print("Stopping after the files in progress...")
+            self.abort_event.set()
+        else:
+            print(f"Stopping: finishing {self.jobs.qsize()} queued files (signal again to skip them)...")
+        self.stop_event.set()
+
+    def run(self):
+        print(f"Watching {', '.join(self.directories)} → {self.output_dir} for {', '.join(self.campuses)}")
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.request_stop)
+            signal.signal(signal.SIGINT, self.request_stop)
+        last_metrics = 0.0
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_ignore_stop_signals) as pool:
+            threads = [threading.Thread(target=self._worker, args=(pool,), daemon=True) for _ in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                for changed in self.watcher.events(self.stop_event):
+                    self._note_events(changed)
+                    self._promote_settled()
+                    if time.monotonic() - last_metrics >= 5.0:
+                        self._write_metrics()
+                        last_metrics = time.monotonic()
+            finally:
+                self.stop_event.set()
+                self.watcher.close()
+                while any(thread.is_alive() for thread in threads):
+                    for thread in threads:
+                        thread.join(timeout=1.0)
+                    self._write_metrics()
+        print(f"Processed {self.processed} files, {self.failed} failed.")
+        if self.profile_dir and self.profiles.profiles:
+            print(self.profiles.format_summary())
+            print(f"Profiles written to {self.profile_dir}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch folders and route new or changed .als files for each campus.")
+    parser.add_argument("directories", nargs="+", help="Folders to watch (recursively)")
+    parser.add_argument("--output", required=True, help="Folder for routed sets (one sub-folder per campus)")
+    parser.add_argument("--campus", action="append", help="Campus to route for (repeatable, default: all)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Routing processes")
+    parser.add_argument("--queue-size", type=int, default=100, help="Maximum queued files before back-pressure")
+    parser.add_argument("--settle", type=float, default=3.0, help="Seconds a file must stay unchanged before routing")
+    parser.add_argument("--poll", action="store_true", help="Use polling instead of inotify")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument("--metrics-file", help="Write queue depth/latency metrics JSON here every 5 seconds")
+    parser.add_argument("--slim", action="store_true", help="Trim empty scenes, muted empty tracks and preview state")
+    parser.add_argument("--deactivate-muted", action="store_true", help="Switch off the devices on rule-muted tracks to save CPU")
+    parser.add_argument("--profile", metavar="DIR", help="Profile each file and write per-file stats and flamegraph stacks here")
+    args = parser.parse_args(argv)
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"Error: {directory} is not a folder.")
+            return 1
+
+    service = RouterService(
+        args.directories, args.output, args.campus or engine.CAMPUSES,
+        workers=args.workers, queue_size=args.queue_size, settle_seconds=args.settle,
+        force_polling=args.poll, poll_interval=args.poll_interval, metrics_file=args.metrics_file,
+        slim=args.slim, profile_dir=args.profile, deactivate=args.deactivate_muted,
+    )
+    service.run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
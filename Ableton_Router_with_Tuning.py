@@ -1,18 +1,14 @@
-import gzip
-import xml.etree.ElementTree as ET
 import os
 import streamlit as st
 from io import BytesIO
 
+import Ableton_Router_Engine as engine
+from Ableton_LiveSet import LiveSet
+from Ableton_Sample_Audit import HeaderCache, audit_live_set, DEFAULT_CACHE_NAME, DEFAULT_SAMPLE_RATE
+
 def decompress_als_to_xml(als_file_bytes):
-    """Decompress an .als file to XML and return the root element."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_xml = os.path.join(temp_dir, "temp.xml")
-        with gzip.open(als_file_bytes, "rb") as f_in:
-            with open(temp_xml, "wb") as f_out:
-                f_out.write(f_in.read())
-        tree = ET.parse(temp_xml)
-        return tree.getroot()
+    """Decompress an .als file (or read plain XML) and return the root element."""
+    return engine.load_als(als_file_bytes).getroot()
 
 def find_audio_files_in_als(root, als_file_path):
     """Find all audio files in the .als file and map them to tracks."""
@@ -22,43 +18,19 @@ def find_audio_files_in_als(root, als_file_path):
     # Dictionary to store track-to-file mappings
     track_to_files = {}
 
-    # Find all audio tracks
-    for track in root.findall(".//AudioTrack"):
-        # Get the track name
-        name_elem = track.find(".//Name/EffectiveName")
-        track_name = name_elem.get("Value") if name_elem is not None else "Unnamed Track"
-
-        # Find all clips in the track
-        clips = track.findall(".//MainSequencer/ClipSlotList/ClipSlot/Clip/Sample")
-        audio_files = []
-
-        for clip in clips:
-            # Get the file reference
-            file_ref = clip.find("FileRef")
-            if file_ref is None:
+    # Every sample referenced by a track's clips (session and arrangement) or devices
+    for track in LiveSet(root).tracks:
+        track_name = track.name or "Unnamed Track"
+        for sample in track.samples:
+            candidates = sample.candidates(project_dir)
+            if not candidates:
                 continue
 
-            # Extract the file path
-            path_elem = file_ref.find("RelativePath") or file_ref.find("Path")
-            if path_elem is None:
-                continue
-
-            relative_path = path_elem.get("Value", "")
-            if not relative_path:
-                continue
-
-            # Construct the full path
-            if project_dir:
-                # Assume the file is relative to the project directory
-                full_path = os.path.join(project_dir, relative_path)
-                full_path = os.path.normpath(full_path)  # Normalize path for the OS
-            else:
-                full_path = relative_path  # Fallback if we don't have the project dir
-
-            audio_files.append(full_path)
-
-        if audio_files:
-            track_to_files[track_name] = audio_files
+            # Prefer a path that exists on this machine, otherwise show the set's own reference
+            full_path = sample.resolve(project_dir) or candidates[0]
+            audio_files = track_to_files.setdefault(track_name, [])
+            if full_path not in audio_files:
+                audio_files.append(full_path)
 
     return track_to_files
 
@@ -69,6 +41,9 @@ def main():
 
     uploaded_file = st.file_uploader("Select an Ableton Live (.als) File", type=["als"])
     als_file_path = st.text_input("Enter the full path to the .als file (optional, for accurate file paths):", "")
+    audit = st.checkbox("Check sample formats (samples Live would resample in real time)")
+    sample_rate = st.selectbox("Playback rig sample rate", [44100, 48000, 88200, 96000],
+                               index=[44100, 48000, 88200, 96000].index(DEFAULT_SAMPLE_RATE)) if audit else None
 
     if uploaded_file:
         file_bytes = BytesIO(uploaded_file.read())
@@ -95,5 +70,20 @@ def main():
             else:
                 st.write("No audio files found in the project.")
 
+            if audit:
+                st.subheader("Sample Format Audit")
+                project_dir = os.path.dirname(als_file_path) if als_file_path else None
+                cache = HeaderCache(DEFAULT_CACHE_NAME)
+                try:
+                    issues, checked = audit_live_set(LiveSet(root), project_dir, cache, sample_rate)
+                finally:
+                    cache.close()
+                if issues:
+                    st.warning(f"{len(issues)} issue(s) across {checked} samples found on this machine.")
+                    st.dataframe([{"Track": issue.track, "Sample": os.path.basename(issue.path), "Problem": issue.problem}
+                                  for issue in issues], use_container_width=True)
+                else:
+                    st.success(f"All {checked} samples are WAV/AIFF at {sample_rate} Hz.")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,279 @@
+import os
+import re
+import heapq
+import tomllib
+from collections import namedtuple
+from operator import attrgetter
+
+from Ableton_Track_Matcher import TrackMatcher, TrackMatch
+
+# Rules file shared by every router script (override with ABLETON_RULES_FILE)
+RULES_FILE = os.environ.get("ABLETON_RULES_FILE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "routing_rules.toml")
+
+ACTIONS = ("output", "mute", "gain_db")
+TYPE_TAGS = {"AUDIO": "AudioTrack", "MIDI": "MidiTrack", "GROUP": "GroupTrack"}
+_CONDITIONS = {"name", "name_pattern", "type", "group", "group_pattern", "color", "has_clips", "campus"}
+_RULE_KEYS = _CONDITIONS | set(ACTIONS) | {"priority", "label"}
+# Outputs only an exact or normalized name match may pick: a wrong guess lands in the band's ears
+EXACT_ONLY_OUTPUTS = {"click"}
+
+# output is a {"Target", "UpperDisplayString", "LowerDisplayString"} dict (or None);
+# match is the TrackMatch of the rule that picked the output ("rule" tier for rules without names);
+# held is the fuzzy TrackMatch of an output rule that wasn't applied because it needs a closer match
+Decision = namedtuple("Decision", ["output", "mute", "gain_db", "match", "held"])
+NO_DECISION = Decision(None, None, None, None, None)
+
+class RuleError(ValueError):
+    """Raised when the rules file can't be compiled (the message names the offending rule)."""
+
+class TrackFacts:
+    """What rules can test about a track. Color and clip count are only read if a rule asks."""
+
+    __slots__ = ("track", "tag", "name", "group_name", "_clip_counter", "_color", "_has_clips")
+
+    def __init__(self, track, name, group_name=None, clip_counter=None):
+        self.track = track
+        self.tag = track.tag
+        self.name = name
+        self.group_name = group_name
+        self._clip_counter = clip_counter
+        self._color = self._has_clips = None
+
+    @property
+    def color(self):
+        if self._color is None:
+            color_elem = self.track.find("Color")
+            self._color = int(color_elem.get("Value", -1)) if color_elem is not None else -1
+        return self._color
+
+    @property
+    def has_clips(self):
+        if self._has_clips is None:
+            self._has_clips = self._clip_counter is not None and self._clip_counter(self.track) > 0
+        return self._has_clips
+
+class Rule:
+    __slots__ = ("index", "label", "names", "groups", "tags", "campuses", "priority", "predicates", "actions",
+                 "fuzzy_actions", "rank")
+
+    def __init__(self, index, label, names, groups, tags, campuses, priority, predicates, actions, fuzzy_actions):
+        self.index = index
+        self.label = label
+        self.names = names
+        self.groups = groups
+        self.tags = tags
+        self.campuses = campuses
+        self.priority = priority
+        self.predicates = predicates
+        self.actions = actions
+        # Actions a fuzzy name match may take: never mute or gain, and no exact-only output
+        self.fuzzy_actions = fuzzy_actions
+        self.rank = index
+
+_RANK = attrgetter("rank")
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+def _as_bool(spec, key, where):
+    # TOML has real booleans; a quoted "false" would otherwise count as true
+    value = spec[key]
+    if not isinstance(value, bool):
+        raise RuleError(f"{where}: {key} must be true or false, not {value!r}")
+    return value
+
+def _compile_pattern(pattern, where):
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise RuleError(f"{where}: bad pattern {pattern!r}: {e}")
+
+def compile_rule(index, spec, outputs):
+    """Turn one [[rules]] table into a Rule with precompiled predicates."""
+    names = tuple(str(name).upper() for name in _as_list(spec.get("name", [])))
+    label = str(spec.get("label") or (names[0] if names else f"rule {index + 1}"))
+    where = f"rule {index + 1} ({label})"
+    unknown = set(spec) - _RULE_KEYS
+    if unknown:
+        raise RuleError(f"{where}: unknown keys {', '.join(sorted(unknown))}")
+
+    groups = tuple(str(group).upper() for group in _as_list(spec.get("group", [])))
+    campuses = frozenset(_as_list(spec.get("campus", [])))
+    tags = set()
+    for track_type in _as_list(spec.get("type", [])):
+        tag = TYPE_TAGS.get(str(track_type).upper())
+        if tag is None:
+            raise RuleError(f"{where}: unknown track type {track_type!r} (use Audio, Midi or Group)")
+        tags.add(tag)
+
+    # Name and group lists are handled by the index; everything else becomes a predicate
+    predicates = []
+    if names and groups:
+        group_set = frozenset(groups)
+        predicates.append(lambda facts: (facts.group_name or "").upper() in group_set)
+    if "name_pattern" in spec:
+        search = _compile_pattern(spec["name_pattern"], where).search
+        predicates.append(lambda facts: search(facts.name) is not None)
+    if "group_pattern" in spec:
+        group_search = _compile_pattern(spec["group_pattern"], where).search
+        predicates.append(lambda facts: facts.group_name is not None and group_search(facts.group_name) is not None)
+    if "color" in spec:
+        colors = frozenset(int(color) for color in _as_list(spec["color"]))
+        predicates.append(lambda facts: facts.color in colors)
+    if "has_clips" in spec:
+        wanted = _as_bool(spec, "has_clips", where)
+        predicates.append(lambda facts: facts.has_clips == wanted)
+
+    actions = {}
+    if "output" in spec:
+        if spec["output"] not in outputs:
+            raise RuleError(f"{where}: unknown output {spec['output']!r}")
+        actions["output"] = outputs[spec["output"]]
+    if "mute" in spec:
+        actions["mute"] = _as_bool(spec, "mute", where)
+    if "gain_db" in spec:
+        actions["gain_db"] = float(spec["gain_db"])
+    if not actions:
+        raise RuleError(f"{where}: no output, mute or gain_db")
+    fuzzy_actions = frozenset({"output"} if spec.get("output") not in EXACT_ONLY_OUTPUTS else ())
+
+    return Rule(index, label, names, groups, frozenset(tags) or frozenset(TYPE_TAGS.values()), campuses,
+                int(spec.get("priority", 0)), tuple(predicates), actions, fuzzy_actions)
+
+class CompiledRules:
+    """The rules active for one campus, indexed for evaluation.
+
+    Rules are bucketed by track type, then by the track names (or parent group names) they
+    list, so a track only runs the predicates of rules that can apply to it. Each bucket is
+    pre-sorted by rank and the buckets are merged lazily; evaluation stops once every action
+    is decided.
+    """
+
+    def __init__(self, rules):
+        ordered = sorted(rules, key=lambda rule: (-rule.priority, not rule.campuses, rule.index))
+        self.rules = []
+        for rank, rule in enumerate(ordered):
+            rule = Rule(rule.index, rule.label, rule.names, rule.groups, rule.tags, rule.campuses,
+                        rule.priority, rule.predicates, rule.actions, rule.fuzzy_actions)
+            rule.rank = rank
+            self.rules.append(rule)
+
+        # Matcher keys in file order, so normalized/fuzzy ties go to the earlier rule
+        # Keys grouped by output target, so "Click (Guide)" still finds the click rule
+        by_index = sorted(self.rules, key=attrgetter("index"))
+        self.matcher = TrackMatcher([name for rule in by_index for name in rule.names],
+                                    groups={name: rule.actions["output"]["Target"] for rule in reversed(by_index)
+                                            if "output" in rule.actions for name in rule.names})
+        self.by_tag = {}
+        for tag in TYPE_TAGS.values():
+            name_index, group_index, others = {}, {}, []
+            for rule in self.rules:
+                if tag not in rule.tags:
+                    continue
+                if rule.names:
+                    for name in rule.names:
+                        name_index.setdefault(name, []).append(rule)
+                elif rule.groups:
+                    for group in rule.groups:
+                        group_index.setdefault(group, []).append(rule)
+                else:
+                    others.append(rule)
+            self.by_tag[tag] = (name_index, group_index, others)
+
+    def decide(self, facts):
+        """Resolve output, mute and gain for one track. Returns a Decision (NO_DECISION if no rule applies)."""
+        buckets = self.by_tag.get(facts.tag)
+        if buckets is None:
+            return NO_DECISION
+        name_index, group_index, others = buckets
+
+        match = self.matcher.match(facts.name) if name_index else None
+        candidates = [others]
+        if match is not None and match.key in name_index:
+            candidates.append(name_index[match.key])
+        if facts.group_name and group_index:
+            candidates.append(group_index.get(facts.group_name.upper(), ()))
+
+        decided = {}
+        held = None
+        for rule in (heapq.merge(*candidates, key=_RANK) if len(candidates) > 1 else others):
+            if not all(predicate(facts) for predicate in rule.predicates):
+                continue
+            rule_match = match if rule.names else TrackMatch(rule.label, "rule", 1.0)
+            for action, value in rule.actions.items():
+                if action in decided:
+                    continue
+                if rule_match.tier == "fuzzy" and action not in rule.fuzzy_actions:
+                    # A loose name match may pick an ordinary output but never mutes, turns down
+                    # or sends a track to the click
+                    if action == "output" and held is None:
+                        held = rule_match
+                    continue
+                decided[action] = (value, rule_match)
+            if len(decided) == len(ACTIONS):
+                break
+
+        if "output" in decided:
+            held = None
+        if not decided and held is None:
+            return NO_DECISION
+        output, output_match = decided.get("output", (None, None))
+        return Decision(output, decided.get("mute", (None,))[0], decided.get("gain_db", (None,))[0], output_match, held)
+
+class RuleSet:
+    """A parsed rules file. variant(campus) compiles (once) the rules that apply to a campus."""
+
+    def __init__(self, config, source="<rules>"):
+        self.source = source
+        self.campuses = list(config.get("campuses", []))
+        self.outputs = {}
+        for output_name, spec in config.get("outputs", {}).items():
+            if "target" not in spec:
+                raise RuleError(f"{source}: output {output_name!r} has no target")
+            self.outputs[output_name] = {
+                "Target": spec["target"],
+                "UpperDisplayString": spec.get("upper", "Ext. Out"),
+                "LowerDisplayString": str(spec.get("lower", "")),
+            }
+        try:
+            self.rules = [compile_rule(index, spec, self.outputs) for index, spec in enumerate(config.get("rules", []))]
+        except RuleError as e:
+            raise RuleError(f"{source}: {e}")
+        for rule in self.rules:
+            unknown = rule.campuses - set(self.campuses)
+            if self.campuses and unknown:
+                raise RuleError(f"{source}: rule {rule.index + 1} ({rule.label}) names unknown campus {', '.join(sorted(unknown))}")
+        self._variants = {}
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE):
+        with open(path, "rb") as f:
+            try:
+                config = tomllib.load(f)
+            except tomllib.TOMLDecodeError as e:
+                raise RuleError(f"{path}: {e}")
+        return cls(config, path)
+
+    def variant(self, campus=None):
+        """CompiledRules for a campus; campuses without overrides share the general variant."""
+        active = tuple(rule.index for rule in self.rules if not rule.campuses or campus in rule.campuses)
+        if active not in self._variants:
+            self._variants[active] = CompiledRules([self.rules[index] for index in active])
+        return self._variants[active]
+
+    def name_tables(self):
+        """Plain name → output / mute / gain views of the general, name-only rules (for lookups and reports)."""
+        routing_map, mute_tracks, gain_tracks = {}, set(), {}
+        for rule in self.rules:
+            if rule.campuses or rule.predicates or rule.groups:
+                continue
+            for name in rule.names:
+                if "output" in rule.actions:
+                    output = rule.actions["output"]
+                    routing_map.setdefault(name, {"Target": output["Target"], "LowerDisplayString": output["LowerDisplayString"]})
+                if rule.actions.get("mute"):
+                    mute_tracks.add(name)
+                if "gain_db" in rule.actions:
+                    gain_tracks.setdefault(name, rule.actions["gain_db"])
+        return routing_map, mute_tracks, gain_tracks
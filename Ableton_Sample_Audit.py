@@ -0,0 +1,243 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import Ableton_Router_Engine as engine
+from Ableton_Audio import AudioInfo, read_audio_info, AudioFormatError
+from Ableton_LiveSet import LiveSet
+
+DEFAULT_CACHE_NAME = "sample_headers.sqlite"
+# The rate the playback rigs' audio interfaces run at
+DEFAULT_SAMPLE_RATE = 44100
+# Bump when AudioInfo changes so cached headers are read again
+HEADER_VERSION = 1
+# Converted copies go here, inside the set's project folder
+CONVERTED_DIR = os.path.join("Samples", "Converted")
+# ffmpeg codec for a converted copy, by the source's encoding and bit depth
+FFMPEG_CODECS = {("pcm", 8): "pcm_u8", ("pcm", 16): "pcm_s16le", ("pcm", 24): "pcm_s24le", ("pcm", 32): "pcm_s32le",
+                 ("float", 32): "pcm_f32le", ("float", 64): "pcm_f64le"}
+
+SampleIssue = namedtuple("SampleIssue", ["track", "path", "problem", "sample_rate", "bits", "channels"])
+
+class HeaderCache:
+    """SQLite cache of parsed WAV/AIFF headers (or the reason a file couldn't be read), keyed by path, size and mtime."""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS headers (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "version INTEGER NOT NULL, info TEXT, error TEXT)"
+        )
+
+    def get(self, path, stat):
+        """(AudioInfo or None, error or None), or None when the file changed or was never read."""
+        row = self.conn.execute("SELECT size, mtime_ns, version, info, error FROM headers WHERE path = ?", (path,)).fetchone()
+        if row is None or (row[0], row[1], row[2]) != (stat.st_size, stat.st_mtime_ns, HEADER_VERSION):
+            return None
+        return (AudioInfo(*json.loads(row[3])) if row[3] is not None else None), row[4]
+
+    def put_many(self, rows):
+        """rows are (path, stat, AudioInfo or None, error or None)."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO headers (path, size, mtime_ns, version, info, error) VALUES (?, ?, ?, ?, ?, ?)",
+            [(path, stat.st_size, stat.st_mtime_ns, HEADER_VERSION, json.dumps(list(info)) if info is not None else None, error)
+             for path, stat, info, error in rows])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def _read_header(path):
+    try:
+        return read_audio_info(path), None
+    except AudioFormatError as e:
+        return None, str(e)
+    except OSError as e:
+        return None, f"{path}: {e.strerror}"
+
+def read_headers(paths, cache, jobs=None):
+    """Return ({path: AudioInfo or None}, {path: error}, files read), reading only changed files' headers."""
+    infos, errors, to_read = {}, {}, []
+    for path in paths:
+        stat = os.stat(path)
+        cached = cache.get(path, stat)
+        if cached is None:
+            to_read.append((path, stat))
+            continue
+        infos[path], error = cached
+        if error is not None:
+            errors[path] = error
+
+    if to_read:
+        # Only a few hundred bytes per file, so the time is all in opening files: many threads help
+        with ThreadPoolExecutor(max_workers=jobs or min(16, (os.cpu_count() or 2) * 4)) as pool:
+            read = list(pool.map(lambda item: _read_header(item[0]), to_read))
+        cache.put_many([(path, stat, info, error) for (path, stat), (info, error) in zip(to_read, read)])
+        for (path, _), (info, error) in zip(to_read, read):
+            infos[path] = info
+            if error is not None:
+                errors[path] = error
+    return infos, errors, len(to_read)
+
+def audit_live_set(live_set, project_dir, cache, sample_rate=DEFAULT_SAMPLE_RATE, jobs=None):
+    """Check every sample the set's tracks use. Returns ([SampleIssue], samples checked)."""
+    uses = []
+    for track in live_set.tracks:
+        for sample in track.samples:
+            candidates = sample.candidates(project_dir)
+            if candidates:
+                uses.append((track.name or "Unnamed Track", sample.resolve(project_dir), candidates[0]))
+    infos, errors, _ = read_headers(sorted({path for _, path, _ in uses if path}), cache, jobs)
+
+    issues = []
+    for track_name, path, reference in uses:
+        if path is None:
+            issues.append(SampleIssue(track_name, reference, "missing", None, None, None))
+            continue
+        info = infos[path]
+        if info is None:
+            # mp3/flac/ogg are decoded when the set loads; not a resampling problem but worth seeing
+            issues.append(SampleIssue(track_name, path, f"not WAV/AIFF ({errors[path]})", None, None, None))
+        elif info.sample_rate != sample_rate:
+            issues.append(SampleIssue(track_name, path, f"{info.sample_rate} Hz, rig runs at {sample_rate} Hz",
+                                      info.sample_rate, info.bits, info.channels))
+    return issues, len({path for _, path, _ in uses if path})
+
+def audit_set(input_file, cache, sample_rate=DEFAULT_SAMPLE_RATE, jobs=None):
+    project_dir = os.path.dirname(os.path.abspath(input_file))
+    return audit_live_set(LiveSet.load(input_file), project_dir, cache, sample_rate, jobs)
+
+def format_issues(issues):
+    """One block per track, as printed by the CLI."""
+    by_track = {}
+    for issue in issues:
+        by_track.setdefault(issue.track, []).append(issue)
+    lines = []
+    for track_name, track_issues in by_track.items():
+        lines.append(f"  {track_name}:")
+        lines.extend(f"    {os.path.basename(issue.path)}: {issue.problem}" for issue in track_issues)
+    return "\n".join(lines)
+
+# --- Offline conversion ---
+
+def converted_path(project_dir, source_path, sample_rate):
+    # The source path's hash keeps same-named files from different folders apart
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    tag = hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(project_dir, CONVERTED_DIR, f"{stem}-{tag}_{sample_rate}.wav")
+
+def convert_sample(source_path, info, output_path, sample_rate, ffmpeg="ffmpeg"):
+    """Write a resampled WAV copy with ffmpeg, keeping the bit depth. Skips copies newer than their source."""
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(source_path):
+        return output_path
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_file = output_path + ".part"
+    codec = FFMPEG_CODECS.get((info.encoding, info.bits), "pcm_s24le")
+    try:
+        subprocess.run([ffmpeg, "-nostdin", "-v", "error", "-y", "-i", source_path, "-ar", str(sample_rate),
+                        "-c:a", codec, "-f", "wav", temp_file], check=True, capture_output=True)
+        os.replace(temp_file, output_path)
+    except BaseException:
+        # A failed or interrupted ffmpeg can leave a half-written copy behind
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+    return output_path
+
+def _repoint_sample_ref(sample_ref, project_dir, new_path, sample_rate, old_rate):
+    file_ref = sample_ref.find("FileRef")
+    relative_path = os.path.relpath(new_path, project_dir).replace(os.sep, "/")
+    for tag, value in (("RelativePathType", "3"), ("RelativePath", relative_path), ("Path", new_path),
+                       ("OriginalFileSize", str(os.path.getsize(new_path)))):
+        elem = file_ref.find(tag)
+        if elem is not None:
+            elem.set("Value", value)
+    # Live keeps the sample's length in frames at its own rate
+    duration = sample_ref.find("DefaultDuration")
+    if duration is not None:
+        duration.set("Value", str(round(int(duration.get("Value", "0")) * sample_rate / old_rate)))
+    rate = sample_ref.find("DefaultSampleRate")
+    if rate is not None:
+        rate.set("Value", str(sample_rate))
+
+def convert_set(input_file, output_file, issues, sample_rate=DEFAULT_SAMPLE_RATE, jobs=None, ffmpeg="ffmpeg", log=print):
+    """Resample the samples with a rate mismatch and write a copy of the set that uses them.
+
+    Returns {source path: converted copy} for the samples converted.
+    """
+    project_dir = os.path.dirname(os.path.abspath(input_file))
+    mismatched = {issue.path for issue in issues if issue.sample_rate is not None}
+    if not mismatched:
+        return {}
+    infos = {path: read_audio_info(path) for path in mismatched}
+    targets = {path: converted_path(project_dir, path, sample_rate) for path in infos}
+
+    # ffmpeg does the work in its own processes; threads just keep a few of them running
+    with ThreadPoolExecutor(max_workers=jobs or max(1, (os.cpu_count() or 2) // 2)) as pool:
+        futures = {path: pool.submit(convert_sample, path, infos[path], targets[path], sample_rate, ffmpeg) for path in infos}
+        converted = {}
+        for path, future in futures.items():
+            try:
+                converted[path] = future.result()
+                log(f"Converted {os.path.basename(path)} → {os.path.relpath(converted[path], project_dir)}")
+            except subprocess.CalledProcessError as e:
+                log(f"Error: Failed to convert {path}: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+    tree = engine.load_als(input_file)
+    for sample_ref in tree.getroot().iter("SampleRef"):
+        file_ref = sample_ref.find("FileRef")
+        path = engine.resolve_sample_path(file_ref, project_dir) if file_ref is not None else None
+        if path in converted:
+            _repoint_sample_ref(sample_ref, project_dir, converted[path], sample_rate, infos[path].sample_rate)
+    engine.save_als(tree, output_file)
+    return converted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find samples that Live would resample in real time on the playback rigs.")
+    parser.add_argument("sets", nargs="+", help=".als files to audit")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, help="The rigs' audio interface rate")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_NAME, help="Header cache database")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel header reads / conversions")
+    parser.add_argument("--convert", action="store_true",
+                        help=f"Write resampled copies to <project>/{CONVERTED_DIR} and save <name>_resampled.als using them")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable for --convert")
+    args = parser.parse_args(argv)
+
+    if args.convert and shutil.which(args.ffmpeg) is None:
+        print(f"Error: --convert needs ffmpeg ({args.ffmpeg} not found)")
+        return 2
+
+    cache = HeaderCache(args.cache)
+    problems = 0
+    try:
+        for input_file in args.sets:
+            try:
+                issues, checked = audit_set(input_file, cache, args.sample_rate, args.jobs)
+            except (OSError, ValueError) as e:
+                print(f"Error: Failed to audit {input_file}: {str(e)}")
+                problems += 1
+                continue
+            print(f"{input_file}: {checked} samples, {len(issues)} issue(s)")
+            if issues:
+                print(format_issues(issues))
+            if args.convert and any(issue.sample_rate is not None for issue in issues):
+                output_file = f"{os.path.splitext(input_file)[0]}_resampled.als"
+                converted = convert_set(input_file, output_file, issues, args.sample_rate, args.jobs, args.ffmpeg)
+                print(f"Saved {output_file} using {len(converted)} converted sample(s).")
+                issues = [issue for issue in issues if issue.path not in converted]
+            problems += sum(1 for issue in issues if issue.sample_rate is not None)
+    finally:
+        cache.close()
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import io
+import os
+import sys
+import json
+import time
+import zipfile
+import sqlite3
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import Ableton_Router_Engine as engine
+
+# Digest cache shared between runs (path + size + mtime → sha256), like the library catalog
+DEFAULT_CACHE_NAME = "sample_digests.sqlite"
+
+# Bundle layout: routed sets at the top, samples stored once under their content hash
+SAMPLE_DIR = "Samples/Bundled"
+
+class DigestCache:
+    """SQLite cache of sample digests, keyed by absolute path, size and mtime."""
+
+    def __init__(self, db_path, check_same_thread=True):
+        self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL)"
+        )
+
+    def get(self, path, stat):
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM digests WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        return None
+
+    def put_many(self, rows):
+        self.conn.executemany("INSERT OR REPLACE INTO digests (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def hash_samples(paths, cache, jobs=None):
+    """Return {path: sha256}, hashing only files whose size/mtime changed since they were cached."""
+    digests = {}
+    to_hash = []
+    for path in paths:
+        stat = os.stat(path)
+        cached = cache.get(path, stat)
+        if cached is not None:
+            digests[path] = cached
+        else:
+            to_hash.append((path, stat))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=jobs or min(8, (os.cpu_count() or 2) * 2)) as pool:
+            hashed = list(pool.map(lambda item: engine.file_sha256(item[0]), to_hash))
+        cache.put_many([(path, stat.st_size, stat.st_mtime_ns, digest) for (path, stat), digest in zip(to_hash, hashed)])
+        digests.update((path, digest) for (path, _), digest in zip(to_hash, hashed))
+    return digests, len(to_hash)
+
+def bundle_path(digest, source_path):
+    extension = os.path.splitext(source_path)[1].lower()
+    return f"{SAMPLE_DIR}/{digest[:2]}/{digest}{extension}"
+
+def collect_set(input_file, campus=None, slim=False):
+    """Route one set for a campus and find its samples. Returns (tree, [(FileRef, resolved path or None)])."""
+    tree = engine.load_als(input_file)
+    results = engine.route_tree(tree.getroot(), campus=campus)
+    if slim:
+        engine.slim_tree(tree.getroot(), results)
+    project_dir = os.path.dirname(os.path.abspath(input_file))
+    refs = [(file_ref, engine.resolve_sample_path(file_ref, project_dir)) for _, file_ref in engine.sample_refs(tree.getroot())]
+    return tree, refs
+
+def rewrite_file_ref(file_ref, relative_path):
+    """Point a FileRef at its bundled copy, relative to the set (Live's "relative to project")."""
+    for tag, value in (("RelativePathType", "3"), ("RelativePath", relative_path), ("Path", relative_path)):
+        elem = file_ref.find(tag)
+        if elem is not None:
+            elem.set("Value", value)
+
+def bundle_set_names(input_files, campus=None):
+    """Archive name for each set; sets from different folders that share a file name get their folder prefixed."""
+    names = [engine.campus_output_name(input_file, campus) for input_file in input_files]
+    counts = {}
+    for name in names:
+        counts[name.lower()] = counts.get(name.lower(), 0) + 1
+    unique = []
+    taken = set()
+    for input_file, name in zip(input_files, names):
+        if counts[name.lower()] > 1:
+            folder = os.path.basename(os.path.dirname(os.path.abspath(input_file)))
+            name = f"{folder} - {name}" if folder else name
+        candidate, number = name, 2
+        while candidate.lower() in taken:
+            stem, extension = os.path.splitext(name)
+            candidate = f"{stem} ({number}){extension}"
+            number += 1
+        taken.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+def build_bundle(input_files, output_file, campus=None, slim=False, cache_path=DEFAULT_CACHE_NAME, jobs=None):
+    """Route every set for a campus and write one archive with deduplicated samples and a manifest."""
+    started = time.time()
+    input_files = list(dict.fromkeys(os.path.abspath(input_file) for input_file in input_files))
+    output_names = bundle_set_names(input_files, campus)
+
+    # Only one parsed set is held at a time: hash each set's samples now, then parse it again to write it
+    digests = {}
+    hashed_count = 0
+    cache = DigestCache(cache_path)
+    try:
+        for input_file in input_files:
+            tree, refs = collect_set(input_file, campus, slim)
+            paths = sorted({os.path.abspath(path) for _, path in refs if path is not None} - digests.keys())
+            del tree, refs
+            set_digests, set_hashed = hash_samples(paths, cache, jobs)
+            digests.update(set_digests)
+            hashed_count += set_hashed
+    finally:
+        cache.close()
+
+    manifest = {
+        "campus": campus,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sets": [],
+        "samples": {},
+    }
+    referenced_bytes = 0
+    temp_file = output_file + ".part"
+    with zipfile.ZipFile(temp_file, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for input_file, output_name in zip(input_files, output_names):
+            tree, refs = collect_set(input_file, campus, slim)
+            missing = []
+            for file_ref, path in refs:
+                if path is None:
+                    candidates = engine.sample_path_candidates(file_ref, os.path.dirname(os.path.abspath(input_file)))
+                    missing.append(candidates[0] if candidates else "")
+                    continue
+                path = os.path.abspath(path)
+                digest = digests[path]
+                arcname = bundle_path(digest, path)
+                size = os.path.getsize(path)
+                referenced_bytes += size
+                sample = manifest["samples"].get(digest)
+                if sample is None:
+                    # Audio barely compresses, so samples are stored as-is
+                    archive.write(path, arcname)
+                    sample = manifest["samples"][digest] = {"path": arcname, "size": size, "sources": [], "used_by": []}
+                if path not in sample["sources"]:
+                    sample["sources"].append(path)
+                if output_name not in sample["used_by"]:
+                    sample["used_by"].append(output_name)
+                rewrite_file_ref(file_ref, arcname)
+
+            set_buffer = io.BytesIO()
+            engine.save_als(tree, set_buffer)
+            archive.writestr(output_name, set_buffer.getvalue())
+            manifest["sets"].append({
+                "source": input_file,
+                "path": output_name,
+                "samples": len(refs) - len(missing),
+                "missing": sorted(set(missing)),
+            })
+
+        unique_bytes = sum(sample["size"] for sample in manifest["samples"].values())
+        manifest["totals"] = {
+            "sets": len(input_files),
+            "sample_references": sum(entry["samples"] for entry in manifest["sets"]),
+            "unique_samples": len(manifest["samples"]),
+            "referenced_bytes": referenced_bytes,
+            "unique_bytes": unique_bytes,
+            "hashed_files": hashed_count,
+            "cached_digests": len(digests) - hashed_count,
+            "seconds": round(time.time() - started, 2),
+        }
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(temp_file, output_file)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Route sets for a campus and bundle them with deduplicated samples.")
+    parser.add_argument("sets", nargs="+", help=".als files (or folders of them) to bundle")
+    parser.add_argument("--output", required=True, help="Archive to write (.zip)")
+    parser.add_argument("--campus", help="Campus to route for")
+    parser.add_argument("--slim", action="store_true", help="Trim empty scenes, muted empty tracks and preview state")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_NAME, help="Sample digest cache database")
+    parser.add_argument("--jobs", type=int, default=None, help="Hashing threads")
+    args = parser.parse_args(argv)
+
+    if args.campus and args.campus not in engine.CAMPUSES:
+        print(f"Error: Unknown campus '{args.campus}'. Choose one of: {', '.join(engine.CAMPUSES)}")
+        return 1
+
+    input_files = []
+    for path in args.sets:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = [d for d in dirnames if d != "Backup"]
+                input_files.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                                   if f.lower().endswith(".als") and "_routed" not in f)
+        else:
+            input_files.append(path)
+    if not input_files:
+        print("Error: No .als files to bundle.")
+        return 1
+
+    manifest = build_bundle(input_files, args.output, args.campus, args.slim, args.cache, args.jobs)
+    totals = manifest["totals"]
+    saved = totals["referenced_bytes"] - totals["unique_bytes"]
+    print(f"Bundled {totals['sets']} sets → {args.output}: {totals['unique_samples']} unique samples for "
+          f"{totals['sample_references']} references ({totals['unique_bytes']:,} bytes, {saved:,} bytes saved by dedupe); "
+          f"hashed {totals['hashed_files']}, {totals['cached_digests']} from cache, {totals['seconds']}s")
+    for entry in manifest["sets"]:
+        for path in entry["missing"]:
+            print(f"Warning: {os.path.basename(entry['source'])}: sample not found: {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
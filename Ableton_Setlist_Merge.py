@@ -0,0 +1,438 @@
+import os
+import sys
+import copy
+import math
+import time
+import argparse
+import xml.etree.ElementTree as ET
+
+import Ableton_Router_Engine as engine
+
+# Songs are laid out back to back in the arrangement, each starting on a bar line after a gap
+BEATS_PER_BAR = 4
+DEFAULT_GAP_BARS = 4
+
+# Time of the "value before the first breakpoint" event Live keeps at the start of every envelope
+AUTOMATION_DEFAULT_TIME = -63072000
+ARRANGEMENT_EVENT_PARENTS = ("ArrangerAutomation", "ClipAutomation")
+CLIP_EVENT_PATHS = ("DeviceChain/MainSequencer/Sample/ArrangerAutomation/Events",
+                    "DeviceChain/MainSequencer/ClipTimeable/ArrangerAutomation/Events")
+SLOT_LISTS = ("ClipSlotList", "Slots")
+
+def _is_pointee(tag):
+    # Elements numbered from the set's NextPointeeId (automation/modulation targets, MIDI controller targets)
+    return tag.endswith("Target") or tag.startswith("ControllerTargets.") or tag == "Pointee"
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _track_id(track):
+    return int(track.get("Id"))
+
+def _group_id(track):
+    elem = track.find("TrackGroupId")
+    return int(elem.get("Value")) if elem is not None else -1
+
+def _main_track(live_set):
+    # Live 12 calls it MainTrack, Live 11 and earlier MasterTrack
+    main_track = live_set.find("MainTrack")
+    return main_track if main_track is not None else live_set.find("MasterTrack")
+
+def _mixer_targets(track):
+    """{mixer parameter tag: automation target id} for a track's (or the main track's) mixer."""
+    mixer = track.find("DeviceChain/Mixer")
+    targets = {}
+    for child in mixer if mixer is not None else []:
+        target = child.find("AutomationTarget")
+        if target is not None:
+            targets[child.tag] = target.get("Id")
+    return targets
+
+def _track_targets(track):
+    """{tag: target id} for the pointees every track of a type has: its mixer parameters and
+    (MIDI tracks) the MIDI controller targets clip envelopes can automate."""
+    targets = _mixer_targets(track)
+    controllers = track.find("DeviceChain/MainSequencer/MidiControllers")
+    for child in controllers if controllers is not None else []:
+        if child.tag.startswith("ControllerTargets."):
+            targets[child.tag] = child.get("Id")
+    return targets
+
+def _envelopes(track):
+    envelopes = track.find("AutomationEnvelopes/Envelopes")
+    if envelopes is None:
+        envelopes = ET.SubElement(ET.SubElement(track, "AutomationEnvelopes"), "Envelopes")
+    return envelopes
+
+def _envelope_events(envelope):
+    return envelope.find("Automation/Events")
+
+def _manual_value(track, target_id, default):
+    # Current (unautomated) value of the mixer parameter owning target_id
+    mixer = track.find("DeviceChain/Mixer")
+    for child in mixer if mixer is not None else []:
+        target = child.find("AutomationTarget")
+        if target is not None and target.get("Id") == target_id and child.find("Manual") is not None:
+            return child.find("Manual").get("Value")
+    return default
+
+def _arrangement_clips(track):
+    for parent in track.iter():
+        if parent.tag in ARRANGEMENT_EVENT_PARENTS and parent.find("Events") is not None:
+            yield from parent.find("Events")
+
+def _clip_end(clip):
+    end = clip.find("CurrentEnd")
+    return float(end.get("Value")) if end is not None else float(clip.get("Time", "0"))
+
+def _shift_clip(clip, offset):
+    clip.set("Time", _number(float(clip.get("Time", "0")) + offset))
+    for tag in ("CurrentStart", "CurrentEnd"):
+        elem = clip.find(tag)
+        if elem is not None:
+            elem.set("Value", _number(float(elem.get("Value")) + offset))
+
+class SetlistMerger:
+    """Merge song sets one at a time into the first one.
+
+    Each song is placed after the previous one in the arrangement, with a locator at its start.
+    Pointee ids are offset against the running NextPointeeId and track ids against the highest
+    track id so far, so every song is remapped in one pass over its elements. A song track with
+    the same type, name and group as an existing track is unified into it: its arrangement clips
+    and mixer automation move onto the existing track instead of adding another track (clip
+    envelopes on the song's own devices are dropped, as its device automation is). Session
+    clips of later songs are dropped (the setlist plays from the arrangement), and return tracks
+    come from the first set.
+    """
+
+    def __init__(self, root, name, gap_bars=DEFAULT_GAP_BARS, unify=True, log=None):
+        self.root = root
+        self.live_set = root.find("LiveSet")
+        self.gap = gap_bars * BEATS_PER_BAR
+        self.unify = unify
+        self.log = log
+        self.next_pointee = int(self.live_set.find("NextPointeeId").get("Value"))
+        self.tracks_elem = self.live_set.find("Tracks")
+        self.other_tracks = [t for t in self.tracks_elem if t.tag not in engine.TRACK_TYPES]
+        self.next_track_id = max((_track_id(t) for t in self.tracks_elem), default=0) + 1
+        self.scene_count = len(self.live_set.find("Scenes"))
+        self.main_track = _main_track(self.live_set)
+        self.main_targets = _mixer_targets(self.main_track)
+        self.locators = self.live_set.find("Locators/Locators")
+        self.next_locator_id = max((int(l.get("Id")) for l in self.locators), default=-1) + 1
+        self.songs = []
+
+        # Track tree of the merged set (flattened group-first when the set is written back)
+        self.children = {None: []}
+        self.by_key = {}
+        base_ids = {_track_id(t) for t in self.tracks_elem if t.tag in engine.TRACK_TYPES}
+        for track in self.tracks_elem:
+            if track.tag not in engine.TRACK_TYPES:
+                continue
+            parent = _group_id(track)
+            parent = parent if parent in base_ids else None
+            self._add_track(track, parent)
+
+        ends = [_clip_end(clip) for track in self.children_flat() for clip in _arrangement_clips(track)]
+        end = max(ends, default=0.0)
+        self._add_song_locator(name, 0.0)
+        self.songs.append({"name": name, "start": 0.0, "end": end, "unified": 0, "added": len(base_ids),
+                           "clips": len(ends), "dropped_session_clips": 0, "dropped_envelopes": 0})
+        self.offset = self._next_start(end)
+
+    # --- Track tree ---
+
+    def _key(self, track, parent):
+        return (track.tag, engine.track_name_of(track).strip().casefold(), parent)
+
+    def _add_track(self, track, parent):
+        self.children.setdefault(parent, []).append(track)
+        if track.tag == "GroupTrack":
+            self.children.setdefault(_track_id(track), [])
+        self.by_key.setdefault(self._key(track, parent), []).append(track)
+
+    def children_flat(self, parent=None):
+        for track in self.children.get(parent, []):
+            yield track
+            if track.tag == "GroupTrack":
+                yield from self.children_flat(_track_id(track))
+
+    def _next_start(self, end):
+        return math.ceil(end / BEATS_PER_BAR) * BEATS_PER_BAR + self.gap
+
+    # --- Locators ---
+
+    def _add_song_locator(self, name, start):
+        if any(float(l.find("Time").get("Value")) == start for l in self.locators):
+            return
+        template = next(iter(self.locators), None)
+        if template is not None:
+            locator = copy.deepcopy(template)
+        else:
+            locator = ET.Element("Locator")
+            for tag, value in (("LomId", "0"), ("Time", "0"), ("Name", ""), ("Annotation", ""), ("IsSongStart", "false")):
+                ET.SubElement(locator, tag, Value=value)
+        locator.set("Id", str(self.next_locator_id))
+        self.next_locator_id += 1
+        locator.find("Time").set("Value", _number(start))
+        locator.find("Name").set("Value", name)
+        self.locators.append(locator)
+
+    # --- Automation ---
+
+    def _merge_envelope(self, track, target_id, source, default_value, start):
+        """Append a song's automation for target_id onto the merged track from `start` on.
+
+        source is the song's envelope (or None for a constant default_value). The previous value is
+        held up to the song start and then steps to the song's value, like a hand-made tempo map.
+        """
+        song_events = list(_envelope_events(source)) if source is not None else []
+        event_tag = song_events[0].tag if song_events else "FloatEvent"
+        if song_events and float(song_events[0].get("Time")) == AUTOMATION_DEFAULT_TIME:
+            default_value = song_events.pop(0).get("Value")
+
+        envelopes = _envelopes(track)
+        envelope = next((e for e in envelopes if e.find("EnvelopeTarget/PointeeId").get("Value") == target_id), None)
+        if envelope is None:
+            previous = _manual_value(track, target_id, default_value)
+            if not song_events and previous == default_value:
+                return
+            envelope = ET.SubElement(envelopes, "AutomationEnvelope", Id=str(len(envelopes)))
+            ET.SubElement(ET.SubElement(envelope, "EnvelopeTarget"), "PointeeId", Value=target_id)
+            automation = ET.SubElement(envelope, "Automation")
+            ET.SubElement(automation, "Events")
+            view_state = ET.SubElement(automation, "AutomationTransformViewState")
+            ET.SubElement(view_state, "IsTransformPending", Value="false")
+            ET.SubElement(view_state, "TimeAndValueTransforms")
+            ET.SubElement(_envelope_events(envelope), event_tag, Id="0", Time=str(AUTOMATION_DEFAULT_TIME), Value=previous)
+
+        events = _envelope_events(envelope)
+        previous = events[-1].get("Value")
+        if not song_events and previous == default_value:
+            return
+        next_id = max(int(e.get("Id")) for e in events) + 1
+        for value in (previous, default_value):
+            ET.SubElement(events, event_tag, Id=str(next_id), Time=_number(start), Value=value)
+            next_id += 1
+        for event in song_events:
+            event.set("Id", str(next_id))
+            event.set("Time", _number(float(event.get("Time")) + start))
+            events.append(event)
+            next_id += 1
+
+    def _merge_mixer_automation(self, source_track, target_track, target_ids, start):
+        # Mixer parameters exist on every track of a type, so their automation can follow the track;
+        # device automation only makes sense on the song's own devices and is dropped.
+        source_targets = {target_id: tag for tag, target_id in _mixer_targets(source_track).items()}
+        dropped = 0
+        envelopes = source_track.find("AutomationEnvelopes/Envelopes")
+        for envelope in list(envelopes) if envelopes is not None else []:
+            tag = source_targets.get(envelope.find("EnvelopeTarget/PointeeId").get("Value"))
+            if tag in target_ids:
+                self._merge_envelope(target_track, target_ids[tag], envelope, None, start)
+            else:
+                dropped += 1
+        return dropped
+
+    def _retarget_clip_envelopes(self, clip, source_targets, target_ids):
+        """Point a moved clip's envelopes at the merged track's mixer/controller targets.
+
+        Envelopes on the song's own devices would point at devices that aren't in the merged
+        set; those are dropped. Returns how many were dropped.
+        """
+        dropped = 0
+        for envelopes in clip.iterfind("Envelopes/Envelopes"):
+            for envelope in list(envelopes):
+                pointee = envelope.find("EnvelopeTarget/PointeeId")
+                tag = source_targets.get(pointee.get("Value")) if pointee is not None else None
+                if tag in target_ids:
+                    pointee.set("Value", target_ids[tag])
+                else:
+                    envelopes.remove(envelope)
+                    dropped += 1
+        return dropped
+
+    # --- Songs ---
+
+    def add_song(self, root, name):
+        """Append one song's set (already parsed; its elements are moved into the merged set)."""
+        start = self.offset
+        live_set = root.find("LiveSet")
+        pointee_offset = self.next_pointee
+        self.next_pointee += int(live_set.find("NextPointeeId").get("Value"))
+        song_tracks = [t for t in live_set.find("Tracks") if t.tag in engine.TRACK_TYPES]
+        song = {"name": name, "start": start, "end": start, "unified": 0, "added": 0, "clips": 0,
+                "dropped_session_clips": 0, "dropped_envelopes": 0}
+
+        # Decide where every song track goes before ids change (groups come before their tracks)
+        track_map = {}
+        unified = []
+        added = []
+        claimed = set()
+        for track in song_tracks:
+            parent = track_map.get(_group_id(track))
+            existing = None
+            if self.unify:
+                existing = next((t for t in self.by_key.get(self._key(track, parent), []) if id(t) not in claimed), None)
+            if existing is not None:
+                claimed.add(id(existing))
+                track_map[_track_id(track)] = _track_id(existing)
+                unified.append((track, existing))
+            else:
+                track_map[_track_id(track)] = self.next_track_id
+                self.next_track_id += 1
+                added.append((track, parent))
+
+        # One pass over the song: pointee ids, pointee references and track references
+        for elem in root.iter():
+            tag = elem.tag
+            if "Id" in elem.attrib and _is_pointee(tag):
+                elem.set("Id", str(int(elem.get("Id")) + pointee_offset))
+            elif tag == "PointeeId":
+                elem.set("Value", str(int(elem.get("Value")) + pointee_offset))
+            elif tag == "TrackGroupId":
+                elem.set("Value", str(track_map.get(int(elem.get("Value")), -1)))
+            elif tag == "LinkedTrackGroupId":
+                elem.set("Value", "-1")
+            else:
+                value = elem.get("Value")
+                if value and "Track." in value:
+                    elem.set("Value", engine._TRACK_REFERENCE.sub(
+                        lambda m: f"Track.{track_map.get(int(m.group(1)), m.group(1))}", value))
+
+        # Arrangement clips and track automation move to song time
+        end = start
+        for track in song_tracks:
+            for clip in _arrangement_clips(track):
+                _shift_clip(clip, start)
+                end = max(end, _clip_end(clip))
+                song["clips"] += 1
+
+        for track, parent in added:
+            track.set("Id", str(track_map[_track_id(track)]))
+            envelopes = track.find("AutomationEnvelopes/Envelopes")
+            for envelope in envelopes if envelopes is not None else []:
+                for event in _envelope_events(envelope):
+                    if float(event.get("Time")) != AUTOMATION_DEFAULT_TIME:
+                        event.set("Time", _number(float(event.get("Time")) + start))
+            song["dropped_session_clips"] += self._fit_slots(track)
+            self._add_track(track, parent)
+            song["added"] += 1
+
+        for track, existing in unified:
+            source_targets = {target_id: tag for tag, target_id in _track_targets(track).items()}
+            target_ids = _track_targets(existing)
+            for path in CLIP_EVENT_PATHS:
+                source, target = track.find(path), existing.find(path)
+                if source is None or target is None:
+                    continue
+                next_id = max((int(c.get("Id")) for c in target), default=-1) + 1
+                for clip in list(source):
+                    song["dropped_envelopes"] += self._retarget_clip_envelopes(clip, source_targets, target_ids)
+                    clip.set("Id", str(next_id))
+                    target.append(clip)
+                    next_id += 1
+            song["dropped_session_clips"] += sum(1 for slot in track.iter("ClipSlot") if slot.find("ClipSlot/Value/*") is not None)
+            song["dropped_envelopes"] += self._merge_mixer_automation(track, existing, _mixer_targets(existing), start)
+            song["unified"] += 1
+
+        # Tempo (and any other main-track automation) continues from the song start
+        song_main = _main_track(live_set)
+        song_main_targets = _mixer_targets(song_main)
+        envelopes = song_main.find("AutomationEnvelopes/Envelopes")
+        automated = set()
+        for envelope in list(envelopes) if envelopes is not None else []:
+            target_id = envelope.find("EnvelopeTarget/PointeeId").get("Value")
+            tag = next((t for t, i in song_main_targets.items() if i == target_id), None)
+            if tag in self.main_targets:
+                self._merge_envelope(self.main_track, self.main_targets[tag], envelope, None, start)
+                automated.add(tag)
+        if "Tempo" not in automated and "Tempo" in self.main_targets:
+            self._merge_envelope(self.main_track, self.main_targets["Tempo"], None,
+                                 song_main.find("DeviceChain/Mixer/Tempo/Manual").get("Value"), start)
+
+        for locator in live_set.find("Locators/Locators"):
+            locator.set("Id", str(self.next_locator_id))
+            self.next_locator_id += 1
+            locator.find("Time").set("Value", _number(float(locator.find("Time").get("Value")) + start))
+            self.locators.append(locator)
+        self._add_song_locator(name, start)
+
+        song["end"] = end
+        self.songs.append(song)
+        self.offset = self._next_start(end)
+        engine._log(self.log, f"{name}: bar {int(start // BEATS_PER_BAR) + 1}, {song['clips']} clips, "
+                              f"{song['unified']} tracks unified, {song['added']} added")
+        return song
+
+    def _fit_slots(self, track):
+        """Empty a new track's session slots and match them to the merged set's scenes."""
+        dropped = 0
+        for slots in [elem for elem in track.iter() if elem.tag in SLOT_LISTS]:
+            for slot in slots:
+                value = slot.find("ClipSlot/Value")
+                if value is not None and len(value):
+                    dropped += 1
+                    for clip in list(value):
+                        value.remove(clip)
+            while len(slots) > self.scene_count:
+                slots.remove(slots[-1])
+            while 0 < len(slots) < self.scene_count:
+                slot = copy.deepcopy(slots[-1])
+                slot.set("Id", str(len(slots)))
+                slots.append(slot)
+        return dropped
+
+    def finish(self):
+        """Write the merged track list and id counter back into the first set and return its root."""
+        for track in list(self.tracks_elem):
+            self.tracks_elem.remove(track)
+        for track in self.children_flat():
+            self.tracks_elem.append(track)
+        for track in self.other_tracks:
+            self.tracks_elem.append(track)
+        self.live_set.find("NextPointeeId").set("Value", str(self.next_pointee))
+        return self.root
+
+def song_name(input_file):
+    return os.path.splitext(os.path.basename(input_file))[0]
+
+def merge_setlist(input_files, output_file, campus=None, gap_bars=DEFAULT_GAP_BARS, unify=True, slim=False, log=None):
+    """Merge songs into one routed set. Each input is parsed, merged and released before the next."""
+    tree = engine.load_als(input_files[0])
+    merger = SetlistMerger(tree.getroot(), song_name(input_files[0]), gap_bars, unify, log)
+    for input_file in input_files[1:]:
+        merger.add_song(engine.load_als(input_file).getroot(), song_name(input_file))
+    root = merger.finish()
+
+    results = engine.route_tree(root, log, campus)
+    if slim:
+        engine._log(log, engine.format_slim_report(engine.slim_tree(root, results, log)))
+    engine.save_als(tree, output_file)
+    return merger.songs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge song sets into one routed setlist, one song after another.")
+    parser.add_argument("sets", nargs="+", help="Song .als files, in setlist order")
+    parser.add_argument("--output", required=True, help="Setlist .als to write")
+    parser.add_argument("--campus", help="Campus to route for")
+    parser.add_argument("--gap-bars", type=int, default=DEFAULT_GAP_BARS, help="Empty bars between songs")
+    parser.add_argument("--no-unify", action="store_true", help="Keep every song's tracks separate")
+    parser.add_argument("--slim", action="store_true", help="Trim empty scenes, muted empty tracks and preview state")
+    args = parser.parse_args(argv)
+
+    if args.campus and args.campus not in engine.CAMPUSES:
+        print(f"Error: Unknown campus '{args.campus}'. Choose one of: {', '.join(engine.CAMPUSES)}")
+        return 1
+
+    started = time.time()
+    songs = merge_setlist(args.sets, args.output, args.campus, args.gap_bars, not args.no_unify, args.slim)
+    for song in songs[1:]:
+        if song["dropped_session_clips"] or song["dropped_envelopes"]:
+            print(f"Note: {song['name']}: dropped {song['dropped_session_clips']} session clips and "
+                  f"{song['dropped_envelopes']} device automation/clip envelopes on merged tracks")
+    print(f"Merged {len(songs)} songs into {args.output} ({time.time() - started:.1f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
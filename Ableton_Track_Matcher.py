@@ -0,0 +1,175 @@
+import re
+from collections import Counter, namedtuple
+
+# Abbreviations seen in multitrack names, expanded before comparing (after punctuation is stripped)
+TOKEN_ALIASES = {
+    "GTR": "GUITAR",
+    "GTRS": "GUITARS",
+    "GUIT": "GUITAR",
+    "ELEC": "E",
+    "ELECTRIC": "E",
+    "ACOUS": "ACOUSTIC",
+    "ACC": "ACOUSTIC",
+    "AC": "ACOUSTIC",
+    "VOX": "VOCALS",
+    "VOC": "VOCALS",
+    "VOCS": "VOCALS",
+    "BV": "BGV",
+    "BVS": "BGVS",
+    "BKG": "BGV",
+    "TAMB": "TAMBO",
+    "TAMBOURINE": "TAMBORINE",
+    "PERCUSSION": "PERC",
+    "KEYBOARD": "KEYS",
+    "KEYBOARDS": "KEYS",
+    "KBD": "KEYS",
+    "SYN": "SYNTH",
+    "SFX": "FX",
+    "CLK": "CLICK",
+    "TRK": "TRACK",
+}
+
+# Words that say nothing about the instrument: a fuzzy match can't rest on them, and a name may
+# add them to a rule key ("KEYS L", "DRUMS STEREO"). Numbers are treated the same way.
+STOP_TOKENS = {"TRACK", "L", "R", "LEFT", "RIGHT", "ST", "STEREO", "MONO", "MIX", "STEM", "MAIN", "THE", "AND"}
+# Trigram similarity at which a name token counts as a misspelling of a key token
+TYPO_SIMILARITY = 0.5
+
+DEFAULT_THRESHOLD = 0.6
+
+# tier is one of "exact", "normalized", "fuzzy"
+TrackMatch = namedtuple("TrackMatch", ["key", "tier", "score"])
+
+_PUNCTUATION = re.compile(r"[^A-Z0-9]+")
+_LETTER_DIGIT = re.compile(r"(?<=[A-Z])(?=[0-9])|(?<=[0-9])(?=[A-Z])")
+
+def _singular(token):
+    # BGVS -> BGV, GUITARS -> GUITAR, but leave BASS, FX and short tokens alone
+    if len(token) > 3 and token.endswith("S") and not token.endswith("SS"):
+        return token[:-1]
+    return token
+
+def normalize_name(name):
+    """Upper-case, drop punctuation/apostrophes, split "GUITAR1", expand abbreviations and singularize."""
+    text = name.upper().replace("'", "").replace("’", "")
+    text = _LETTER_DIGIT.sub(" ", _PUNCTUATION.sub(" ", text))
+    tokens = []
+    for token in text.split():
+        tokens.extend(TOKEN_ALIASES.get(token, token).split())
+    return " ".join(_singular(token) for token in tokens)
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _distinctive(tokens):
+    return {token for token in tokens if token not in STOP_TOKENS and not token.isdigit()}
+
+def _close_to_any(token, others):
+    trigrams = _trigrams(token)
+    return any(2 * len(trigrams & _trigrams(other)) / (len(trigrams) + len(_trigrams(other))) >= TYPO_SIMILARITY
+               for other in others)
+
+def _fuzzy_allowed(tokens, key_tokens, siblings=frozenset()):
+    """A fuzzy match needs a distinctive word in common, and the name may not add a distinctive
+    word of its own: "SUB KICK" is not SUB and "LEAD VOCAL" is not VOCALS, but "ACOUSTC GUITAR"
+    (a misspelling) is ACOUSTIC GUITAR and "KEYS L" is KEYS. Words that are themselves keys of
+    the same group (siblings) may be added: "CLICK GUIDE" is still CLICK."""
+    name_words, key_words = _distinctive(tokens), _distinctive(key_tokens)
+    if not name_words & key_words:
+        return False
+    return all(word in siblings or _close_to_any(word, key_words - name_words) for word in name_words - key_words)
+
+class TrackMatcher:
+    """Tiered track-name matcher over a fixed set of rule keys.
+
+    The index is built once per rule set: exact and normalized lookups are dict hits,
+    and the fuzzy tier only scores keys that share a token or trigram with the name (and
+    share a distinctive word with it, see _fuzzy_allowed).
+
+    groups optionally maps keys to a group (e.g. the output their rule picks); one-word keys
+    of a group may appear together in a name without blocking a fuzzy match.
+    """
+
+    def __init__(self, keys, threshold=DEFAULT_THRESHOLD, groups=None):
+        self.threshold = threshold
+        self.keys = []
+        self.exact = {}
+        self.normalized = {}
+        self.key_tokens = []
+        self.key_trigram_counts = []
+        self.token_postings = {}
+        self.trigram_postings = {}
+        self.cache = {}
+
+        for key in keys:
+            upper_key = str(key).upper()
+            if upper_key in self.exact:
+                continue
+            self.exact[upper_key] = key
+            normalized = normalize_name(upper_key)
+            # First key wins on collisions (e.g. GUITAR / GUITARS), matching ROUTING_MAP order
+            self.normalized.setdefault(normalized, key)
+
+            index = len(self.keys)
+            self.keys.append(key)
+            tokens = set(normalized.split())
+            trigrams = _trigrams(normalized)
+            self.key_tokens.append(tokens)
+            self.key_trigram_counts.append(len(trigrams))
+            for token in tokens:
+                self.token_postings.setdefault(token, []).append(index)
+            for trigram in trigrams:
+                self.trigram_postings.setdefault(trigram, []).append(index)
+
+        group_words = {}
+        groups = groups or {}
+        for key, tokens in zip(self.keys, self.key_tokens):
+            if key in groups and len(tokens) == 1:
+                group_words.setdefault(groups[key], set()).update(_distinctive(tokens))
+        self.key_siblings = [frozenset(group_words.get(groups[key], ())) if key in groups else frozenset()
+                             for key in self.keys]
+
+    def match(self, name):
+        """Return the best TrackMatch for a track name, or None if nothing clears the threshold."""
+        if name in self.cache:
+            return self.cache[name]
+        result = self._match(name)
+        self.cache[name] = result
+        return result
+
+    def _match(self, name):
+        upper_name = name.upper()
+        if upper_name in self.exact:
+            return TrackMatch(self.exact[upper_name], "exact", 1.0)
+
+        normalized = normalize_name(upper_name)
+        if not normalized:
+            return None
+        if normalized in self.normalized:
+            return TrackMatch(self.normalized[normalized], "normalized", 1.0)
+
+        tokens = set(normalized.split())
+        trigrams = _trigrams(normalized)
+        shared_trigrams = Counter()
+        for trigram in trigrams:
+            shared_trigrams.update(self.trigram_postings.get(trigram, ()))
+        candidates = set(shared_trigrams)
+        for token in tokens:
+            candidates.update(self.token_postings.get(token, ()))
+
+        best = None
+        for index in candidates:
+            key_tokens = self.key_tokens[index]
+            if not _fuzzy_allowed(tokens, key_tokens, self.key_siblings[index]):
+                continue
+            token_score = 2 * len(tokens & key_tokens) / (len(tokens) + len(key_tokens))
+            trigram_score = 2 * shared_trigrams[index] / (len(trigrams) + self.key_trigram_counts[index])
+            score = (token_score + trigram_score) / 2
+            # Ties go to the earlier rule so results are stable
+            if best is None or score > best[0] or (score == best[0] and index < best[1]):
+                best = (score, index)
+
+        if best is None or best[0] < self.threshold:
+            return None
+        return TrackMatch(self.keys[best[1]], "fuzzy", round(best[0], 3))
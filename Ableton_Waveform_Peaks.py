@@ -0,0 +1,130 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Ableton_Audio import read_audio_info, iter_chunks, frame_count, CHUNK_FRAMES, AudioFormatError
+from Ableton_Router_Engine import file_sha256
+from Ableton_Sample_Bundle import DigestCache
+
+DEFAULT_CACHE_NAME = os.environ.get("WAVEFORM_CACHE", "waveform_peaks.sqlite")
+# Bump when the peak computation changes so cached peaks are recomputed
+PEAKS_VERSION = 1
+# Peak columns per thumbnail (one min/max pair each)
+DEFAULT_COLUMNS = 240
+THUMBNAIL_HEIGHT = 32
+PEAK_WORKERS = min(4, os.cpu_count() or 1)
+# Below this peak level (about -60 dBFS) a track is shown as silent
+SILENT_PEAK = 0.001
+
+def compute_peaks(path, columns=DEFAULT_COLUMNS):
+    """Min/max per column over all channels, as a (columns, 2) float32 array.
+
+    Samples are streamed from a memory map in chunks that hold whole columns, so each chunk
+    decimates on its own and only one chunk is in memory at a time.
+    """
+    info = read_audio_info(path)
+    frames = frame_count(info)
+    peaks = np.zeros((columns, 2), dtype=np.float32)
+    if frames == 0:
+        return peaks
+    per_column = -(-frames // columns)
+    chunk_frames = per_column * max(1, CHUNK_FRAMES // per_column)
+    for start, block in iter_chunks(info, chunk_frames, mono=False):
+        first = start // per_column
+        count = -(-len(block) // per_column)
+        padded = np.full((count * per_column, block.shape[1]), np.nan, dtype=np.float32)
+        padded[:len(block)] = block
+        padded = padded.reshape(count, -1)
+        peaks[first:first + count, 0] = np.nanmin(padded, axis=1)
+        peaks[first:first + count, 1] = np.nanmax(padded, axis=1)
+    return peaks
+
+class PeakCache:
+    """Peaks in SQLite, keyed by the audio file's sha256 and the column count.
+
+    Shared by the worker threads, so every query runs under one lock.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_NAME):
+        self.digests = DigestCache(db_path, check_same_thread=False)
+        self.conn = self.digests.conn
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS peaks (sha256 TEXT NOT NULL, columns INTEGER NOT NULL, "
+                "version INTEGER NOT NULL, data BLOB NOT NULL, PRIMARY KEY (sha256, columns))"
+            )
+
+    def digest(self, path, stat):
+        with self.lock:
+            digest = self.digests.get(path, stat)
+        if digest is None:
+            digest = file_sha256(path)
+            with self.lock:
+                self.digests.put_many([(path, stat.st_size, stat.st_mtime_ns, digest)])
+        return digest
+
+    def get(self, digest, columns):
+        with self.lock:
+            row = self.conn.execute("SELECT version, data FROM peaks WHERE sha256 = ? AND columns = ?",
+                                    (digest, columns)).fetchone()
+        if row is None or row[0] != PEAKS_VERSION:
+            return None
+        return np.frombuffer(row[1], dtype=np.float32).reshape(columns, 2)
+
+    def put(self, digest, columns, peaks):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO peaks (sha256, columns, version, data) VALUES (?, ?, ?, ?)",
+                              (digest, columns, PEAKS_VERSION, peaks.astype(np.float32).tobytes()))
+            self.conn.commit()
+
+    def peaks(self, path, columns=DEFAULT_COLUMNS):
+        """Cached peaks for a file, decoding it only when this content hasn't been seen at this resolution."""
+        digest = self.digest(path, os.stat(path))
+        peaks = self.get(digest, columns)
+        if peaks is None:
+            peaks = compute_peaks(path, columns)
+            self.put(digest, columns, peaks)
+        return peaks
+
+    def close(self):
+        with self.lock:
+            self.digests.close()
+
+class PeakService:
+    """Thumbnail jobs on a thread pool; a file already queued or finished is never decoded twice."""
+
+    def __init__(self, cache_path=DEFAULT_CACHE_NAME, workers=PEAK_WORKERS):
+        self.cache = PeakCache(cache_path)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="peaks")
+        self.lock = threading.Lock()
+        self.futures = {}
+
+    def submit(self, path, columns=DEFAULT_COLUMNS):
+        """Future for (path, columns); resolves to the peaks, or raises for unreadable files."""
+        stat = os.stat(path)
+        # Size and mtime in the key, so a re-exported file is picked up on the next render
+        key = (path, stat.st_size, stat.st_mtime_ns, columns)
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None or (future.done() and future.exception() is not None and
+                                  not isinstance(future.exception(), AudioFormatError)):
+                future = self.futures[key] = self.executor.submit(self.cache.peaks, path, columns)
+        return future
+
+def render_thumbnail(peaks, height=THUMBNAIL_HEIGHT):
+    """A (height, columns) uint8 image of the peaks: dark waveform on white."""
+    rows = (np.arange(height, dtype=np.float32)[::-1, None] + 0.5) / height * 2 - 1
+    low = np.clip(peaks[:, 0], -1, 1)[None, :]
+    high = np.clip(peaks[:, 1], -1, 1)[None, :]
+    # Widen each column to at least one row, so quiet content still shows as a line
+    half_row = 1.0 / height
+    filled = (rows >= np.minimum(low, -half_row) - half_row) & (rows <= np.maximum(high, half_row) + half_row)
+    image = np.full(filled.shape, 255, dtype=np.uint8)
+    image[filled] = 40
+    return image
+
+def is_silent(peaks):
+    return float(np.abs(peaks).max()) < SILENT_PEAK if len(peaks) else True
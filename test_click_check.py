@@ -0,0 +1,71 @@
+import wave
+
+import numpy as np
+
+import Ableton_Click_Check as click_check
+
+SAMPLE_RATE = 44100
+
+SET_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Ableton>
+  <LiveSet>
+    <Tracks>
+      <AudioTrack Id="1">
+        <Name><EffectiveName Value="CLICK" /></Name>
+        <DeviceChain>
+          <MainSequencer>
+            <Sample>
+              <ArrangerAutomation>
+                <Events>
+                  <AudioClip Id="0" Time="0">
+                    <Name Value="Click" />
+                    <CurrentStart Value="0" />
+                    <CurrentEnd Value="32" />
+                    <IsWarped Value="false" />
+                    <SampleRef><FileRef><RelativePath Value="click.wav" /><Path Value="" /></FileRef></SampleRef>
+                  </AudioClip>
+                </Events>
+              </ArrangerAutomation>
+            </Sample>
+          </MainSequencer>
+        </DeviceChain>
+      </AudioTrack>
+    </Tracks>
+    <MainTrack>
+      <DeviceChain><Mixer><Tempo><Manual Value="{tempo}" /></Tempo></Mixer></DeviceChain>
+    </MainTrack>
+  </LiveSet>
+</Ableton>
+"""
+
+def write_click(path, bpm, seconds=20.0):
+    samples = np.zeros(int(SAMPLE_RATE * seconds), dtype=np.int16)
+    for beat in np.arange(0.0, seconds, 60.0 / bpm):
+        start = int(beat * SAMPLE_RATE)
+        samples[start:start + 200] = 20000
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+
+def check(tmp_path, click_bpm, set_bpm):
+    write_click(tmp_path / "click.wav", click_bpm)
+    set_file = tmp_path / "set.als"
+    set_file.write_text(SET_XML.replace("{tempo}", str(set_bpm)), encoding="utf-8")
+    cache = click_check.AnalysisCache(str(tmp_path / "cache.sqlite"))
+    try:
+        return click_check.check_set(str(set_file), cache)
+    finally:
+        cache.close()
+
+def test_80_bpm_click_in_120_bpm_set_is_mismatch(tmp_path):
+    [result] = check(tmp_path, 80, 120)
+    assert result.status == "mismatch"
+    assert abs(result.pulse_bpm - 80) < 0.1
+
+def test_eighth_note_click_folds_to_set_tempo(tmp_path):
+    [result] = check(tmp_path, 240, 120)
+    assert result.status == "ok"
+    assert abs(result.detected_bpm - 120) < 0.1
+    assert abs(result.pulse_bpm - 240) < 0.1
@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+import Ableton_Router_Memory_Check as memory_check
+from Ableton_Router_Load_Test import synthetic_set
+
+# Peak traced memory per MB of set XML and memory left allocated after a run; see
+# Ableton_Router_Memory_Check.py for the budgets and a CLI that prints every stage
+def read_sample_set():
+    with open(memory_check.SAMPLE_SET, "rb") as f:
+        return f.read()
+
+CASES = [("synthetic", lambda: synthetic_set(120, 30))]
+if os.path.exists(memory_check.SAMPLE_SET):
+    CASES.insert(0, ("sample set", read_sample_set))
+
+@pytest.mark.parametrize("mode", ["upload", "file"])
+@pytest.mark.parametrize("slim", [False, True])
+@pytest.mark.parametrize("label, load", CASES, ids=[label for label, _ in CASES])
+def test_routing_stays_within_memory_budget(label, load, mode, slim):
+    result = memory_check.check(label, load(), slim, mode, memory_check.DEFAULT_PEAK_PER_XML_MB,
+                                memory_check.DEFAULT_LEAK_MB)
+    assert result["peak_per_xml_mb"] <= memory_check.DEFAULT_PEAK_PER_XML_MB, result["failures"]
+    assert result["retained_mb"] <= memory_check.DEFAULT_LEAK_MB, result["failures"]
@@ -0,0 +1,99 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+import requests
+
+import Ableton_Router_Spreadsheet as spreadsheet
+
+DEFAULTS_CSV = "Track Name,Routing,Instruction\nCLICK,1,\nKEYS,3/4,-3\nBASS,5,\n"
+CAMPUS_CSV = "Track Name,Routing,Instruction\nKEYS,7/8,mute\nPAD,9,\n"
+
+@pytest.fixture
+def sheet():
+    """A local stand-in for the sheet's CSV export; tabs maps gid -> CSV text, or None to answer 500."""
+    tabs = {"0": DEFAULTS_CSV, "1": CAMPUS_CSV}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            gid = parse_qs(urlparse(self.path).query).get("gid", [""])[0]
+            body = tabs.get(gid)
+            if body is None:
+                self.send_error(500)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", tabs
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_fetch_keeps_cells_as_text(sheet):
+    url, _ = sheet
+    df = spreadsheet.SheetSource(url).fetch_tab("0")
+    assert df["Routing"].tolist() == ["1", "3/4", "5"]
+
+def test_failed_refresh_uses_last_good_copy(sheet):
+    url, tabs = sheet
+    source = spreadsheet.SheetSource(url, cache_seconds=0)
+    first = source.fetch_tab("1")
+    tabs["1"] = None
+    assert source.fetch_tab("1") is first
+    tabs["2"] = None
+    with pytest.raises(requests.HTTPError):
+        source.fetch_tab("2")
+
+def test_fetch_tabs_reports_each_failure(sheet):
+    url, tabs = sheet
+    tabs["2"] = None
+    frames = spreadsheet.SheetSource(url).fetch_tabs(["0", "1", "2", "0"])
+    assert set(frames) == {"0", "1", "2"}
+    assert isinstance(frames["0"], pd.DataFrame) and isinstance(frames["1"], pd.DataFrame)
+    assert isinstance(frames["2"], requests.HTTPError)
+
+def test_validate_tab_rejects_missing_columns():
+    problems, df = spreadsheet.validate_tab("Brandon", pd.DataFrame({"Track Name": ["KEYS"], "Routing": ["1"]}))
+    assert df is None
+    assert "Instruction" in problems[0]
+
+def test_validate_tab_drops_blank_and_duplicate_names():
+    raw = pd.DataFrame({
+        "Track Name": [" KEYS ", "", None, "KEYS", "PAD"],
+        "Routing": ["1", "2", "3", "4", "5"],
+        "Instruction": [None] * 5,
+        "Notes": ["extra"] * 5,
+    })
+    problems, df = spreadsheet.validate_tab("Brandon", raw)
+    assert list(df.columns) == spreadsheet.TAB_COLUMNS
+    assert df["Track Name"].tolist() == ["KEYS", "PAD"]
+    assert df["Routing"].tolist() == ["1", "5"]
+    assert len(problems) == 1 and "KEYS" in problems[0]
+
+def test_merge_tabs_layers_campus_rows_over_defaults(sheet):
+    url, _ = sheet
+    frames = spreadsheet.SheetSource(url).fetch_tabs(["0", "1"])
+    _, defaults = spreadsheet.validate_tab("Defaults", frames["0"])
+    _, campus = spreadsheet.validate_tab("Brandon", frames["1"])
+    merged = spreadsheet.merge_tabs(defaults, {"Brandon": campus, "Riverview": defaults.iloc[:0]})
+    rows = {row["Track Name"]: row for row in merged.to_dict("records")}
+
+    assert list(merged.columns) == ["Track Name", "Brandon", "Brandon Instruction", "Riverview", "Riverview Instruction"]
+    assert list(rows) == ["CLICK", "KEYS", "BASS", "PAD"]
+    assert (rows["KEYS"]["Brandon"], rows["KEYS"]["Brandon Instruction"]) == ("7/8", "mute")
+    assert (rows["KEYS"]["Riverview"], rows["KEYS"]["Riverview Instruction"]) == ("3/4", "-3")
+    assert rows["CLICK"]["Brandon Instruction"] is None
+    assert rows["PAD"]["Riverview"] is None
@@ -0,0 +1,59 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import Ableton_Router_Engine as engine
+from Ableton_Rules import RuleSet, TrackFacts
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_rules.toml")
+
+@pytest.fixture(scope="module")
+def rule_set():
+    return RuleSet.from_file(RULES_FILE)
+
+@pytest.fixture(scope="module")
+def rules(rule_set):
+    return rule_set.variant()
+
+def decide(rules, name):
+    track = ET.fromstring('<AudioTrack Id="1" />')
+    return rules.decide(TrackFacts(track, name))
+
+def test_exact(rule_set, rules):
+    assert rules.matcher.match("CLICK").tier == "exact"
+    assert decide(rules, "CLICK").output == rule_set.outputs["click"]
+
+@pytest.mark.parametrize("name, key", [("E.Gtr 2", "E GUITAR 2"), ("Acoustic Gtr", "ACOUSTIC GUITAR"), ("BGV's", "BGV")])
+def test_normalized(rule_set, rules, name, key):
+    match = rules.matcher.match(name)
+    assert (match.key, match.tier) == (key, "normalized")
+    assert decide(rules, name).output == rule_set.outputs["instruments"]
+
+@pytest.mark.parametrize("name, key", [("Keys L", "KEYS"), ("Acoustc Guitar", "ACOUSTIC GUITAR")])
+def test_fuzzy_routes_ordinary_outputs(rule_set, rules, name, key):
+    match = rules.matcher.match(name)
+    assert (match.key, match.tier) == (key, "fuzzy")
+    decision = decide(rules, name)
+    assert decision.output == rule_set.outputs["instruments"]
+    assert decision.mute is None and decision.held is None
+
+@pytest.mark.parametrize("name", ["TRACK", "Sub Kick", "Lead Vox", "Bass DI", "Guide Vox"])
+def test_generic_shared_word_is_no_match(rules, name):
+    assert rules.matcher.match(name) is None
+
+def test_click_guide_is_held(rules):
+    match = rules.matcher.match("Click (Guide)")
+    assert match is not None and match.tier == "fuzzy" and match.key in ("CLICK", "GUIDE")
+    decision = decide(rules, "Click (Guide)")
+    assert decision.output is None
+    assert decision.held == match
+
+def test_held_track_is_reported_unrouted():
+    root = ET.fromstring(
+        '<Ableton><LiveSet><Tracks><AudioTrack Id="1"><Name><EffectiveName Value="Click (Guide)" /></Name>'
+        '<DeviceChain /></AudioTrack></Tracks></LiveSet></Ableton>'
+    )
+    [result] = engine.route_tree(root)
+    assert result.action == "unrouted"
+    assert root.find(".//AudioOutputRouting/Target").get("Value") != engine.RULES.outputs["click"]["Target"]